@@ -1,29 +1,15 @@
 import tkinter as tk
-from enum import Enum
-from collections import deque
 import time
 import cv2
-import numpy as np
 from PIL import Image, ImageTk
-import serial
-import threading
 import glob
+from arduino_protocol import open_port
+from elevator_engine import ButtonType, ElevatorEngine
+from port_discovery import candidate_ports, discover
+from vision_pipeline import AdaptiveFrameScheduler, CaptureWorker, OccupancyStateMachine, PenetrationDetector
 
-class ButtonType(Enum):
-    UP = 1
-    DOWN = -1
-    INTERNAL = 0
-
-class Direction(Enum):
-    UP = 1
-    DOWN = -1
-    IDLE = 0
-
-class Request:
-    def __init__(self, floor, button_type):
-        self.floor = floor
-        self.button_type = button_type
-        self.timestamp = time.time()
+# 探測 LCD 板的秒數：與舊版固定等待 Arduino 重啟的 2 秒相同，舊韌體不回應 PING 時啟動不會比以前慢
+LCD_PROBE_TIMEOUT = 2.0
 
 class ArduinoDisplay:
     def __init__(self, baud_rate=9600):
@@ -34,20 +20,27 @@ class ArduinoDisplay:
         
     def connect(self):
         try:
-            # 在 macOS 上尋找 Arduino 串口
-            ports = glob.glob('/dev/cu.usbmodem*') + glob.glob('/dev/cu.usbserial*')
-            
-            if not ports:
-                print("找不到 Arduino 串口，請確認 Arduino 已連接")
-                self.connected = False
-                return
+            # 平行探測回應 PONG:LCD 的串口（優先探測上次成功的串口），回應即代表已開機完成
+            found = discover("LCD", self.baud_rate, timeout=LCD_PROBE_TIMEOUT, accept_legacy=False)
+            if found is not None:
+                port = found.port
+                print(f"找到串口: {port}（{found.elapsed * 1000:.0f} ms）")
+                self.serial = open_port(port, self.baud_rate, timeout=1)
+            else:
+                # 舊版 LCD 韌體不回應 PING：在 macOS 上使用找到的第一個串口
+                ports = glob.glob('/dev/cu.usbmodem*') + glob.glob('/dev/cu.usbserial*')
                 
-            # 使用找到的第一個串口
-            port = ports[0]
-            print(f"找到串口: {port}")
-            
-            self.serial = serial.Serial(port, self.baud_rate, timeout=1)
-            time.sleep(2)  # 等待 Arduino 重啟
+                if not ports:
+                    print("找不到 Arduino 串口，請確認 Arduino 已連接")
+                    self.connected = False
+                    return
+                    
+                port = ports[0]
+                print(f"找到串口: {port}")
+                
+                self.serial = open_port(port, self.baud_rate, timeout=1)
+                if port not in [path for path, _ in candidate_ports()]:
+                    time.sleep(2)  # 等待 Arduino 重啟；探測過的串口在探測期間已重啟完成
             self.connected = True
             print("Arduino LCD 連接成功")
         except Exception as e:
@@ -104,15 +97,20 @@ class ArduinoDisplay:
             print("Arduino LCD 連接已關閉")
 
 class ElevatorControlSim:
-    def __init__(self, master):
+    def __init__(self, master, num_floors=3, detection_size=(320, 240), detection_roi=None):
         self.master = master
         master.title("電梯模擬系統")
-        self.cap = cv2.VideoCapture(0)
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=True)    
+        self.detector = PenetrationDetector(warmup_frames=10, overlay_alpha=0.5,
+                                            process_size=detection_size, roi=detection_roi,
+                                            change_threshold=8)
         self.penetration_area = 0 
         self.total_area = 0
         self.penetration_ratio = 0 
         self.penetration_threshold = 0.15 
+        self.occupancy = OccupancyStateMachine(self.penetration_threshold, hysteresis=0.03,
+                                               min_dwell=1.0, window=5)
+        # 偵測頻率依引擎事件調整：到站後每幀偵測（數秒後轉為待命頻率），行駛中每秒一次
+        self.vision_scheduler = AdaptiveFrameScheduler()
         self.prev_mask = None
         self.baseline_established = False
         self.stabilization_frames = 0
@@ -122,7 +120,9 @@ class ElevatorControlSim:
         self.canvas = tk.Canvas(master, width=300, height=600, bg="white")
         self.canvas.pack(side=tk.LEFT, padx=5, fill=tk.Y)
 
-        self.floor_positions = {1: 500, 2: 300, 3: 100}
+        # 1 樓在 y=500，頂樓在 y=100，中間樓層等距分布
+        spacing = 400 / max(num_floors - 1, 1)
+        self.floor_positions = {floor: 500 - (floor - 1) * spacing for floor in range(1, num_floors + 1)}
         for floor, y in self.floor_positions.items():
             self.canvas.create_line(0, y, 300, y, fill="black")
             self.canvas.create_text(280, y - 10, text=f"樓層 {floor}")
@@ -134,17 +134,12 @@ class ElevatorControlSim:
         self.elevator_rect = self.canvas.create_rectangle(
             initial_x, initial_y, initial_x + self.elevator_width, initial_y + self.elevator_height, fill="blue"
         )
-        self.current_floor = 1
-        self.target_floor = None
-        self.direction = Direction.IDLE
-        self.is_moving_flag = False
-
-        self.internal_requests = []
-        self.external_requests = []
-        self.pending_external_requests = deque()
+        # 派車狀態機在虛擬時鐘上執行，GUI 每 50 ms 推進一格並重繪
+        self.engine = ElevatorEngine(num_floors=num_floors, verbose=True)
+        self.engine.add_listener(self.on_engine_event)
+        self.frame_interval = self.engine.frame_interval
 
-        self.full_load = False        
-        self.manual_emergency = False   
+        self.manual_emergency = False
         self.auto_emergency = False     
 
         self.control_frame = tk.Frame(master)
@@ -186,39 +181,30 @@ class ElevatorControlSim:
         self.internal_frame.pack(side=tk.LEFT, fill=tk.Y, padx=5)
         
         tk.Label(self.internal_frame, text="內部呼叫").pack(pady=2)
-        self.btn_internal_floor3 = tk.Button(
-            self.internal_frame, text="3", command=lambda: self.add_request(3, ButtonType.INTERNAL)
-        )
-        self.btn_internal_floor3.pack(fill=tk.X, padx=2, pady=1)
-        self.btn_internal_floor2 = tk.Button(
-            self.internal_frame, text="2", command=lambda: self.add_request(2, ButtonType.INTERNAL)
-        )
-        self.btn_internal_floor2.pack(fill=tk.X, padx=2, pady=1)
-        self.btn_internal_floor1 = tk.Button(
-            self.internal_frame, text="1", command=lambda: self.add_request(1, ButtonType.INTERNAL)
-        )
-        self.btn_internal_floor1.pack(fill=tk.X, padx=2, pady=1)
+        self.internal_buttons = {}
+        for floor in range(num_floors, 0, -1):
+            btn = tk.Button(
+                self.internal_frame, text=str(floor), command=lambda f=floor: self.add_request(f, ButtonType.INTERNAL)
+            )
+            btn.pack(fill=tk.X, padx=2, pady=1)
+            self.internal_buttons[floor] = btn
 
         self.external_frame = tk.Frame(self.buttons_frame)
         self.external_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=5)
         
         tk.Label(self.external_frame, text="外部呼叫").pack(pady=2)
-        self.btn_ext_3_down = tk.Button(
-            self.external_frame, text="3↓", width=4, command=lambda: self.add_request(3, ButtonType.DOWN)
-        )
-        self.btn_ext_3_down.pack(fill=tk.X, padx=2, pady=1)
-        self.btn_ext_2_up = tk.Button(
-            self.external_frame, text="2↑", width=4, command=lambda: self.add_request(2, ButtonType.UP)
-        )
-        self.btn_ext_2_up.pack(fill=tk.X, padx=2, pady=1)
-        self.btn_ext_2_down = tk.Button(
-            self.external_frame, text="2↓", width=4, command=lambda: self.add_request(2, ButtonType.DOWN)
-        )
-        self.btn_ext_2_down.pack(fill=tk.X, padx=2, pady=1)
-        self.btn_ext_1_up = tk.Button(
-            self.external_frame, text="1↑", width=4, command=lambda: self.add_request(1, ButtonType.UP)
-        )
-        self.btn_ext_1_up.pack(fill=tk.X, padx=2, pady=1)
+        self.external_buttons = {}
+        for floor in range(num_floors, 0, -1):
+            for button_type, arrow in ((ButtonType.UP, "↑"), (ButtonType.DOWN, "↓")):
+                if (button_type == ButtonType.UP and floor == num_floors) or \
+                        (button_type == ButtonType.DOWN and floor == 1):
+                    continue
+                btn = tk.Button(
+                    self.external_frame, text=f"{floor}{arrow}", width=4,
+                    command=lambda f=floor, b=button_type: self.add_request(f, b)
+                )
+                btn.pack(fill=tk.X, padx=2, pady=1)
+                self.external_buttons[(floor, button_type)] = btn
 
         self.info_label = tk.Label(self.control_frame, text="狀態：Idle", wraplength=280)
         self.info_label.pack(pady=10)
@@ -227,19 +213,46 @@ class ElevatorControlSim:
         self.arduino_display = ArduinoDisplay()
 
         self.master.after(100, self.simulation_loop)
+        self.vision = CaptureWorker(self.detector, source=0,
+                                    preview_size=(self.display_width, self.display_height),
+                                    annotate=self.draw_penetration_overlay,
+                                    scheduler=self.vision_scheduler)
+        self.vision.start()
         self.master.after(100, self.update_penetration_detection)
-    
+        self.master.after(int(self.frame_interval * 1000), self.engine_tick)
+
+    @property
+    def current_floor(self):
+        return self.engine.current_floor
+
+    @property
+    def target_floor(self):
+        return self.engine.target_floor
+
+    @property
+    def direction(self):
+        return self.engine.direction
+
+    @property
+    def is_moving_flag(self):
+        return self.engine.is_moving_flag
+
+    @property
+    def full_load(self):
+        return self.engine.full_load
+
     def reset_background(self):
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=True)
+        self.detector.request_reset()
         self.baseline_established = False
         self.stabilization_frames = 0
         print("背景已重置，將重新建立基準。")
     
     def update_emergency_threshold(self, val):
         self.penetration_threshold = float(val) / 100.0
+        self.occupancy.threshold = self.penetration_threshold
 
     def update_emergency_mode(self):
-        self.full_load = self.manual_emergency or self.auto_emergency
+        self.engine.set_full_load(self.manual_emergency or self.auto_emergency)
 
     def toggle_full_load(self):
         self.manual_emergency = self.full_load_var.get()
@@ -248,232 +261,95 @@ class ElevatorControlSim:
             print("手動：電梯已進入緊急（滿載）模式。")
         else:
             print("手動：電梯已解除緊急模式。")
-            while self.pending_external_requests:
-                req = self.pending_external_requests.popleft()
-                self.add_request(req.floor, req.button_type)
 
     def add_request(self, floor, button_type):
-        if floor == self.current_floor and button_type == ButtonType.INTERNAL:
-            print(f"忽略當前樓層 {floor} 的內部請求。")
-            return
-        new_request = Request(floor, button_type)
-        if button_type == ButtonType.INTERNAL:
-            if not any(req.floor == floor for req in self.internal_requests):
-                self.internal_requests.append(new_request)
-                print(f"內部請求：樓層 {floor}")
-        else:
-            if self.full_load:
-                self.pending_external_requests.append(new_request)
-                print(f"外部請求：樓層 {floor}（緊急模式，暫存）")
-            else:
-                if not any(req.floor == floor and req.button_type == button_type for req in self.external_requests):
-                    self.external_requests.append(new_request)
-                    print(f"外部請求：樓層 {floor}，方向：{button_type.name}")
-        self.info_label.config(text=f"狀態：{self.get_status_text()}")
-        if not self.is_moving_flag:
-            self.master.after(100, self.process_requests)
+        self.engine.add_request(floor, button_type)
 
     def get_active_requests(self):
-        if self.full_load:
-            return self.internal_requests
-        return self.internal_requests + self.external_requests
+        return self.engine.get_active_requests()
 
     def get_status_text(self):
-        if self.full_load:
-            if len(self.internal_requests) == 0:
-                return "等待緊急請求"
-            else:
-                target = self.internal_requests[0].floor
-                return f"前往{target}樓"
-        else:
-            active = self.get_active_requests()
-            reqs = "無請求" if not active else ", ".join(f"{req.floor}" for req in active)
-            return reqs
-
-    def process_requests(self):
-        active_requests = self.get_active_requests()
-        if not active_requests:
-            self.info_label.config(text=f"狀態：在 {self.current_floor} 樓待命")
-            return
-        next_stop = self.get_next_stop()
-        if next_stop is not None:
-            self.target_floor = next_stop
-            if self.target_floor > self.current_floor:
-                self.direction = Direction.UP
-            elif self.target_floor < self.current_floor:
-                self.direction = Direction.DOWN
-            else:
-                self.direction = Direction.IDLE
+        return self.engine.get_status_text()
+
+    def floor_to_y(self, position):
+        """將引擎的樓層位置（可為小數）換算成畫布上的 y 座標"""
+        lower = max(min(int(position), len(self.floor_positions)), 1)
+        upper = min(lower + 1, len(self.floor_positions))
+        frac = position - lower
+        y = self.floor_positions[lower] + (self.floor_positions[upper] - self.floor_positions[lower]) * frac
+        return y - self.elevator_height
+
+    def engine_tick(self):
+        """推進虛擬時鐘一幀並依引擎位置重繪電梯"""
+        self.engine.run(until=self.engine.now + self.frame_interval)
+        coords = self.canvas.coords(self.elevator_rect)
+        y = self.floor_to_y(self.engine.position())
+        self.canvas.coords(self.elevator_rect, coords[0], y,
+                           coords[0] + self.elevator_width, y + self.elevator_height)
+        self.master.after(int(self.frame_interval * 1000), self.engine_tick)
+
+    def on_engine_event(self, event, engine, **data):
+        if event == "request":
+            self.info_label.config(text=f"狀態：{self.get_status_text()}")
+        elif event == "depart":
+            self.vision_scheduler.set_state("moving")
             self.info_label.config(text=f"向 {self.target_floor} 樓 {self.direction.name} 行駛")
-            self.animate_movement(self.current_floor, self.target_floor, frames=60)
-        else:
-            self.info_label.config(text="無有效下一站")
-
-    def get_next_stop(self):
-        active_requests = self.get_active_requests()
-        if not active_requests:
-            return None
-        if self.direction == Direction.UP:
-            upper_stops = [req.floor for req in active_requests if req.floor > self.current_floor]
-            if upper_stops:
-                return min(upper_stops)
-        elif self.direction == Direction.DOWN:
-            lower_stops = [req.floor for req in active_requests if req.floor < self.current_floor]
-            if lower_stops:
-                return max(lower_stops)
-        nearest_stop = min(active_requests, key=lambda req: abs(req.floor - self.current_floor)).floor
-        return nearest_stop
-
-    def remove_completed_requests(self):
-        self.internal_requests = [req for req in self.internal_requests if req.floor != self.current_floor]
-        if not self.full_load:
-            self.external_requests = [req for req in self.external_requests if req.floor != self.current_floor]
-
-    def animate_movement(self, start_floor, end_floor, frames):
-        self.is_moving_flag = True
-        self.anim_start_floor = start_floor
-        start_y = self.floor_positions[start_floor] - self.elevator_height
-        end_y = self.floor_positions[end_floor] - self.elevator_height
-        self.animation_frame = 0
-        self.total_frames = frames
-        self.target_floor = end_floor
-        self.dy = (end_y - start_y) / frames
-
-        def step():
-            if self.animation_frame < self.total_frames:
-                if not self.full_load and self.animation_frame % 20 == 0:
-                    active = self.get_active_requests()
-                    coords = self.canvas.coords(self.elevator_rect)
-                    current_y = coords[1]
-                    if self.direction == Direction.UP:
-                        possible = []
-                        for req in active:
-                            if (self.anim_start_floor < req.floor < self.target_floor and
-                                req.button_type in (ButtonType.UP, ButtonType.INTERNAL)):
-                                stop_y = self.floor_positions[req.floor] - self.elevator_height
-                                if current_y > stop_y:
-                                    possible.append(req.floor)
-                        if possible:
-                            new_target = min(possible)
-                            if new_target < self.target_floor:
-                                print(f"中途請求：改為先停 {new_target} 樓")
-                                self.target_floor = new_target
-                                remaining_frames = 20
-                                self.total_frames = self.animation_frame + remaining_frames
-                                new_end_y = self.floor_positions[new_target] - self.elevator_height
-                                self.dy = (new_end_y - current_y) / remaining_frames
-                    elif self.direction == Direction.DOWN:
-                        possible = []
-                        for req in active:
-                            if (self.anim_start_floor > req.floor > self.target_floor and
-                                req.button_type in (ButtonType.DOWN, ButtonType.INTERNAL)):
-                                stop_y = self.floor_positions[req.floor] - self.elevator_height
-                                if current_y < stop_y:
-                                    possible.append(req.floor)
-                        if possible:
-                            new_target = max(possible)
-                            if new_target > self.target_floor:
-                                print(f"中途請求：改為先停 {new_target} 樓")
-                                self.target_floor = new_target
-                                remaining_frames = 20
-                                self.total_frames = self.animation_frame + remaining_frames
-                                new_end_y = self.floor_positions[new_target] - self.elevator_height
-                                self.dy = (new_end_y - current_y) / remaining_frames
-
-                self.canvas.move(self.elevator_rect, 0, self.dy)
-                self.animation_frame += 1
-                self.master.after(50, step)
-            else:
-                coords = self.canvas.coords(self.elevator_rect)
-                final_y = self.floor_positions[self.target_floor] - self.elevator_height
-                self.canvas.coords(self.elevator_rect, coords[0], final_y,
-                                   coords[0] + self.elevator_width, final_y + self.elevator_height)
-                self.current_floor = self.target_floor
-                self.is_moving_flag = False
-                self.remove_completed_requests()
-                self.info_label.config(text=f"已到 {self.current_floor} 樓。{self.get_status_text()}")
-                if not self.full_load and self.pending_external_requests:
-                    while self.pending_external_requests:
-                        req = self.pending_external_requests.popleft()
-                        self.add_request(req.floor, req.button_type)
-                self.master.after(500, self.process_requests)
-        step()
+        elif event == "arrive":
+            self.vision_scheduler.set_state("loading")
+            self.info_label.config(text=f"已到 {self.current_floor} 樓。{self.get_status_text()}")
+        elif event == "idle":
+            self.info_label.config(text=f"狀態：在 {self.current_floor} 樓待命")
 
     def update_penetration_detection(self):
-        ret, frame = self.cap.read()
-        if ret:
-            if not self.baseline_established:
-                self.stabilization_frames += 1
-                if self.stabilization_frames > 10:
+        result = self.vision.latest()
+        if result is not None:
+            if not result.ready:
+                self.baseline_established = False
+                self.stabilization_frames = result.warmup
+            else:
+                if not self.baseline_established:
                     self.baseline_established = True
                     print("背景基準已建立完成。")
-                self.background_subtractor.apply(frame)
                 
-                display_frame = frame.copy()
-                cv2.putText(display_frame, f"建立背景基準中 ({self.stabilization_frames}/10)...", 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+                self.total_area = result.total_area
+                self.penetration_area = result.area
+                self.penetration_ratio = result.ratio
                 
-                display_frame = cv2.resize(display_frame, (self.display_width, self.display_height))
-                
-                rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-                image = Image.fromarray(rgb_frame)
-                photo = ImageTk.PhotoImage(image)
-                self.camera_label.config(image=photo)
-                self.camera_label.image = photo
-                
-                self.master.after(100, self.update_penetration_detection)
-                return
-            
-            self.total_area = frame.shape[0] * frame.shape[1]
-            
-            fg_mask = self.background_subtractor.apply(frame)
-            
-            fg_mask = cv2.GaussianBlur(fg_mask, (5, 5), 0)
-            
-            _, fg_mask = cv2.threshold(fg_mask, 128, 255, cv2.THRESH_BINARY)
-            
-            kernel = np.ones((5, 5), np.uint8)
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
-            
-            self.penetration_area = cv2.countNonZero(fg_mask)
-            
-            self.penetration_ratio = (self.penetration_area / self.total_area) * 100
-            
-            self.penetration_info_label.config(text=f"突破量: {self.penetration_ratio:.2f}%")
-            
-            fg_mask_colored = cv2.cvtColor(fg_mask, cv2.COLOR_GRAY2BGR)
-            fg_mask_colored[np.where((fg_mask_colored == [255, 255, 255]).all(axis=2))] = [0, 0, 255]
-            
-            alpha = 0.5
-            visualization = cv2.addWeighted(frame, 1, fg_mask_colored, alpha, 0)
-            
-            cv2.putText(visualization, f"突破量: {self.penetration_ratio:.2f}%", (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            if self.penetration_ratio / 100 >= self.penetration_threshold:
-                cv2.putText(visualization, "⚠️ 物體過多", (10, 60),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+                self.penetration_info_label.config(text=f"突破量: {self.penetration_ratio:.2f}%")
                 
-                if not self.auto_emergency:
-                    print(f"偵測到突破量 {self.penetration_ratio:.2f}% 已超過閾值 {self.penetration_threshold * 100:.0f}%，自動啟動緊急模式")
-                self.auto_emergency = True
-            else:
-                if self.auto_emergency:
-                    print(f"偵測到突破量 {self.penetration_ratio:.2f}% 已低於閾值 {self.penetration_threshold * 100:.0f}%，自動解除緊急模式")
-                self.auto_emergency = False
-            
-            self.update_emergency_mode()
+                # 只在去抖動後的狀態真正改變時才切換緊急模式
+                transition = self.occupancy.update(self.penetration_ratio / 100)
+                if transition is not None:
+                    self.auto_emergency = transition
+                    if transition:
+                        print(f"偵測到突破量 {self.penetration_ratio:.2f}% 已超過閾值 {self.penetration_threshold * 100:.0f}%，自動啟動緊急模式")
+                    else:
+                        print(f"偵測到突破量 {self.penetration_ratio:.2f}% 已低於閾值 {self.penetration_threshold * 100:.0f}%，自動解除緊急模式")
+                    self.update_emergency_mode()
             
-            visualization = cv2.resize(visualization, (self.display_width, self.display_height))
-            
-            rgb_frame = cv2.cvtColor(visualization, cv2.COLOR_BGR2RGB)
-            image = Image.fromarray(rgb_frame)
-            photo = ImageTk.PhotoImage(image)
+            photo = ImageTk.PhotoImage(Image.fromarray(result.preview))
             self.camera_label.config(image=photo)
             self.camera_label.image = photo
             
-        self.master.after(100, self.update_penetration_detection)
+        self.master.after(30, self.update_penetration_detection)
+
+    def draw_penetration_overlay(self, frame, result):
+        """在背景執行緒中繪製預覽圖"""
+        if not result.ready:
+            display_frame = frame.copy()
+            cv2.putText(display_frame, f"建立背景基準中 ({result.warmup}/{self.detector.warmup_frames})...", 
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            return display_frame
+        
+        visualization = self.detector.overlay(frame, result.mask)
+        
+        cv2.putText(visualization, f"突破量: {result.ratio:.2f}%", (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        
+        if result.ratio / 100 >= self.penetration_threshold:
+            cv2.putText(visualization, "⚠️ 物體過多", (10, 60),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        return visualization
 
     def update_arduino_display(self):
         """更新 Arduino LCD 顯示"""
@@ -502,7 +378,7 @@ class ElevatorControlSim:
     def on_closing(self):
         if hasattr(self, 'arduino_display'):
             self.arduino_display.close()
-        self.cap.release()
+        self.vision.stop()
         self.master.destroy()
 
 if __name__ == "__main__":
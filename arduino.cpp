@@ -22,7 +22,11 @@ void setup() {
 
 void loop() {
   if (stringComplete) {
-    if (inputString.startsWith("L1:")) {
+    if (inputString == "PING") {
+        // 連線握手：回覆裝置識別，供 port_discovery 區分 LCD 板與電梯板
+        Serial.println("PONG:LCD");
+    }
+    else if (inputString.startsWith("L1:")) {
         String line1 = inputString.substring(3);
         lcd.setCursor(0, 0);
         lcd.print("                "); 
@@ -43,7 +47,8 @@ void loop() {
 }
 
 void serialEvent() {
-  while (Serial.available()) {
+  // 一次只收一行，其餘留在串口緩衝區等 loop() 處理完再讀
+  while (Serial.available() && !stringComplete) {
     char inChar = (char)Serial.read();
     if (inChar == '\n') {
       stringComplete = true;
@@ -10,6 +10,9 @@ Unistep2 myStepper(8, 9, 10, 11, stepsPerRevolution, 1000);  // IN1, IN2, IN3, I
 const int limitSwitchTop = 12;     // 頂部微動開關
 const int limitSwitchBottom = 13;  // 底部微動開關
 
+// 樓層數（floorPositions 索引 0 不用，1..NUM_FLOORS 對應樓層）
+const int NUM_FLOORS = 3;
+
 // === 全域變數 ===
 // 電梯狀態
 int currentFloor = 1;           // 當前樓層
@@ -21,12 +24,42 @@ bool isCalibrating = false;     // 是否正在校準
 // 位置計算
 long currentPosition = 0;       // 當前步進馬達位置
 long stepsPerFloor = 1000;      // 每層樓的步數（需要校準）
-long floorPositions[4];         // 各樓層的位置（索引0不用，1-3對應樓層）
+long floorPositions[NUM_FLOORS + 1];  // 各樓層的位置（索引0不用，1..NUM_FLOORS對應樓層）
 
 // 串口通訊
 String inputString = "";
 bool stringComplete = false;
 
+// 二進位訊框模式（PC 送出 BINARY 後啟用，重置後回到文字模式）
+// 訊框：COBS(opcode, seq, 固定長度參數..., CRC-8) + 0x00，與 arduino_protocol.py 對應
+bool binaryMode = false;
+uint8_t txSeq = 0;
+uint8_t rxFrame[32];
+uint8_t rxLength = 0;
+bool frameComplete = false;
+
+// 命令序號：文字模式的 "@序號 命令" 與二進位訊框都會回 ACK；PC 逾時重送時序號不變，
+// 與上一筆相同的序號只確認、不重複執行
+int lastRxSeq = -1;
+
+// 命令 opcode（PC → Arduino），依序對應 COMMAND_NAMES
+const uint8_t OP_PING = 0x01;
+const uint8_t OP_MOVE = 0x02;
+const uint8_t OP_EMERGENCY = 0x07;
+const uint8_t OP_STATUS = 0x08;
+const uint8_t OP_TEXT_MODE = 0x0F;
+const char* const COMMAND_NAMES[] = {"", "PING", "MOVE:", "STOP", "CALIBRATE", "INIT", "TEST", "EMERGENCY:", "STATUS"};
+
+// 事件 opcode（Arduino → PC）
+const uint8_t OP_PONG = 0x81;
+const uint8_t OP_POS = 0x82;
+const uint8_t OP_MOVE_START = 0x83;
+const uint8_t OP_MOVE_COMPLETE = 0x84;
+const uint8_t OP_PROGRESS = 0x85;
+const uint8_t OP_STATUS_REPORT = 0x86;
+const uint8_t OP_LIMIT = 0x87;
+const uint8_t OP_ACK = 0x88;
+
 // 移動控制變數
 long targetPosition = 0;        // 目標位置
 bool movingUp = false;          // 移動方向
@@ -74,10 +107,20 @@ void loop() {
   
   // 處理串口命令
   if (stringComplete) {
+    inputString.trim();
+    if (inputString == "PING") {
+      // 不帶序號的 PING 只來自連線握手（wait_ready、port_discovery）：清除序號記錄，
+      // PC 重新連線後序號從頭開始也不會被誤判為重複。帶序號的 PING（keepalive、訊框）不清除，
+      // 否則插在命令與其重送之間時，重送會被當成新命令再執行一次
+      lastRxSeq = -1;
+    }
     processCommand(inputString);
     inputString = "";
     stringComplete = false;
   }
+  if (frameComplete) {
+    processFrame();
+  }
   
   // 檢查微動開關
   checkLimitSwitches();
@@ -98,8 +141,7 @@ void updateMovementStatus() {
     isMoving = false;
     currentFloor = calculateCurrentFloor();
     
-    Serial.print("MOVE_COMPLETE:");
-    Serial.println(currentFloor);
+    reportFloor(OP_MOVE_COMPLETE, "MOVE_COMPLETE:", currentFloor);
   }
   
   // 報告移動進度
@@ -111,9 +153,7 @@ void updateMovementStatus() {
       
       if (newProgress != moveProgress && newProgress % 10 == 0) {
         moveProgress = newProgress;
-        Serial.print("PROGRESS:");
-        Serial.print(moveProgress);
-        Serial.println("%");
+        reportProgress();
       }
     }
   }
@@ -129,21 +169,21 @@ void checkLimitSwitches() {
   
   // 頂部微動開關觸發
   if(topState == LOW && lastTopState == HIGH) {
-    Serial.println("LIMIT:top");
+    reportLimit(true);
     if(isCalibrating) {
-      floorPositions[3] = currentPosition;  // 3樓位置
+      floorPositions[NUM_FLOORS] = currentPosition;  // 頂樓位置
     }
     // 安全停止
     if(isMoving) {
       myStepper.move(0);  // Unistep2停止方式
       isMoving = false;
-      Serial.println("到達頂部限位，強制停止");
+      debugLine("到達頂部限位，強制停止");
     }
   }
   
   // 底部微動開關觸發
   if(bottomState == LOW && lastBottomState == HIGH) {
-    Serial.println("LIMIT:bottom");
+    reportLimit(false);
     if(isCalibrating) {
       floorPositions[1] = currentPosition;  // 1樓位置
       currentPosition = 0;  // 重置位置
@@ -153,7 +193,7 @@ void checkLimitSwitches() {
     if(isMoving) {
       myStepper.move(0);  // Unistep2停止方式
       isMoving = false;
-      Serial.println("到達底部限位，強制停止");
+      debugLine("到達底部限位，強制停止");
     }
   }
   
@@ -168,8 +208,7 @@ void updatePosition() {
     int newFloor = calculateCurrentFloor();
     if(newFloor != currentFloor) {
       currentFloor = newFloor;
-      Serial.print("POS:");
-      Serial.println(currentFloor);
+      reportFloor(OP_POS, "POS:", currentFloor);
     }
   }
 }
@@ -180,7 +219,7 @@ int calculateCurrentFloor() {
   int closestFloor = 1;
   long minDistance = abs(currentPosition - floorPositions[1]);
   
-  for(int floor = 2; floor <= 3; floor++) {
+  for(int floor = 2; floor <= NUM_FLOORS; floor++) {
     long distance = abs(currentPosition - floorPositions[floor]);
     if(distance < minDistance) {
       minDistance = distance;
@@ -194,10 +233,10 @@ int calculateCurrentFloor() {
 // === 初始化樓層位置（預設值，不移動馬達） ===
 void initializeFloorPositions() {
   // 設定預設的樓層位置（基於經驗值）
-  floorPositions[1] = 0;        // 1樓 = 0步
-  floorPositions[2] = 1000;     // 2樓 = 1000步
-  floorPositions[3] = 2000;     // 3樓 = 2000步
   stepsPerFloor = 1000;         // 每層預設1000步
+  for(int floor = 1; floor <= NUM_FLOORS; floor++) {
+    floorPositions[floor] = (floor - 1) * stepsPerFloor;  // 1樓 = 0步，每層往上 stepsPerFloor 步
+  }
   
   // 設定初始位置為1樓
   currentPosition = 0;
@@ -206,29 +245,28 @@ void initializeFloorPositions() {
   isMoving = false;
   emergencyMode = false;
   
-  Serial.println("樓層位置初始化完成（預設值）");
-  Serial.print("1樓位置: "); Serial.println(floorPositions[1]);
-  Serial.print("2樓位置: "); Serial.println(floorPositions[2]);
-  Serial.print("3樓位置: "); Serial.println(floorPositions[3]);
-  Serial.print("每層步數: "); Serial.println(stepsPerFloor);
-  Serial.println("電梯初始化在1樓");
+  debugLine("樓層位置初始化完成（預設值）");
+  printFloorPositions();
+  debugLine("電梯初始化在1樓");
   
   // 回報初始化完成狀態
-  Serial.print("STATUS:");
-  Serial.print(currentFloor);
-  Serial.print(":");
-  Serial.print(targetFloor);
-  Serial.print(":");
-  Serial.print(isMoving ? "MOVING" : "IDLE");
-  Serial.print(":");
-  Serial.println(emergencyMode ? "EMERGENCY" : "NORMAL");
+  reportStatus();
+}
+
+// === 列印各樓層位置 ===
+void printFloorPositions() {
+  if (binaryMode) return;
+  for(int floor = 1; floor <= NUM_FLOORS; floor++) {
+    Serial.print(floor); Serial.print("樓位置: "); Serial.println(floorPositions[floor]);
+  }
+  Serial.print("每層步數: "); Serial.println(stepsPerFloor);
 }
 
 // === 校準樓層位置 ===
 void calibrateFloorPositions() {
   isCalibrating = true;
   
-  Serial.println("開始校準：移動到底部");
+  debugLine("開始校準：移動到底部");
   
   // 先移動到底部 - 使用Unistep2
   currentPosition = 0;
@@ -241,7 +279,7 @@ void calibrateFloorPositions() {
       break;  // 如果馬達停止但還沒碰到限位開關，可能有問題
     }
     stepCount++;
-    if(stepCount % 100 == 0) {
+    if(stepCount % 100 == 0 && !binaryMode) {
       Serial.print("步數: ");
       Serial.println(stepCount);
     }
@@ -258,11 +296,11 @@ void calibrateFloorPositions() {
   currentPosition = 0;
   floorPositions[1] = 0;
   
-  Serial.println("1樓位置校準完成");
+  debugLine("1樓位置校準完成");
   delay(1000);
   
   // 移動到頂部，計算總行程
-  Serial.println("移動到頂部");
+  debugLine("移動到頂部");
   
   stepCount = 0;
   myStepper.move(-10000);  // 大步數往上移動
@@ -274,32 +312,31 @@ void calibrateFloorPositions() {
     }
     stepCount++;
     currentPosition++;
-    if(stepCount % 200 == 0) {
+    if(stepCount % 200 == 0 && !binaryMode) {
       Serial.print("總步數: ");
       Serial.println(currentPosition);
     }
     delay(1);
   }
   
-  // 停止馬達並設定3樓位置
+  // 停止馬達並設定頂樓位置
   myStepper.move(0);
   while(myStepper.stepsToGo() != 0) {
     myStepper.run();
     delay(1);
   }
   
-  // 設定3樓位置
-  floorPositions[3] = currentPosition;
+  // 設定頂樓位置
+  floorPositions[NUM_FLOORS] = currentPosition;
   
-  // 計算2樓位置（中間）
-  floorPositions[2] = (floorPositions[1] + floorPositions[3]) / 2;
-  stepsPerFloor = (floorPositions[3] - floorPositions[1]) / 2;
+  // 中間樓層等距分配
+  stepsPerFloor = (floorPositions[NUM_FLOORS] - floorPositions[1]) / (NUM_FLOORS - 1);
+  for(int floor = 2; floor < NUM_FLOORS; floor++) {
+    floorPositions[floor] = floorPositions[1] + (floor - 1) * stepsPerFloor;
+  }
   
-  Serial.println("校準完成");
-  Serial.print("1樓位置: "); Serial.println(floorPositions[1]);
-  Serial.print("2樓位置: "); Serial.println(floorPositions[2]);
-  Serial.print("3樓位置: "); Serial.println(floorPositions[3]);
-  Serial.print("每層步數: "); Serial.println(stepsPerFloor);
+  debugLine("校準完成");
+  printFloorPositions();
   
   delay(2000);
   
@@ -308,13 +345,13 @@ void calibrateFloorPositions() {
   
   isCalibrating = false;
   
-  Serial.println("校準完成");
+  debugLine("校準完成");
   delay(2000);
 }
 
 // === 移動到指定樓層 ===
 void moveToFloor(int floor) {
-  if(floor < 1 || floor > 3 || emergencyMode) return;
+  if(floor < 1 || floor > NUM_FLOORS || emergencyMode) return;
   
   targetFloor = floor;
   targetPosition = floorPositions[floor];
@@ -322,29 +359,20 @@ void moveToFloor(int floor) {
   
   if (abs(stepsToMove) < 10) {
     // 已經很接近目標位置
-    Serial.print("MOVE_COMPLETE:");
-    Serial.println(floor);
+    reportFloor(OP_MOVE_COMPLETE, "MOVE_COMPLETE:", floor);
     return;
   }
   
   isMoving = true;
   moveProgress = 0;
   
-  Serial.print("MOVE_START:");
-  Serial.println(floor);
+  reportFloor(OP_MOVE_START, "MOVE_START:", floor);
   
-  if(stepsToMove > 0) {
-    // 向上移動
-    Serial.print("向上移動 ");
-    Serial.print(stepsToMove);
-    Serial.println(" 步");
-    movingUp = true;
-  } else {
-    // 向下移動
-    Serial.print("向下移動 ");
-    Serial.print(-stepsToMove);
+  movingUp = stepsToMove > 0;
+  if (!binaryMode) {
+    Serial.print(movingUp ? "向上移動 " : "向下移動 ");
+    Serial.print(abs(stepsToMove));
     Serial.println(" 步");
-    movingUp = false;
   }
   
   // 使用Unistep2移動
@@ -358,15 +386,35 @@ void moveToFloor(int floor) {
 void processCommand(String command) {
   command.trim();
   
+  if(command.startsWith("@")) {
+    // 帶序號的命令: @序號 命令
+    int space = command.indexOf(' ');
+    if(space < 0 || !acknowledge(command.substring(1, space).toInt())) {
+      return;
+    }
+    command = command.substring(space + 1);
+  }
+  
   if(command == "PING") {
     // Ping檢查命令
-    Serial.println("PONG");
+    if (binaryMode) {
+      sendFrame(OP_PONG, 0, 0);
+    } else {
+      Serial.println("PONG:ELEVATOR");  // 附上裝置識別，供 port_discovery 區分電梯板與 LCD 板
+    }
+    return;
+  }
+  else if(command == "BINARY") {
+    // 切換成二進位訊框模式（回覆仍為文字，之後的輸出改為訊框）
+    Serial.println("BINARY:OK");
+    binaryMode = true;
+    txSeq = 0;
     return;
   }
   else if(command.startsWith("MOVE:")) {
     // 移動命令: MOVE:樓層
     int floor = command.substring(5).toInt();
-    if(floor >= 1 && floor <= 3) {
+    if(floor >= 1 && floor <= NUM_FLOORS) {
       moveToFloor(floor);
     }
   }
@@ -375,7 +423,7 @@ void processCommand(String command) {
     myStepper.move(0);  // Unistep2停止方式
     isMoving = false;
     emergencyMode = false;
-    Serial.println("馬達停止");
+    debugLine("馬達停止");
   }
   else if(command == "CALIBRATE") {
     // 校準命令
@@ -387,7 +435,7 @@ void processCommand(String command) {
   }
   else if(command == "TEST") {
     // 馬達測試命令
-    Serial.println("開始馬達測試");
+    debugLine("開始馬達測試");
     myStepper.move(-200);
     while(myStepper.stepsToGo() != 0) {
       myStepper.run();
@@ -399,7 +447,7 @@ void processCommand(String command) {
       myStepper.run();
       delay(1);
     }
-    Serial.println("馬達測試完成");
+    debugLine("馬達測試完成");
   }
   else if(command.startsWith("EMERGENCY:")) {
     // 緊急模式設定
@@ -407,14 +455,199 @@ void processCommand(String command) {
       emergencyMode = true;
       myStepper.move(0);  // Unistep2停止方式
       isMoving = false;
-      Serial.println("緊急模式啟動");
+      debugLine("緊急模式啟動");
     } else {
       emergencyMode = false;
-      Serial.println("緊急模式解除");
+      debugLine("緊急模式解除");
     }
   }
   else if(command == "STATUS") {
     // 狀態查詢
+    reportStatus();
+  }
+}
+
+// === 串口事件處理 ===
+void serialEvent() {
+  // 一次只收一筆命令，其餘留在串口緩衝區等下一輪 loop() 處理
+  while (Serial.available() && !stringComplete && !frameComplete) {
+    char inChar = (char)Serial.read();
+    if (binaryMode) {
+      if (inChar == 0) {
+        frameComplete = rxLength > 0;
+      } else if (inChar == '\n' && endsWithPing()) {
+        // 二進位模式下收到文字的 "PING\n"：開啟串口不再重置板子，PC 重新連線或 port_discovery
+        // 仍以文字模式握手；切回文字模式並當作握手 PING 處理，不必重新上電
+        binaryMode = false;
+        rxLength = 0;
+        inputString = "PING";
+        stringComplete = true;
+      } else {
+        if (rxLength == sizeof(rxFrame)) {
+          rxLength = 0;  // 超過最大訊框長度的一定不是合法訊框（多半是文字），丟棄重新收
+        }
+        rxFrame[rxLength++] = (uint8_t)inChar;
+      }
+    } else if (inChar == '\n') {
+      stringComplete = true;
+    } else {
+      inputString += inChar;
+    }
+  }
+}
+
+// 收到的位元組是否以 "PING" 結尾；合法訊框最長 5 個位元組且第 2 個位元組為 opcode（≤ 0x0F），不會誤判
+bool endsWithPing() {
+  return rxLength >= 4 && memcmp(rxFrame + rxLength - 4, "PING", 4) == 0;
+}
+
+// === 二進位訊框 ===
+// CRC-8（多項式 0x07，初始值 0）
+uint8_t crc8(const uint8_t* data, uint8_t length) {
+  uint8_t crc = 0;
+  for (uint8_t i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+// 送出一個訊框：COBS(opcode, seq, 參數..., CRC-8) + 0x00
+void sendFrame(uint8_t opcode, const uint8_t* args, uint8_t argc) {
+  uint8_t payload[8];
+  uint8_t length = 0;
+  payload[length++] = opcode;
+  payload[length++] = txSeq++;
+  for (uint8_t i = 0; i < argc; i++) {
+    payload[length++] = args[i];
+  }
+  payload[length] = crc8(payload, length);
+  length++;
+
+  // COBS 編碼（訊框遠短於 254 位元組，不需處理 0xFF 分段）
+  uint8_t encoded[10];
+  uint8_t codeIndex = 0;
+  uint8_t code = 1;
+  uint8_t out = 1;
+  for (uint8_t i = 0; i < length; i++) {
+    if (payload[i] == 0) {
+      encoded[codeIndex] = code;
+      codeIndex = out++;
+      code = 1;
+    } else {
+      encoded[out++] = payload[i];
+      code++;
+    }
+  }
+  encoded[codeIndex] = code;
+  Serial.write(encoded, out);
+  Serial.write((uint8_t)0);
+}
+
+// COBS 解碼，回傳解碼後長度（格式錯誤時回傳 0）
+uint8_t cobsDecode(const uint8_t* input, uint8_t length, uint8_t* output) {
+  uint8_t in = 0;
+  uint8_t out = 0;
+  while (in < length) {
+    uint8_t code = input[in++];
+    if (code == 0 || in + code - 1 > length) return 0;
+    for (uint8_t i = 1; i < code; i++) {
+      output[out++] = input[in++];
+    }
+    if (code < 0xFF && in < length) {
+      output[out++] = 0;
+    }
+  }
+  return out;
+}
+
+// 處理一個收到的訊框：檢查 CRC、回覆 ACK，再轉成文字命令交給 processCommand()
+void processFrame() {
+  uint8_t payload[sizeof(rxFrame)];
+  uint8_t length = cobsDecode(rxFrame, rxLength, payload);
+  rxLength = 0;
+  frameComplete = false;
+  if (length < 3 || crc8(payload, length - 1) != payload[length - 1]) {
+    return;  // 損毀的訊框直接丟棄，由 PC 端逾時重送
+  }
+  uint8_t opcode = payload[0];
+  uint8_t seq = payload[1];
+  uint8_t arg = length > 3 ? payload[2] : 0;
+
+  // 收到即確認（校準、測試等命令會阻塞數秒，不等執行完成）
+  if (!acknowledge(seq)) {
+    return;
+  }
+  if (opcode == OP_TEXT_MODE) {
+    binaryMode = false;
+    return;
+  }
+  if (opcode < OP_PING || opcode > OP_STATUS) {
+    return;
+  }
+  String command = COMMAND_NAMES[opcode];
+  if (opcode == OP_MOVE) {
+    command += arg;
+  } else if (opcode == OP_EMERGENCY) {
+    command += arg ? "ON" : "OFF";
+  }
+  processCommand(command);
+}
+
+// 確認收到帶序號的命令；回傳 false 表示是重送的重複命令，只確認、不再執行
+bool acknowledge(uint8_t seq) {
+  if (binaryMode) {
+    sendFrame(OP_ACK, &seq, 1);
+  } else {
+    Serial.print("ACK:");
+    Serial.println(seq);
+  }
+  if (seq == lastRxSeq) {
+    return false;
+  }
+  lastRxSeq = seq;
+  return true;
+}
+
+// === 事件回報（依模式輸出文字或訊框） ===
+void reportFloor(uint8_t opcode, const char* name, int floor) {
+  if (binaryMode) {
+    uint8_t value = floor;
+    sendFrame(opcode, &value, 1);
+  } else {
+    Serial.print(name);
+    Serial.println(floor);
+  }
+}
+
+void reportProgress() {
+  if (binaryMode) {
+    uint8_t value = moveProgress;
+    sendFrame(OP_PROGRESS, &value, 1);
+  } else {
+    Serial.print("PROGRESS:");
+    Serial.print(moveProgress);
+    Serial.println("%");
+  }
+}
+
+void reportLimit(bool top) {
+  if (binaryMode) {
+    uint8_t value = top ? 1 : 0;
+    sendFrame(OP_LIMIT, &value, 1);
+  } else {
+    Serial.println(top ? "LIMIT:top" : "LIMIT:bottom");
+  }
+}
+
+void reportStatus() {
+  if (binaryMode) {
+    uint8_t args[3] = {(uint8_t)currentFloor, (uint8_t)targetFloor,
+                       (uint8_t)((isMoving ? 1 : 0) | (emergencyMode ? 2 : 0))};
+    sendFrame(OP_STATUS_REPORT, args, 3);
+  } else {
     Serial.print("STATUS:");
     Serial.print(currentFloor);
     Serial.print(":");
@@ -426,14 +659,9 @@ void processCommand(String command) {
   }
 }
 
-// === 串口事件處理 ===
-void serialEvent() {
-  while (Serial.available()) {
-    char inChar = (char)Serial.read();
-    if (inChar == '\n') {
-      stringComplete = true;
-    } else {
-      inputString += inChar;
-    }
+// 除錯文字只在文字模式輸出，二進位模式下不佔用串口頻寬
+void debugLine(const char* message) {
+  if (!binaryMode) {
+    Serial.println(message);
   }
-}
\ No newline at end of file
+}
@@ -0,0 +1,923 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque, namedtuple
+import serial
+from stats_util import percentile
+
+try:
+    import termios
+except ImportError:  # Windows
+    termios = None
+
+# Arduino 回報的一筆訊息：kind 為訊息種類（POS、STATUS…，無法辨識的文字為 TEXT），data 為解析後的欄位
+ArduinoEvent = namedtuple("ArduinoEvent", "kind data raw")
+
+
+def _floor(rest):
+    return {"floor": int(rest)}
+
+
+def _status(rest):
+    current, target, moving, emergency = rest.split(":")[:4]
+    return {"current": int(current), "target": int(target),
+            "moving": moving == "MOVING", "emergency": emergency == "EMERGENCY"}
+
+
+# 訊息種類 → 欄位解析函式（參數為第一個冒號之後的字串）
+MESSAGE_PARSERS = {
+    "PONG": lambda rest: {"device": rest},  # PONG:ELEVATOR、PONG:LCD；舊韌體只回 PONG（識別為空字串）
+    "POS": _floor,
+    "MOVE_START": _floor,
+    "MOVE_COMPLETE": _floor,
+    "PROGRESS": lambda rest: {"percent": int(rest.rstrip("%"))},
+    "STATUS": _status,
+    "LIMIT": lambda rest: {"switch": rest},
+    "ERROR": lambda rest: {"message": rest},
+    "BINARY": lambda rest: {"ok": rest == "OK"},
+    "ACK": lambda rest: {"ack": int(rest)},
+}
+
+
+def parse_message(line):
+    """把 Arduino 的一行文字解析成 ArduinoEvent；格式不符或未知的訊息視為 TEXT"""
+    kind, _, rest = line.partition(":")
+    parser = MESSAGE_PARSERS.get(kind)
+    if parser is not None:
+        try:
+            return ArduinoEvent(kind, parser(rest), line)
+        except (ValueError, IndexError):
+            pass
+    return ArduinoEvent("TEXT", {"message": line}, line)
+
+
+# === 二進位訊框模式 ===
+# 訊框：COBS(opcode, seq, 固定長度參數..., CRC-8) + 0x00
+# 與 arduino_elevator.ino 的 sendFrame() / processFrame() 對應；opcode 與參數長度兩端必須一致。
+
+# 命令 opcode（PC → Arduino）：名稱 → (opcode, 參數編碼函式)
+COMMAND_OPCODES = {
+    "PING": (0x01, lambda arg: b""),
+    "MOVE": (0x02, lambda arg: bytes([int(arg)])),
+    "STOP": (0x03, lambda arg: b""),
+    "CALIBRATE": (0x04, lambda arg: b""),
+    "INIT": (0x05, lambda arg: b""),
+    "TEST": (0x06, lambda arg: b""),
+    "EMERGENCY": (0x07, lambda arg: bytes([arg == "ON"])),
+    "STATUS": (0x08, lambda arg: b""),
+    "TEXT": (0x0F, lambda arg: b""),
+}
+
+# 事件 opcode（Arduino → PC）：opcode → (種類, 參數長度, 欄位解析函式)
+EVENT_OPCODES = {
+    0x81: ("PONG", 0, lambda args: {}),
+    0x82: ("POS", 1, lambda args: {"floor": args[0]}),
+    0x83: ("MOVE_START", 1, lambda args: {"floor": args[0]}),
+    0x84: ("MOVE_COMPLETE", 1, lambda args: {"floor": args[0]}),
+    0x85: ("PROGRESS", 1, lambda args: {"percent": args[0]}),
+    0x86: ("STATUS", 3, lambda args: {"current": args[0], "target": args[1],
+                                      "moving": bool(args[2] & 1), "emergency": bool(args[2] & 2)}),
+    0x87: ("LIMIT", 1, lambda args: {"switch": "top" if args[0] else "bottom"}),
+    0x88: ("ACK", 1, lambda args: {"ack": args[0]}),
+}
+
+
+def _crc8_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+
+CRC8_TABLE = _crc8_table()
+
+
+def crc8(data):
+    """CRC-8（多項式 0x07，初始值 0）"""
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def cobs_encode(data):
+    """COBS 編碼：輸出不含 0x00，可直接以 0x00 作為訊框分隔"""
+    output = bytearray(1)
+    code_index = 0
+    code = 1
+    for byte in data:
+        if byte == 0:
+            output[code_index] = code
+            code_index = len(output)
+            output.append(0)
+            code = 1
+            continue
+        output.append(byte)
+        code += 1
+        if code == 0xFF:
+            output[code_index] = code
+            code_index = len(output)
+            output.append(0)
+            code = 1
+    output[code_index] = code
+    return bytes(output)
+
+
+def cobs_decode(data):
+    output = bytearray()
+    index = 0
+    while index < len(data):
+        code = data[index]
+        if code == 0 or index + code > len(data):
+            raise ValueError("COBS 格式錯誤")
+        output += data[index + 1:index + code]
+        index += code
+        if code < 0xFF and index < len(data):
+            output.append(0)
+    return bytes(output)
+
+
+def encode_frame(opcode, seq, args=b""):
+    payload = bytes([opcode, seq & 0xFF]) + args
+    return cobs_encode(payload + bytes([crc8(payload)])) + b"\x00"
+
+
+def encode_command(command, seq):
+    """把文字命令（例如 MOVE:3、EMERGENCY:ON）編碼成二進位訊框"""
+    name, _, arg = command.partition(":")
+    if name not in COMMAND_OPCODES:
+        raise ValueError(f"二進位模式不支援的命令: {command}")
+    opcode, encode_args = COMMAND_OPCODES[name]
+    return encode_frame(opcode, seq, encode_args(arg))
+
+
+def decode_frame(frame):
+    """解碼一個訊框（不含結尾的 0x00），回傳 ArduinoEvent；CRC、長度或 opcode 不符時拋出 ValueError"""
+    payload = cobs_decode(frame)
+    if len(payload) < 3 or crc8(payload[:-1]) != payload[-1]:
+        raise ValueError("CRC 錯誤")
+    opcode, seq, args = payload[0], payload[1], payload[2:-1]
+    if opcode not in EVENT_OPCODES:
+        raise ValueError(f"未知的 opcode: {opcode:#04x}")
+    kind, length, parse_args = EVENT_OPCODES[opcode]
+    if len(args) != length:
+        raise ValueError(f"{kind} 參數長度錯誤")
+    data = parse_args(args)
+    data["seq"] = seq
+    return ArduinoEvent(kind, data, frame.hex())
+
+
+def open_port(port, baud_rate=9600, timeout=None):
+    """開啟串口，並盡量避免 Arduino 因 DTR 變化而重置
+
+    Windows 在開啟前把 DTR 設為 False 即可；POSIX 開啟時核心一定會拉起 DTR，
+    因此改為清除 HUPCL，讓關閉串口時 DTR 維持拉起，下次開啟就不會再觸發重置
+    （開機後第一次開啟仍會重置一次）。
+    """
+    serial_port = serial.Serial()
+    serial_port.port = port
+    serial_port.baudrate = baud_rate
+    serial_port.timeout = timeout
+    serial_port.write_timeout = timeout
+    if os.name == "nt":
+        serial_port.dtr = False
+    serial_port.open()
+    if termios is not None:
+        try:
+            attrs = termios.tcgetattr(serial_port.fileno())
+            attrs[2] &= ~termios.HUPCL
+            termios.tcsetattr(serial_port.fileno(), termios.TCSANOW, attrs)
+        except termios.error:
+            pass
+    return serial_port
+
+
+class LineProtocol(asyncio.Protocol):
+    """以換行分隔的文字協定：資料一到就切行、解析並交給 on_event，不需輪詢"""
+
+    def __init__(self, on_event, max_line=512):
+        self.on_event = on_event
+        self.max_line = max_line
+        self.transport = None
+        self._buffer = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        buffer = self._buffer
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = buffer[start:end].decode("utf-8", errors="ignore").strip()
+            start = end + 1
+            if line:
+                self.on_event(parse_message(line))
+                if _handed_off(self, buffer[start:]):
+                    buffer.clear()
+                    return
+        del buffer[:start]
+        if len(buffer) > self.max_line:
+            # 沒有換行的雜訊（例如鮑率不符）不要無限累積
+            buffer.clear()
+
+    def connection_lost(self, exc):
+        self.on_event(ArduinoEvent("DISCONNECTED", {"error": exc}, ""))
+
+    def encode(self, command, seq=None):
+        """seq 不為 None 時送出 "@序號 命令"，Arduino 收到即回 ACK:序號"""
+        if seq is None:
+            return f"{command}\n".encode()
+        return f"@{seq} {command}\n".encode()
+
+
+def _handed_off(protocol, remaining):
+    """事件處理中切換了協定（文字 ↔ 二進位）時，把同一批資料剩下的位元組交給新協定"""
+    transport = protocol.transport
+    if transport is None or transport.get_protocol() is protocol:
+        return False
+    if remaining:
+        transport.get_protocol().data_received(bytes(remaining))
+    return True
+
+
+class BinaryProtocol(asyncio.Protocol):
+    """COBS 訊框協定：以 0x00 切出訊框，檢查 CRC-8 後解析成與文字模式相同的 ArduinoEvent
+
+    事件的 data 另含 seq（Arduino 端的序號）；ACK 事件的 ack 為被確認的命令序號。
+    損毀的訊框直接丟棄並累計在 errors。命令序號由 ArduinoLink 配發。
+    """
+
+    def __init__(self, on_event, max_frame=64):
+        self.on_event = on_event
+        self.max_frame = max_frame
+        self.transport = None
+        self.errors = 0
+        self._buffer = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        buffer = self._buffer
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(0, start)
+            if end < 0:
+                break
+            frame = bytes(buffer[start:end])
+            start = end + 1
+            if not frame:
+                continue
+            try:
+                event = decode_frame(frame)
+            except ValueError:
+                self.errors += 1
+                continue
+            self.on_event(event)
+            if _handed_off(self, buffer[start:]):
+                buffer.clear()
+                return
+        del buffer[:start]
+        if len(buffer) > self.max_frame:
+            self.errors += 1
+            buffer.clear()
+
+    def connection_lost(self, exc):
+        self.on_event(ArduinoEvent("DISCONNECTED", {"error": exc}, ""))
+
+    def encode(self, command, seq=0):
+        return encode_command(command, seq)
+
+
+class SerialTransport(asyncio.Transport):
+    """以 loop.add_reader / add_writer 監看串口檔案描述子的 asyncio transport（POSIX）
+
+    串口以非阻塞模式開啟，資料可讀時事件迴圈立即喚醒並呼叫 protocol.data_received()；
+    寫不完的資料暫存起來，等串口可寫時再送出，drain() 會等到暫存清空。
+    """
+
+    def __init__(self, loop, protocol, serial_port):
+        super().__init__()
+        self._loop = loop
+        self._protocol = protocol
+        self._serial = serial_port
+        self._fd = serial_port.fileno()
+        self._write_buffer = bytearray()
+        self._drain_waiters = []
+        self._closing = False
+        loop.add_reader(self._fd, self._read_ready)
+        protocol.connection_made(self)
+
+    @property
+    def serial(self):
+        return self._serial
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+        protocol.connection_made(self)
+
+    def get_protocol(self):
+        return self._protocol
+
+    def _read_ready(self):
+        try:
+            data = os.read(self._fd, 1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as exc:
+            self._fatal_error(exc)
+            return
+        if not data:
+            self._fatal_error(None)
+            return
+        self._protocol.data_received(data)
+
+    def write(self, data):
+        if self._closing:
+            raise ConnectionError("串口已關閉")
+        if not self._write_buffer:
+            try:
+                written = os.write(self._fd, data)
+            except (BlockingIOError, InterruptedError):
+                written = 0
+            except OSError as exc:
+                self._fatal_error(exc)
+                raise ConnectionError(f"串口寫入失敗: {exc}") from exc
+            data = data[written:]
+            if not data:
+                return
+            self._loop.add_writer(self._fd, self._write_ready)
+        self._write_buffer += data
+
+    def _write_ready(self):
+        try:
+            written = os.write(self._fd, self._write_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as exc:
+            self._fatal_error(exc)
+            return
+        del self._write_buffer[:written]
+        if not self._write_buffer:
+            self._loop.remove_writer(self._fd)
+            self._wake_drain_waiters()
+
+    def _wake_drain_waiters(self, exc=None):
+        waiters, self._drain_waiters = self._drain_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                if exc is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(exc)
+
+    async def drain(self):
+        """等待暫存的資料全部寫入串口"""
+        if self._closing:
+            raise ConnectionError("串口已關閉")
+        if not self._write_buffer:
+            return
+        waiter = self._loop.create_future()
+        self._drain_waiters.append(waiter)
+        await waiter
+
+    def get_write_buffer_size(self):
+        return len(self._write_buffer)
+
+    def is_closing(self):
+        return self._closing
+
+    def _fatal_error(self, exc):
+        self._close(exc)
+
+    def close(self):
+        self._close(None)
+
+    abort = close
+
+    def _close(self, exc):
+        if self._closing:
+            return
+        self._closing = True
+        self._loop.remove_reader(self._fd)
+        self._loop.remove_writer(self._fd)
+        self._write_buffer.clear()
+        self._wake_drain_waiters(ConnectionError("串口已關閉"))
+        try:
+            self._serial.close()
+        except (OSError, serial.SerialException):
+            pass
+        self._loop.call_soon(self._protocol.connection_lost, exc)
+
+
+class ThreadedSerialTransport(SerialTransport):
+    """沒有 add_reader 時（Windows：串口沒有可 select 的檔案描述子，ProactorEventLoop 也不支援）的替代 transport
+
+    背景執行緒以阻塞方式讀取串口，再透過 call_soon_threadsafe() 交給事件迴圈中的 protocol；
+    寫入直接呼叫 serial.write()，命令只有幾個位元組，由驅動程式的輸出緩衝區吸收，不會卡住事件迴圈。
+    """
+
+    READ_TIMEOUT = 0.1  # 讀取執行緒檢查是否已關閉的間隔（秒）
+
+    def __init__(self, loop, protocol, serial_port):
+        asyncio.Transport.__init__(self)
+        self._loop = loop
+        self._protocol = protocol
+        self._serial = serial_port
+        self._closing = False
+        serial_port.timeout = self.READ_TIMEOUT
+        serial_port.write_timeout = 1.0
+        self._thread = threading.Thread(target=self._read_loop, daemon=True)
+        protocol.connection_made(self)
+        self._thread.start()
+
+    def _read_loop(self):
+        try:
+            while not self._closing:
+                data = self._serial.read(max(1, self._serial.in_waiting))
+                if data:
+                    self._call_soon(self._data_received, data)
+        except (OSError, serial.SerialException) as exc:
+            if not self._closing:
+                self._call_soon(self._fatal_error, exc)
+
+    def _call_soon(self, callback, *args):
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass  # 事件迴圈已關閉
+
+    def _data_received(self, data):
+        if not self._closing:
+            self._protocol.data_received(data)
+
+    def write(self, data):
+        if self._closing:
+            raise ConnectionError("串口已關閉")
+        try:
+            self._serial.write(data)
+        except (OSError, serial.SerialException) as exc:
+            self._fatal_error(exc)
+            raise ConnectionError(f"串口寫入失敗: {exc}") from exc
+
+    async def drain(self):
+        if self._closing:
+            raise ConnectionError("串口已關閉")
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def _close(self, exc):
+        if self._closing:
+            return
+        self._closing = True
+        # 先讓讀取執行緒離開 read() 再關閉串口，與 serial.threaded.ReaderThread.stop() 相同
+        if hasattr(self._serial, "cancel_read"):
+            self._serial.cancel_read()
+        if self._thread is not threading.current_thread():
+            self._thread.join(self.READ_TIMEOUT * 2)
+        try:
+            self._serial.close()
+        except (OSError, serial.SerialException):
+            pass
+        self._loop.call_soon(self._protocol.connection_lost, exc)
+
+
+def create_serial_transport(loop, protocol, serial_port):
+    """POSIX 以 add_reader 監看串口；事件迴圈或平台不支援時改用背景讀取執行緒"""
+    try:
+        serial_port.fileno()
+        return SerialTransport(loop, protocol, serial_port)
+    except (NotImplementedError, OSError, ValueError, AttributeError):
+        return ThreadedSerialTransport(loop, protocol, serial_port)
+
+
+class ArduinoLink:
+    """與 Arduino 的非同步連線：可 await 的 send_command() 與即時的事件串流
+
+    port 可為串口路徑（例如 /dev/cu.usbmodem1101，或測試用的 pty 從端 os.ttyname(slave)）
+    或已開啟的 serial.Serial。收到的訊息同時交給 wait_for() 的等待者與 events() 的佇列。
+    連線一律以文字模式開始（方便除錯），enable_binary() 切換成 COBS 二進位訊框、disable_binary() 切回。
+    """
+
+    def __init__(self, port, baud_rate=9600):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.transport = None
+        self.protocol = None
+        self._events = None
+        self._waiters = {}
+        self._acks = {}
+        self._seq = 0
+        self._text_mode_seq = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        if isinstance(self.port, serial.SerialBase):
+            serial_port = self.port
+        else:
+            serial_port = open_port(self.port, self.baud_rate, timeout=0)
+        self._events = asyncio.Queue()
+        self.protocol = LineProtocol(self._on_event)
+        self.transport = create_serial_transport(loop, self.protocol, serial_port)
+        return self
+
+    @property
+    def connected(self):
+        return self.transport is not None and not self.transport.is_closing()
+
+    @property
+    def binary(self):
+        return isinstance(self.protocol, BinaryProtocol)
+
+    def _switch_protocol(self, protocol):
+        # 在事件處理中同步切換，讓同一批資料剩下的位元組直接交給新協定
+        self.protocol = protocol
+        self.transport.set_protocol(protocol)
+
+    def _on_event(self, event):
+        if event.kind == "BINARY" and event.data["ok"] and not self.binary:
+            self._switch_protocol(BinaryProtocol(self._on_event))
+        elif event.kind == "ACK" and event.data["ack"] == self._text_mode_seq:
+            self._text_mode_seq = None
+            self._switch_protocol(LineProtocol(self._on_event))
+        if event.kind == "ACK":
+            waiter = self._acks.pop(event.data["ack"], None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(event)
+        for waiter in self._waiters.pop(event.kind, ()):
+            if not waiter.done():
+                waiter.set_result(event)
+        if event.kind == "DISCONNECTED":
+            for waiter in [w for waiters in self._waiters.values() for w in waiters] + list(self._acks.values()):
+                if not waiter.done():
+                    waiter.set_exception(ConnectionError("Arduino 連線中斷"))
+            self._waiters.clear()
+            self._acks.clear()
+        self._events.put_nowait(event)
+
+    def next_seq(self):
+        """配發命令序號（0–255 循環）"""
+        seq = self._seq
+        self._seq = (seq + 1) & 0xFF
+        return seq
+
+    def expect_ack(self, seq):
+        """登記等待指定序號的 ACK，回傳 Future；重送同一序號時沿用同一個 Future"""
+        waiter = self._acks.get(seq)
+        if waiter is None or waiter.done():
+            waiter = self._acks[seq] = asyncio.get_running_loop().create_future()
+        return waiter
+
+    async def send_command(self, command, seq=None):
+        """送出一筆命令並等待資料寫入串口
+
+        seq 為 None 時文字模式不帶序號（Arduino 不回 ACK），二進位模式則自動配發。
+        """
+        if not self.connected:
+            raise ConnectionError(f"Arduino未連接，無法發送命令: {command}")
+        if seq is None and self.binary:
+            seq = self.next_seq()
+        self.transport.write(self.protocol.encode(command, seq))
+        await self.transport.drain()
+
+    async def enable_binary(self, timeout=1.0):
+        """要求 Arduino 改用二進位訊框；Arduino 回覆 BINARY:OK 的同時切換協定"""
+        if self.binary:
+            return
+        reply = asyncio.ensure_future(self.wait_for("BINARY", timeout))
+        await self.send_command("BINARY")
+        await reply
+
+    async def disable_binary(self, timeout=1.0):
+        """切回文字模式；收到 TEXT 命令的 ACK 後切換協定"""
+        if not self.binary:
+            return
+        seq = self._text_mode_seq = self.next_seq()
+        ack = self.expect_ack(seq)
+        await self.send_command("TEXT", seq)
+        await asyncio.wait_for(ack, timeout)
+
+    async def wait_for(self, kind, timeout=None):
+        """等待下一筆指定種類的訊息；逾時拋出 asyncio.TimeoutError"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(kind, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        finally:
+            waiters = self._waiters.get(kind)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+
+    async def ping(self, timeout=1.0):
+        """送出 PING 並回傳收到 PONG 的來回時間（秒）"""
+        start = time.perf_counter()
+        pong = asyncio.ensure_future(self.wait_for("PONG", timeout))
+        await self.send_command("PING")
+        await pong
+        return time.perf_counter() - start
+
+    async def wait_ready(self, timeout=5.0, interval=0.25):
+        """開啟串口後 Arduino 會重置；反覆 PING 直到收到 PONG，回傳是否在 timeout 內就緒
+
+        取代固定 sleep(2)：板子一就緒就繼續，不會多等。開頭的換行用來沖掉重置期間殘留的半行。
+        """
+        deadline = time.monotonic() + timeout
+        await self.send_command("")
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await self.ping(min(interval, remaining))
+                return True
+            except asyncio.TimeoutError:
+                continue
+
+    async def events(self):
+        """非同步產生收到的 ArduinoEvent，連線中斷時送出 DISCONNECTED 後結束"""
+        while True:
+            event = await self._events.get()
+            yield event
+            if event.kind == "DISCONNECTED":
+                return
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+# 可合併的命令種類：還沒送出的舊命令直接被同種新命令取代（途中改目標樓層、反覆切換緊急模式）
+COALESCE_KINDS = ("MOVE", "EMERGENCY")
+# 只查詢、不改變 Arduino 狀態的命令，合併時可以越過
+QUERY_KINDS = ("PING", "STATUS")
+# 會讓 Arduino 的 loop() 阻塞的命令與最長阻塞秒數；確認之後，下一筆命令的 ACK 可能要等這麼久
+BLOCKING_COMMANDS = {"CALIBRATE": 30.0, "TEST": 2.0}
+
+# 一筆命令的確認結果：rtt 為最後一次送出到收到 ACK 的秒數，latency 為從排入佇列起算的秒數
+CommandAck = namedtuple("CommandAck", "command seq attempts rtt latency")
+
+
+class QueuedCommand:
+    def __init__(self, command, future, queued_at):
+        self.command = command
+        self.kind = command.partition(":")[0]
+        self.future = future
+        self.queued_at = queued_at
+        self.seq = None
+        self.attempts = 0
+
+
+class CommandQueue:
+    """送往 Arduino 的命令佇列：合併被取代的命令，以序號追蹤 ACK，逾時重送
+
+    一次只有一筆命令在途（停等式）；Arduino 收到即回 ACK，逾時後最多重送 retries 次、
+    每次等待時間加倍。重送沿用同一序號，Arduino 端只確認、不重複執行。
+    submit() 回傳 Future：確認時為 CommandAck，被新命令取代時為 None，
+    重送用盡時拋出 TimeoutError，連線中斷時拋出 ConnectionError。
+    """
+
+    def __init__(self, link, timeout=0.3, retries=3, clock=time.perf_counter):
+        self.link = link
+        self.timeout = timeout
+        self.retries = retries
+        self.clock = clock
+        self.sent = 0
+        self.acked = 0
+        self.retransmits = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.rtts = {}  # 命令種類 → 最近的 RTT（秒），只計第一次就確認的命令
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+        self._busy_until = 0.0
+
+    def submit(self, command):
+        """排入一筆命令（須在事件迴圈中呼叫）；同種的舊命令若還沒送出就直接取代"""
+        item = QueuedCommand(command, asyncio.get_running_loop().create_future(), self.clock())
+        for index in range(len(self._pending) - 1, -1, -1):
+            queued = self._pending[index]
+            if queued.kind == item.kind and (item.kind in COALESCE_KINDS or queued.command == command):
+                del self._pending[index]
+                self._resolve(queued, None)
+                self.coalesced += 1
+                break
+            if queued.kind not in QUERY_KINDS:
+                break
+        self._pending.append(item)
+        self._wakeup.set()
+        return item.future
+
+    def _superseded(self, item):
+        return item.kind in COALESCE_KINDS and any(queued.kind == item.kind for queued in self._pending)
+
+    @staticmethod
+    def _resolve(item, result=None, exception=None):
+        if item.future.done():
+            return
+        if exception is None:
+            item.future.set_result(result)
+        else:
+            item.future.set_exception(exception)
+
+    async def run(self):
+        """依序送出佇列中的命令；取消時，未完成的命令以 ConnectionError 結束"""
+        item = None
+        try:
+            while True:
+                if not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                item = self._pending.popleft()
+                try:
+                    self._resolve(item, await self._transmit(item))
+                except (ConnectionError, TimeoutError) as e:
+                    self.failed += 1
+                    self._resolve(item, exception=e)
+                item = None
+        finally:
+            error = ConnectionError("命令佇列已關閉")
+            for queued in ([item] if item else []) + list(self._pending):
+                self._resolve(queued, exception=error)
+            self._pending.clear()
+
+    async def _transmit(self, item):
+        item.seq = self.link.next_seq()
+        ack = self.link.expect_ack(item.seq)
+        timeout = self.timeout
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt and self._superseded(item):
+                    # 在途的命令逾時，而同種新命令已在排隊：不再重送舊的
+                    self.coalesced += 1
+                    return None
+                item.attempts += 1
+                sent_at = self.clock()
+                await self.link.send_command(item.command, item.seq)
+                self.sent += 1
+                self.retransmits += attempt > 0
+                # 不用 wait_for()：Python 3.11 以前 ACK 與取消同時發生時 wait_for() 會吞掉取消，
+                # 佇列就停在下一次等待而無法關閉；asyncio.wait() 也不會在逾時時取消 ack
+                done, _ = await asyncio.wait({ack}, timeout=max(timeout, self._busy_until - sent_at))
+                if not done:
+                    timeout *= 2
+                    continue
+                ack.result()  # 連線中斷時拋出 ConnectionError
+                now = self.clock()
+                self.acked += 1
+                if item.attempts == 1:
+                    # 重送後收到的 ACK 無法分辨是回應哪一次，不列入 RTT 統計
+                    self.rtts.setdefault(item.kind, deque(maxlen=100)).append(now - sent_at)
+                if item.kind in BLOCKING_COMMANDS:
+                    self._busy_until = now + BLOCKING_COMMANDS[item.kind]
+                return CommandAck(item.command, item.seq, item.attempts, now - sent_at, now - item.queued_at)
+        finally:
+            ack.cancel()
+        raise TimeoutError(f"命令 {item.command} 重送 {self.retries} 次仍未收到 ACK")
+
+    def stats(self):
+        """送出、確認、重送、合併與失敗次數，以及各種命令的 RTT（毫秒）"""
+        rtt = {}
+        for kind, samples in self.rtts.items():
+            rtt[kind] = {"count": len(samples), "mean_ms": sum(samples) / len(samples) * 1000,
+                         "p95_ms": percentile(samples, 95) * 1000, "max_ms": max(samples) * 1000}
+        return {"sent": self.sent, "acked": self.acked, "retransmits": self.retransmits,
+                "coalesced": self.coalesced, "failed": self.failed, "pending": len(self._pending), "rtt": rtt}
+
+
+if __name__ == "__main__":
+    # 以 pty 模擬 Arduino，不需要硬體；BINARY 之後改以訊框收發
+    STATUS_FLAGS = {"IDLE": 0, "MOVING": 1}
+    TEXT_REPLIES = {"PING": ["PONG:ELEVATOR"], "STATUS": ["STATUS:1:1:IDLE:NORMAL"],
+                    "MOVE:3": ["MOVE_START:3", "PROGRESS:50%", "POS:2", "MOVE_COMPLETE:3"]}
+    EVENT_CODES = {kind: opcode for opcode, (kind, _, _) in EVENT_OPCODES.items()}
+    COMMAND_NAMES = {opcode: name for name, (opcode, _) in COMMAND_OPCODES.items()}
+
+    def binary_reply(line, seq):
+        """把文字回覆轉成等效的訊框"""
+        kind, _, rest = line.partition(":")
+        if kind == "STATUS":
+            current, target, moving, _ = rest.split(":")
+            args = bytes([int(current), int(target), STATUS_FLAGS[moving]])
+        elif rest and kind != "PONG":
+            args = bytes([int(rest.rstrip("%"))])
+        else:
+            args = b""
+        return encode_frame(EVENT_CODES[kind], seq, args)
+
+    def fake_arduino(master, wire, loss=0.0):
+        """loss 為整筆命令遺失（不執行也不回 ACK）的機率，用來示範逾時重送"""
+        import random
+        rng = random.Random(1)
+        state = {"binary": False, "seq": 0, "last_seq": None}
+        buffer = bytearray()
+
+        def accept(seq):
+            # 與 arduino_elevator.ino 的 acknowledge() 相同：重複的序號只確認、不執行
+            reply(["ACK:%d" % seq])
+            duplicate = seq == state["last_seq"]
+            state["last_seq"] = seq
+            return not duplicate
+
+        def reply(lines):
+            for line in lines:
+                if state["binary"]:
+                    data = binary_reply(line, state["seq"])
+                    state["seq"] = (state["seq"] + 1) & 0xFF
+                else:
+                    data = line.encode() + b"\n"
+                wire["rx"] += len(data)
+                os.write(master, data)
+
+        def on_readable():
+            data = os.read(master, 1024)
+            wire["tx"] += len(data)
+            buffer.extend(data)
+            while True:
+                if state["binary"]:
+                    end = buffer.find(0)
+                    if end < 0:
+                        return
+                    payload = cobs_decode(bytes(buffer[:end]))
+                    del buffer[:end + 1]
+                    if rng.random() < loss or not accept(payload[1]):
+                        continue
+                    name = COMMAND_NAMES[payload[0]]
+                    if name == "TEXT":
+                        state["binary"] = False
+                        continue
+                    reply(TEXT_REPLIES.get(name + (":%d" % payload[2] if len(payload) > 3 else ""), []))
+                else:
+                    end = buffer.find(b"\n")
+                    if end < 0:
+                        return
+                    line = bytes(buffer[:end]).decode().strip()
+                    del buffer[:end + 1]
+                    if line.startswith("@"):
+                        seq, _, line = line[1:].partition(" ")
+                        if rng.random() < loss or not accept(int(seq)):
+                            continue
+                    if line == "BINARY":
+                        reply(["BINARY:OK"])
+                        state["binary"] = True
+                    else:
+                        reply(TEXT_REPLIES.get(line, []))
+
+        asyncio.get_running_loop().add_reader(master, on_readable)
+
+    async def session(link, wire, label):
+        wire["tx"] = wire["rx"] = 0
+        rtts = [await link.ping() for _ in range(20)]
+        for _ in range(10):
+            await link.send_command("STATUS")
+            await link.wait_for("STATUS", 1.0)
+            await link.send_command("MOVE:3")
+            await link.wait_for("MOVE_COMPLETE", 1.0)
+        print(f"{label}：PING 平均 {sum(rtts) / len(rtts) * 1000:.2f} ms，"
+              f"送出 {wire['tx']} 位元組、收到 {wire['rx']} 位元組")
+        return wire["tx"] + wire["rx"]
+
+    async def queued_session(link):
+        """途中連續改目標樓層：還沒送出的 MOVE 被合併；遺失的命令逾時後重送"""
+        commands = CommandQueue(link, timeout=0.05)
+        worker = asyncio.ensure_future(commands.run())
+        results = []
+        for _ in range(20):
+            futures = [commands.submit(command) for command in ("MOVE:2", "STATUS", "MOVE:3", "STATUS")]
+            results += await asyncio.gather(*futures, return_exceptions=True)
+        worker.cancel()
+        stats = commands.stats()
+        rtt = ", ".join(f"{kind} {value['mean_ms']:.2f} ms" for kind, value in stats["rtt"].items())
+        print(f"命令佇列：送出 {stats['sent']}、確認 {stats['acked']}、重送 {stats['retransmits']}、"
+              f"合併 {stats['coalesced']}、失敗 {stats['failed']}（共 {len(results)} 筆命令）；RTT {rtt}")
+
+    async def main():
+        master, slave = os.openpty()
+        wire = {"tx": 0, "rx": 0}
+        link = await ArduinoLink(os.ttyname(slave)).open()
+        fake_arduino(master, wire)
+        print(f"就緒: {await link.wait_ready(timeout=2)}")
+        text_bytes = await session(link, wire, "文字模式")
+        await link.enable_binary()
+        binary_bytes = await session(link, wire, "二進位模式")
+        print(f"線上位元組減少為 1/{text_bytes / binary_bytes:.1f}")
+        await link.disable_binary()
+        print(f"切回文字模式後 PING: {await link.ping() * 1000:.2f} ms")
+        asyncio.get_running_loop().remove_reader(master)
+        fake_arduino(master, wire, loss=0.1)
+        await queued_session(link)
+        link.close()
+        asyncio.get_running_loop().remove_reader(master)
+        os.close(master)
+
+    asyncio.run(main())
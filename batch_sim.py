@@ -0,0 +1,271 @@
+import time
+import numpy as np
+from elevator_engine import ElevatorEngine
+
+NEVER = np.iinfo(np.int64).max
+
+
+class BatchResult:
+    """批次模擬結果：每個情境一個值的 NumPy 陣列（時間單位為秒）"""
+
+    def __init__(self, wait_total, ride_total, boarded, served, waiting, sim_time):
+        self.wait_total = wait_total
+        self.ride_total = ride_total
+        self.boarded = boarded
+        self.served = served
+        self.waiting = waiting
+        self.sim_time = sim_time
+
+    @property
+    def mean_wait(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.boarded > 0, self.wait_total / self.boarded, np.nan)
+
+    @property
+    def mean_ride(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.served > 0, self.ride_total / self.served, np.nan)
+
+    def summary(self, index):
+        """單一情境的統計，欄位與 ElevatorEngine.summary() 相同以便直接比較"""
+        return {
+            "served": int(self.served[index]),
+            "boarded": int(self.boarded[index]),
+            "waiting": int(self.waiting[index]),
+            "avg_wait": float(np.nan_to_num(self.mean_wait[index])),
+            "avg_ride": float(np.nan_to_num(self.mean_ride[index])),
+            "sim_time": self.sim_time,
+        }
+
+
+class BatchSimulator:
+    """以 NumPy 陣列同步推進 N 個獨立情境的單部電梯
+
+    派車策略與 ElevatorEngine 相同（get_next_stop / 中途檢查 / remove_completed_requests），
+    每一個 tick 對應 GUI 動畫的一幀（frame_interval 秒）。呼叫遮罩為 (N, F) 布林陣列，
+    等候乘客以 (N, 起點, 目的地) 計數保存，因此記憶體約為 N × F² × 4 bytes。
+    同距離的最近樓層取較低樓層；不模擬緊急（滿載）模式。
+    """
+
+    def __init__(self, num_scenarios, num_floors=3, start_floor=1, trip_frames=60, frame_interval=0.05,
+                 recheck_frames=20, request_delay=0.1, reprocess_delay=0.5, floor_time=None):
+        self.num_scenarios = num_scenarios
+        self.num_floors = num_floors
+        self.start_floor = start_floor
+        self.trip_frames = trip_frames
+        self.frame_interval = frame_interval
+        self.recheck_frames = recheck_frames
+        self.request_ticks = self._ticks(request_delay)
+        self.reprocess_ticks = self._ticks(reprocess_delay)
+        self.floor_time = floor_time
+
+    def _ticks(self, seconds):
+        return max(int(np.ceil(seconds / self.frame_interval - 1e-9)), 1)
+
+    def _travel_ticks(self, distance, frames):
+        if self.floor_time is None:
+            return np.full(len(distance), frames, dtype=np.int64)
+        ticks = np.ceil(np.abs(distance) * self.floor_time / self.frame_interval - 1e-9)
+        return np.maximum(ticks.astype(np.int64), 1)
+
+    def run(self, arrivals, duration):
+        """arrivals 為 (scenario, time, origin, destination) 四個等長陣列；樓層從 1 起算"""
+        n, nf = self.num_scenarios, self.num_floors
+        scen, times, origin, dest = (np.asarray(a) for a in arrivals)
+        keep = origin != dest
+        scen, times, origin, dest = scen[keep], times[keep], origin[keep] - 1, dest[keep] - 1
+        arr_tick = np.ceil(times / self.frame_interval - 1e-9).astype(np.int64)
+        order = np.argsort(arr_tick, kind="stable")
+        scen, origin, dest, arr_tick = scen[order], origin[order], dest[order], arr_tick[order]
+        end_tick = int(np.ceil(duration / self.frame_interval - 1e-9))
+
+        idx = np.arange(nf)
+        cur = np.full(n, self.start_floor - 1, dtype=np.int64)
+        target = cur.copy()
+        start = cur.copy()
+        direction = np.zeros(n, dtype=np.int64)
+        moving = np.zeros(n, dtype=bool)
+        move_start = np.zeros(n, dtype=np.int64)
+        arrive_tick = np.full(n, NEVER, dtype=np.int64)
+        process_tick = np.full(n, NEVER, dtype=np.int64)
+        seg_t0 = np.zeros(n)
+        seg_p0 = cur.astype(float)
+
+        internal = np.zeros((n, nf), dtype=bool)
+        up = np.zeros((n, nf), dtype=bool)
+        down = np.zeros((n, nf), dtype=bool)
+
+        waiting = np.zeros((n, nf, nf), dtype=np.int32)
+        arr_sum = np.zeros((n, nf), dtype=np.int64)
+        riding = np.zeros((n, nf), dtype=np.int64)
+        board_sum = np.zeros((n, nf), dtype=np.int64)
+        wait_ticks = np.zeros(n, dtype=np.int64)
+        ride_ticks = np.zeros(n, dtype=np.int64)
+        boarded = np.zeros(n, dtype=np.int64)
+        served = np.zeros(n, dtype=np.int64)
+
+        recheck = self.recheck_frames
+        # wake：每個情境下一次需要處理的 tick（到站、處理請求或中途檢查），只處理到期的情境
+        wake = np.full(n, NEVER, dtype=np.int64)
+        # dirty：行駛中收到新呼叫；只有新呼叫才可能產生中途停靠，因此只有 dirty 的電梯需要檢查
+        dirty = np.zeros(n, dtype=bool)
+        pos_arr = 0
+        k = 0
+        while k <= end_tick:
+            # 乘客到站：登記外部呼叫，閒置的電梯在 request_delay 後處理
+            hi = np.searchsorted(arr_tick, k, side="right")
+            if hi > pos_arr:
+                s, o, d = scen[pos_arr:hi], origin[pos_arr:hi], dest[pos_arr:hi]
+                pos_arr = hi
+                np.add.at(waiting, (s, o, d), 1)
+                np.add.at(arr_sum, (s, o), k)
+                going_up = d > o
+                up[s[going_up], o[going_up]] = True
+                down[s[~going_up], o[~going_up]] = True
+                idle = s[~moving[s]]
+                np.minimum.at(process_tick, idle, k + self.request_ticks)
+                np.minimum.at(wake, idle, k + self.request_ticks)
+                busy = s[moving[s]]
+                dirty[busy] = True
+                elapsed = np.maximum(k - move_start[busy], 1)
+                np.minimum.at(wake, busy, move_start[busy] + recheck * -(-elapsed // recheck))
+
+            act = np.flatnonzero(wake <= k)
+
+            # 行駛中每 recheck_frames 幀檢查可順路停靠的請求
+            m = act[moving[act] & dirty[act] & (k > move_start[act]) & (k < arrive_tick[act])
+                    & ((k - move_start[act]) % recheck == 0)]
+            if m.size:
+                dirty[m] = False
+                span = np.maximum(arrive_tick[m] - seg_t0[m], 1)
+                pos = seg_p0[m] + (target[m] - seg_p0[m]) * (k - seg_t0[m]) / span
+                col = idx[None, :]
+                going_up = direction[m] == 1
+                cand_up = ((internal[m] | up[m]) & (col > start[m, None]) & (col < target[m, None])
+                           & (col > pos[:, None]) & going_up[:, None])
+                cand_down = ((internal[m] | down[m]) & (col < start[m, None]) & (col > target[m, None])
+                             & (col < pos[:, None]) & ~going_up[:, None])
+                new_target = np.full(m.size, -1, dtype=np.int64)
+                has_up = cand_up.any(1)
+                new_target[has_up] = cand_up[has_up].argmax(1)
+                has_down = cand_down.any(1)
+                new_target[has_down] = nf - 1 - cand_down[has_down][:, ::-1].argmax(1)
+                sel = new_target >= 0
+                if sel.any():
+                    r = m[sel]
+                    seg_p0[r] = pos[sel]
+                    seg_t0[r] = k
+                    target[r] = new_target[sel]
+                    arrive_tick[r] = k + self._travel_ticks(target[r] - pos[sel], recheck)
+
+            # 到站：清除該樓層呼叫、乘客上下車
+            a = act[moving[act] & (arrive_tick[act] <= k)]
+            if a.size:
+                f = target[a]
+                cur[a] = f
+                moving[a] = False
+                dirty[a] = False
+                arrive_tick[a] = NEVER
+                seg_p0[a] = f
+                internal[a, f] = False
+                up[a, f] = False
+                down[a, f] = False
+                n_alight = riding[a, f]
+                served[a] += n_alight
+                ride_ticks[a] += n_alight * k - board_sum[a, f]
+                riding[a, f] = 0
+                board_sum[a, f] = 0
+                w = waiting[a, f, :]
+                n_board = w.sum(1)
+                boarded[a] += n_board
+                wait_ticks[a] += n_board * k - arr_sum[a, f]
+                arr_sum[a, f] = 0
+                riding[a] += w
+                board_sum[a] += w * k
+                internal[a] |= w > 0
+                waiting[a, f, :] = 0
+                process_tick[a] = np.where(n_board > 0, k + self.request_ticks, k + self.reprocess_ticks)
+
+            # 閒置電梯決定下一站（同 get_next_stop）
+            p = act[~moving[act] & (process_tick[act] <= k)]
+            if p.size:
+                active = internal[p] | up[p] | down[p]
+                has = active.any(1)
+                process_tick[p] = NEVER
+                p, active = p[has], active[has]
+                if p.size:
+                    c = cur[p]
+                    above = active & (idx[None, :] > c[:, None])
+                    below = active & (idx[None, :] < c[:, None])
+                    nxt = np.full(p.size, -1, dtype=np.int64)
+                    sel = (direction[p] == 1) & above.any(1)
+                    nxt[sel] = above[sel].argmax(1)
+                    sel = (direction[p] == -1) & below.any(1)
+                    nxt[sel] = nf - 1 - below[sel][:, ::-1].argmax(1)
+                    rest = nxt < 0
+                    dist = np.where(active[rest], np.abs(idx[None, :] - c[rest, None]), nf + 1)
+                    nxt[rest] = dist.argmin(1)
+                    target[p] = nxt
+                    start[p] = c
+                    direction[p] = np.sign(nxt - c)
+                    moving[p] = True
+                    move_start[p] = k
+                    seg_t0[p] = k
+                    seg_p0[p] = c
+                    arrive_tick[p] = k + self._travel_ticks(nxt - c, self.trip_frames)
+
+            # 重新計算到期情境的下一個 wake tick
+            if act.size:
+                mv = moving[act] & dirty[act]
+                elapsed = k + 1 - move_start[act]
+                next_check = np.where(mv, move_start[act] + recheck * -(-elapsed // recheck), NEVER)
+                wake[act] = np.minimum(np.minimum(arrive_tick[act], process_tick[act]), next_check)
+
+            # 跳到下一個有事情發生的 tick
+            next_k = int(wake.min())
+            if pos_arr < arr_tick.size:
+                next_k = min(next_k, int(arr_tick[pos_arr]))
+            k = max(next_k, k + 1)
+
+        dt = self.frame_interval
+        return BatchResult(wait_ticks * dt, ride_ticks * dt, boarded, served,
+                           waiting.sum(axis=(1, 2)), duration)
+
+
+def poisson_arrivals(num_scenarios, num_floors, rate, duration, seed=None):
+    """為每個情境產生均勻的 Poisson 到站 (scenario, time, origin, destination)"""
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(rate * duration, size=num_scenarios)
+    total = int(counts.sum())
+    scen = np.repeat(np.arange(num_scenarios), counts)
+    times = rng.uniform(0.0, duration, size=total)
+    origin = rng.integers(1, num_floors + 1, size=total)
+    dest = rng.integers(1, num_floors, size=total)
+    dest = dest + (dest >= origin)
+    return scen, times, origin, dest
+
+
+def scalar_reference(arrivals, scenario, duration, **engine_kwargs):
+    """以 ElevatorEngine 重跑單一情境，回傳可與 BatchResult.summary() 對照的統計"""
+    scen, times, origin, dest = (np.asarray(a) for a in arrivals)
+    sel = np.flatnonzero(scen == scenario)
+    sel = sel[np.argsort(times[sel], kind="stable")]
+    # 批次模擬器實作的是每 recheck_frames 幀檢查一次的中途停靠
+    engine_kwargs.setdefault("intercept", "poll")
+    engine = ElevatorEngine(**engine_kwargs)
+    engine.feed((float(times[i]), int(origin[i]), int(dest[i])) for i in sel)
+    engine.run(until=duration)
+    return engine.summary()
+
+
+if __name__ == "__main__":
+    n, floors, duration = 10000, 3, 3600
+    arrivals = poisson_arrivals(n, floors, rate=1 / 30, duration=duration, seed=0)
+    sim = BatchSimulator(n, num_floors=floors)
+    start = time.perf_counter()
+    result = sim.run(arrivals, duration)
+    elapsed = time.perf_counter() - start
+    print(f"{n} 個情境 × {duration / 3600:.0f} 小時，耗時 {elapsed:.2f} 秒")
+    print(f"平均等候 {np.nanmean(result.mean_wait):.2f} 秒，平均乘坐 {np.nanmean(result.mean_ride):.2f} 秒")
+    print("情境 0（批次）:", result.summary(0))
+    print("情境 0（逐一）:", scalar_reference(arrivals, 0, duration, num_floors=floors))
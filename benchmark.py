@@ -0,0 +1,149 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from dispatch_policies import POLICIES, get_policy
+from elevator_engine import ElevatorEngine
+from stats_util import percentile
+from traffic import passenger_stream
+
+# 基準情境：(客流型態, 每秒到站人數)
+SCENARIOS = {
+    "up_peak": ("up_peak", 0.12),
+    "down_peak": ("down_peak", 0.12),
+    "lunch": ("lunch", 0.10),
+    "interfloor": ("interfloor", 0.08),
+}
+
+# 與基準比較時，各指標允許的相對退步幅度
+DEFAULT_TOLERANCE = {
+    "avg_wait": 0.05,
+    "p95_wait": 0.05,
+    "avg_ride": 0.05,
+    "handling_capacity": 0.05,
+    "avg_decision_us": 0.50,
+}
+
+# 數值越大越好的指標（其餘越小越好）
+HIGHER_IS_BETTER = ("handling_capacity",)
+
+
+def run_policy(policy_name, num_floors, profile, rate, duration, seed, floor_time=1.5, **engine_kwargs):
+    """以指定策略跑一個情境，回傳 KPI 字典；engine_kwargs 直接傳給 ElevatorEngine"""
+    engine = ElevatorEngine(num_floors=num_floors, floor_time=floor_time, policy=get_policy(policy_name),
+                            **engine_kwargs)
+    engine.feed(passenger_stream(num_floors, rate, profile=profile, duration=duration, seed=seed))
+    start = time.perf_counter()
+    engine.run(until=duration)
+    elapsed = time.perf_counter() - start
+
+    waits = list(engine.wait_times)
+    rides = list(engine.ride_times)
+    decisions = list(engine.decision_times)
+    return {
+        "policy": policy_name,
+        "served": len(rides),
+        "waiting": sum(len(v) for v in engine.waiting.values()),
+        "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+        "p95_wait": percentile(waits, 95),
+        "max_wait": max(waits) if waits else 0.0,
+        "avg_ride": sum(rides) / len(rides) if rides else 0.0,
+        "p95_ride": percentile(rides, 95),
+        # 處理能力：每 5 分鐘送達的乘客數
+        "handling_capacity": len(rides) * 300.0 / duration,
+        "trips": engine.trips,
+        "decisions": len(decisions),
+        "avg_decision_us": sum(decisions) / len(decisions) * 1e6 if decisions else 0.0,
+        "p95_decision_us": percentile(decisions, 95) * 1e6,
+        "wall_time": elapsed,
+    }
+
+
+def run_benchmark(policies, scenarios, num_floors, duration, seed, floor_time=1.5):
+    results = []
+    for scenario in scenarios:
+        profile, rate = SCENARIOS[scenario]
+        for policy_name in policies:
+            # 同一情境下所有策略使用相同的種子，因此面對完全相同的客流
+            result = run_policy(policy_name, num_floors, profile, rate, duration, seed, floor_time)
+            result["scenario"] = scenario
+            results.append(result)
+    return {
+        "meta": {
+            "num_floors": num_floors,
+            "duration": duration,
+            "seed": seed,
+            "floor_time": floor_time,
+            "python": platform.python_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=None):
+    """與基準結果比較，回傳退步項目的說明串列"""
+    tolerance = tolerance or DEFAULT_TOLERANCE
+    previous = {(r["scenario"], r["policy"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get((result["scenario"], result["policy"]))
+        if old is None:
+            continue
+        for key, limit in tolerance.items():
+            before, after = old[key], result[key]
+            if not before:
+                continue
+            change = (after - before) / before
+            if key in HIGHER_IS_BETTER:
+                change = -change
+            if change > limit:
+                regressions.append(f"{result['scenario']}/{result['policy']} {key}: "
+                                   f"{before:.3f} → {after:.3f}（{change:+.0%}）")
+    return regressions
+
+
+def print_table(report):
+    header = f"{'情境':<12}{'策略':<22}{'AWT':>7}{'P95等候':>9}{'ART':>7}{'P95乘坐':>9}{'HC/5分':>8}{'決策µs':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        print(f"{r['scenario']:<12}{r['policy']:<22}{r['avg_wait']:>7.1f}{r['p95_wait']:>9.1f}"
+              f"{r['avg_ride']:>7.1f}{r['p95_ride']:>9.1f}{r['handling_capacity']:>8.1f}{r['avg_decision_us']:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在相同客流下比較各派車策略的 KPI")
+    parser.add_argument("--floors", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=3600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--floor-time", type=float, default=1.5)
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--output", help="把結果寫入 JSON 檔（可作為之後 --baseline 的基準）")
+    parser.add_argument("--baseline", help="與此 JSON 基準比較，有退步時回傳非零結束碼")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.policies, args.scenarios, args.floors, args.duration, args.seed, args.floor_time)
+    print_table(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 結果已寫入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline)
+        if regressions:
+            print("❌ 與基準相比退步：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("✅ 未發現退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+from elevator_engine import ButtonType, Direction
+from request_index import next_above, next_below
+
+
+class NearestDirectionalPolicy:
+    """Breakthrough.py 的 get_next_stop：先找順向最近一站，沒有時前往最近的請求
+
+    行駛中可順路停靠同方向外部呼叫與內部呼叫。
+    """
+    name = "nearest_directional"
+
+    def next_stop(self, engine):
+        return engine.nearest_directional_stop()
+
+    def intercept_types(self, engine):
+        if engine.direction == Direction.UP:
+            return (ButtonType.UP, ButtonType.INTERNAL)
+        if engine.direction == Direction.DOWN:
+            return (ButtonType.DOWN, ButtonType.INTERNAL)
+        return ()
+
+
+class FirstComeDirectPolicy:
+    """test2.py 緊急模式的 get_next_internal_stop：直接前往最早的請求，途中不停靠"""
+    name = "first_come_direct"
+
+    def next_stop(self, engine):
+        request = engine.requests.oldest(engine.active_types())
+        return request.floor if request is not None else None
+
+    def intercept_types(self, engine):
+        return ()
+
+
+class PendingSweepPolicy:
+    """physical_elevator.py 的 update_pending_floors：依行進方向掃描
+
+    向上時先服務上方（由低到高）再回頭服務下方；向下相反；閒置時前往最近的樓層。
+    與實體電梯相同，行駛中經過任何有請求的樓層都會停靠，不分按鈕方向。
+    """
+    name = "pending_sweep"
+
+    def next_stop(self, engine):
+        mask = engine.active_mask()
+        if not mask:
+            return None
+        current = engine.current_floor
+        above = next_above(mask, current)
+        below = next_below(mask, current)
+        if mask >> current & 1:
+            return current
+        if engine.direction == Direction.UP:
+            return above if above is not None else below
+        if engine.direction == Direction.DOWN:
+            return below if below is not None else above
+        if above is None:
+            return below
+        if below is None:
+            return above
+        # 同距離時 sorted(set) 的順序讓較低樓層排在前面
+        return below if current - below <= above - current else above
+
+    def intercept_types(self, engine):
+        if engine.direction == Direction.IDLE:
+            return ()
+        return engine.active_types()
+
+
+POLICIES = {
+    policy.name: policy for policy in (NearestDirectionalPolicy, FirstComeDirectPolicy, PendingSweepPolicy)
+}
+
+
+def get_policy(name):
+    """依名稱建立派車策略"""
+    try:
+        return POLICIES[name]()
+    except KeyError:
+        raise ValueError(f"未知的派車策略：{name}（可用：{', '.join(POLICIES)}）") from None
@@ -0,0 +1,560 @@
+import heapq
+import itertools
+import math
+import random
+import time
+from array import array
+from collections import deque
+from enum import Enum
+from request_index import RequestIndex, next_above, next_below
+
+
+class ButtonType(Enum):
+    UP = 1
+    DOWN = -1
+    INTERNAL = 0
+
+class Direction(Enum):
+    UP = 1
+    DOWN = -1
+    IDLE = 0
+
+class Request:
+    def __init__(self, floor, button_type, timestamp=None):
+        self.floor = floor
+        self.button_type = button_type
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+
+EXTERNAL_TYPES = (ButtonType.UP, ButtonType.DOWN)
+INTERNAL_TYPES = (ButtonType.INTERNAL,)
+ALL_TYPES = INTERNAL_TYPES + EXTERNAL_TYPES
+
+
+class SimEvent:
+    """事件佇列中的單一事件，可被取消"""
+    __slots__ = ("time", "seq", "callback", "args", "cancelled")
+
+    def __init__(self, time_, seq, callback, args):
+        self.time = time_
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.time, self.seq) < (other.time, other.seq)
+
+
+class SimClock:
+    """虛擬時鐘與事件佇列（多部電梯可共用同一個時鐘）"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self._queue = []
+        self._counter = itertools.count()
+
+    def schedule(self, delay, callback, *args):
+        """在 delay 秒（虛擬時間）後執行 callback"""
+        event = SimEvent(self.now + max(delay, 0.0), next(self._counter), callback, args)
+        heapq.heappush(self._queue, event)
+        return event
+
+    def schedule_at(self, when, callback, *args):
+        return self.schedule(when - self.now, callback, *args)
+
+    def cancel(self, event):
+        if event is not None:
+            event.cancelled = True
+
+    def peek_time(self):
+        """下一個有效事件的時間，沒有事件時回傳 None"""
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+        return self._queue[0].time if self._queue else None
+
+    def step(self):
+        """執行下一個事件，回傳是否有事件被執行"""
+        while self._queue:
+            event = heapq.heappop(self._queue)
+            if event.cancelled:
+                continue
+            self.now = event.time
+            event.callback(*event.args)
+            return True
+        return False
+
+    def run(self, until=None, max_events=None):
+        """執行事件直到佇列清空、到達 until 時間或處理完 max_events 個事件"""
+        count = 0
+        while max_events is None or count < max_events:
+            next_time = self.peek_time()
+            if next_time is None or (until is not None and next_time > until):
+                break
+            self.step()
+            count += 1
+        if until is not None and until > self.now:
+            self.now = until
+        return count
+
+
+class Passenger:
+    """模擬用乘客：記錄抵達、上車與下車的虛擬時間"""
+    __slots__ = ("origin", "destination", "arrival_time", "board_time", "alight_time")
+
+    def __init__(self, origin, destination, arrival_time):
+        self.origin = origin
+        self.destination = destination
+        self.arrival_time = arrival_time
+        self.board_time = None
+        self.alight_time = None
+
+
+class ElevatorEngine:
+    """無介面的電梯狀態機：與 ElevatorControlSim 相同的派車邏輯，跑在虛擬時鐘與事件佇列上
+
+    預設時間參數對應 GUI 動畫：每趟 60 幀 × 50 ms，每 20 幀檢查一次中途請求，
+    新請求 100 ms 後開始處理，到站 500 ms 後處理下一站。
+    floor_time 若有設定，行程時間改為「樓層數 × floor_time」秒。
+    policy 可替換派車策略（見 dispatch_policies.py），預設為 GUI 的 get_next_stop。
+    door_dwell 為到站後的開門停留秒數（physical_elevator 為 1 秒），之後再等 reprocess_delay 處理下一站。
+    penetration_threshold 若有設定，以「車內人數 × passenger_area」模擬攝影機突破量，
+    達到閾值時自動進入滿載模式、低於閾值時解除，與 GUI 的自動緊急模式相同；
+    以 observe_load_ratio() 餵入實際攝影機的突破量後，改以量測值判斷。
+    intercept="event"（預設）在新請求到達時依目前位置與煞停距離 v²/2a（deceleration，樓層/秒²）
+    立即判斷能否中途停靠；"poll" 保留原本動畫每 recheck_frames 幀掃描一次的行為。
+    """
+
+    def __init__(self, num_floors=3, start_floor=1, clock=None, trip_frames=60, frame_interval=0.05,
+                 recheck_frames=20, request_delay=0.1, reprocess_delay=0.5, floor_time=None,
+                 policy=None, door_dwell=0.0, penetration_threshold=None, passenger_area=0.05,
+                 intercept="event", deceleration=1.0, verbose=False):
+        if intercept not in ("event", "poll"):
+            raise ValueError(f"未知的中途停靠模式：{intercept}")
+        self.clock = clock if clock is not None else SimClock()
+        self.policy = policy
+        self.num_floors = num_floors
+        self.trip_frames = trip_frames
+        self.frame_interval = frame_interval
+        self.recheck_frames = recheck_frames
+        self.request_delay = request_delay
+        self.reprocess_delay = reprocess_delay
+        self.floor_time = floor_time
+        self.door_dwell = door_dwell
+        self.penetration_threshold = penetration_threshold
+        self.passenger_area = passenger_area
+        self.intercept = intercept
+        self.deceleration = deceleration
+        self.verbose = verbose
+
+        self.current_floor = start_floor
+        self.target_floor = None
+        self.direction = Direction.IDLE
+        self.is_moving_flag = False
+
+        # 依樓層與方向索引的請求（位元集合），取代原本的 internal/external 串列
+        self.requests = RequestIndex(ALL_TYPES)
+        self.pending_external_requests = deque()
+
+        self.full_load = False
+        # 攝影機量測到的突破量（0–1）；None 表示以車內人數估計
+        self.measured_load_ratio = None
+
+        # 運動狀態：以樓層為單位的線性插值區段 (t0, p0) → (t1, p1)
+        self.anim_start_floor = start_floor
+        self._seg_t0 = self.clock.now
+        self._seg_p0 = float(start_floor)
+        self._seg_t1 = self.clock.now
+        self._seg_p1 = float(start_floor)
+        self._motion_id = 0
+        self._arrival_event = None
+
+        # 乘客與統計
+        self.waiting = {}
+        self.riding = {}
+        self.riders = 0
+        # 以 array('d') 保存，長時間浸泡測試也只佔每人 16 bytes
+        self.wait_times = array("d")
+        self.ride_times = array("d")
+        self.trips = 0
+        self.decision_times = array("d")
+
+        self.listeners = []
+
+    @property
+    def now(self):
+        return self.clock.now
+
+    @property
+    def internal_requests(self):
+        return self.requests.requests(INTERNAL_TYPES)
+
+    @property
+    def external_requests(self):
+        return self.requests.requests(EXTERNAL_TYPES)
+
+    def add_listener(self, callback):
+        """註冊事件監聽器：callback(event, engine, **data)"""
+        self.listeners.append(callback)
+
+    def _emit(self, event, **data):
+        for callback in self.listeners:
+            callback(event, self, **data)
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def load_ratio(self):
+        """車廂佔用比例（對應攝影機的前景突破量）；有量測值時以量測值為準"""
+        if self.measured_load_ratio is not None:
+            return self.measured_load_ratio
+        return self.riders * self.passenger_area
+
+    def observe_load_ratio(self, ratio):
+        """套用攝影機量測到的突破量，並依 penetration_threshold 切換滿載模式"""
+        self.measured_load_ratio = ratio
+        if self.penetration_threshold is not None:
+            self.set_full_load(ratio >= self.penetration_threshold)
+
+    def _update_occupancy(self):
+        if self.penetration_threshold is not None:
+            self.full_load = self.load_ratio() >= self.penetration_threshold
+
+    def set_full_load(self, full_load):
+        """設定緊急（滿載）模式；解除時重新處理暫存的外部請求"""
+        prev = self.full_load
+        self.full_load = full_load
+        if prev and not full_load:
+            while self.pending_external_requests:
+                req = self.pending_external_requests.popleft()
+                self.add_request(req.floor, req.button_type)
+            if not self.is_moving_flag:
+                self.clock.schedule(self.request_delay, self.process_requests)
+
+    def add_request(self, floor, button_type):
+        if floor == self.current_floor and button_type == ButtonType.INTERNAL:
+            self._log(f"忽略當前樓層 {floor} 的內部請求。")
+            return False
+        new_request = Request(floor, button_type, self.now)
+        if button_type == ButtonType.INTERNAL:
+            if self.requests.add(new_request):
+                self._log(f"內部請求：樓層 {floor}")
+        else:
+            if self.full_load:
+                self.pending_external_requests.append(new_request)
+                self._log(f"外部請求：樓層 {floor}（緊急模式，暫存）")
+            else:
+                if self.requests.add(new_request):
+                    self._log(f"外部請求：樓層 {floor}，方向：{button_type.name}")
+        self._emit("request", floor=floor, button_type=button_type)
+        if not self.is_moving_flag:
+            self.clock.schedule(self.request_delay, self.process_requests)
+        elif self.intercept == "event":
+            self._intercept(floor, button_type)
+        return True
+
+    def add_passenger(self, origin, destination):
+        """模擬一位乘客在 origin 按下外部按鈕，上車後按下 destination"""
+        if origin == destination:
+            return None
+        passenger = Passenger(origin, destination, self.now)
+        self.waiting.setdefault(origin, []).append(passenger)
+        button_type = ButtonType.UP if destination > origin else ButtonType.DOWN
+        self.add_request(origin, button_type)
+        return passenger
+
+    def feed(self, arrivals):
+        """逐筆排程 (time, origin, destination) 到站事件；一次只從來源取一筆，不佔用記憶體"""
+        iterator = iter(arrivals)
+
+        def schedule_next():
+            for arrival_time, origin, destination in iterator:
+                self.clock.schedule_at(arrival_time, on_arrival, origin, destination)
+                return
+
+        def on_arrival(origin, destination):
+            self.add_passenger(origin, destination)
+            schedule_next()
+
+        schedule_next()
+
+    def active_types(self):
+        return INTERNAL_TYPES if self.full_load else ALL_TYPES
+
+    def active_mask(self):
+        """目前有效請求的樓層位元集合（緊急模式下僅內部請求）"""
+        return self.requests.mask(self.active_types())
+
+    def get_active_requests(self):
+        if self.full_load:
+            return self.internal_requests
+        return self.internal_requests + self.external_requests
+
+    def get_status_text(self):
+        if self.full_load:
+            first = self.requests.first(ButtonType.INTERNAL)
+            if first is None:
+                return "等待緊急請求"
+            else:
+                target = first.floor
+                return f"前往{target}樓"
+        else:
+            active = self.get_active_requests()
+            reqs = "無請求" if not active else ", ".join(f"{req.floor}" for req in active)
+            return reqs
+
+    def process_requests(self):
+        if self.is_moving_flag:
+            return
+        if not self.active_mask():
+            self._emit("idle")
+            return
+        next_stop = self.get_next_stop()
+        if next_stop is not None:
+            self.target_floor = next_stop
+            if self.target_floor > self.current_floor:
+                self.direction = Direction.UP
+            elif self.target_floor < self.current_floor:
+                self.direction = Direction.DOWN
+            else:
+                self.direction = Direction.IDLE
+            self._emit("depart", target=self.target_floor)
+            self.animate_movement(self.current_floor, self.target_floor, frames=self.trip_frames)
+
+    def get_next_stop(self):
+        """依派車策略決定下一站，並記錄每次決策的 CPU 時間"""
+        start = time.perf_counter()
+        if self.policy is None:
+            stop = self.nearest_directional_stop()
+        else:
+            stop = self.policy.next_stop(self)
+        self.decision_times.append(time.perf_counter() - start)
+        return stop
+
+    def intercept_types(self):
+        """行駛中可順路停靠的按鈕類型；空 tuple 代表不允許中途停靠"""
+        if self.policy is not None:
+            return self.policy.intercept_types(self)
+        if self.direction == Direction.UP:
+            return (ButtonType.UP, ButtonType.INTERNAL)
+        if self.direction == Direction.DOWN:
+            return (ButtonType.DOWN, ButtonType.INTERNAL)
+        return ()
+
+    def nearest_directional_stop(self):
+        """ElevatorControlSim.get_next_stop：順向最近一站，否則最近的請求"""
+        mask = self.active_mask()
+        if not mask:
+            return None
+        current = self.current_floor
+        above = next_above(mask, current)
+        below = next_below(mask, current)
+        if self.direction == Direction.UP and above is not None:
+            return above
+        if self.direction == Direction.DOWN and below is not None:
+            return below
+        if mask >> current & 1:
+            return current
+        if above is None:
+            return below
+        if below is None:
+            return above
+        if above - current != current - below:
+            return above if above - current < current - below else below
+        # 同距離時取在請求串列中較早出現者（內部請求排在外部請求之前）
+        return min((above, below), key=self._request_rank)
+
+    def _request_rank(self, floor):
+        seq = self.requests.first_seq(floor, INTERNAL_TYPES)
+        if seq is not None:
+            return (0, seq)
+        return (1, self.requests.first_seq(floor, EXTERNAL_TYPES))
+
+    def remove_completed_requests(self):
+        self.requests.clear_floor(self.current_floor, self.active_types())
+
+    def position(self):
+        """電梯目前位置（以樓層為單位的浮點數）"""
+        now = self.now
+        if not self.is_moving_flag or now >= self._seg_t1:
+            return self._seg_p1
+        if self._seg_t1 <= self._seg_t0:
+            return self._seg_p1
+        frac = (now - self._seg_t0) / (self._seg_t1 - self._seg_t0)
+        return self._seg_p0 + (self._seg_p1 - self._seg_p0) * frac
+
+    def velocity(self):
+        """目前速度（樓層/秒，向下為負）"""
+        if not self.is_moving_flag or self._seg_t1 <= self._seg_t0 or self.now >= self._seg_t1:
+            return 0.0
+        return (self._seg_p1 - self._seg_p0) / (self._seg_t1 - self._seg_t0)
+
+    def stopping_distance(self):
+        """以目前速度減速到停止所需的樓層數 v²/2a"""
+        velocity = self.velocity()
+        return velocity * velocity / (2 * self.deceleration)
+
+    def _intercept(self, floor, button_type):
+        """新請求到達時判斷是否改為先停 floor：必須在行進方向前方、目標之前，且仍來得及煞停"""
+        if self.full_load or button_type not in self.intercept_types():
+            return
+        current = self.position()
+        margin = self.stopping_distance()
+        if self.direction == Direction.UP:
+            reachable = current + margin <= floor < self.target_floor
+        elif self.direction == Direction.DOWN:
+            reachable = self.target_floor < floor <= current - margin
+        else:
+            reachable = False
+        if reachable:
+            self._retarget(floor, current)
+
+    def _travel_time(self, distance, frames):
+        if self.floor_time is None:
+            return frames * self.frame_interval
+        return max(abs(distance) * self.floor_time, self.frame_interval)
+
+    def _set_segment(self, p0, p1, duration):
+        self._seg_t0 = self.now
+        self._seg_p0 = p0
+        self._seg_t1 = self.now + duration
+        self._seg_p1 = float(p1)
+        self.clock.cancel(self._arrival_event)
+        self._arrival_event = self.clock.schedule(duration, self._arrive, self._motion_id)
+
+    def animate_movement(self, start_floor, end_floor, frames):
+        self.is_moving_flag = True
+        self.anim_start_floor = start_floor
+        self.target_floor = end_floor
+        self._motion_id += 1
+        self.trips += 1
+        self._set_segment(float(start_floor), end_floor, self._travel_time(end_floor - start_floor, frames))
+        if self.intercept == "poll":
+            self._recheck(self._motion_id)
+
+    def _recheck(self, motion_id):
+        """對應動畫每 20 幀一次的中途請求檢查"""
+        if motion_id != self._motion_id or not self.is_moving_flag or self.now >= self._seg_t1 - 1e-9:
+            return
+        types = self.intercept_types()
+        if not self.full_load and types:
+            current = self.position()
+            if self.direction == Direction.UP:
+                mask = self.requests.mask(types)
+                # 介於起點與目標之間、且尚未經過（樓層 > 目前位置）的最低樓層
+                new_target = next_above(mask, max(self.anim_start_floor, math.floor(current)))
+                if new_target is not None and new_target < self.target_floor:
+                    self._retarget(new_target, current)
+            elif self.direction == Direction.DOWN:
+                mask = self.requests.mask(types)
+                new_target = next_below(mask, min(self.anim_start_floor, math.ceil(current)))
+                if new_target is not None and new_target > self.target_floor:
+                    self._retarget(new_target, current)
+        self.clock.schedule(self.recheck_frames * self.frame_interval, self._recheck, motion_id)
+
+    def _retarget(self, new_target, current):
+        self._log(f"中途請求：改為先停 {new_target} 樓")
+        self.target_floor = new_target
+        velocity = self.velocity()
+        if self.intercept == "event" and velocity:
+            # 維持目前速度繼續行駛到新目標
+            duration = abs((new_target - current) / velocity)
+        else:
+            duration = self._travel_time(new_target - current, self.recheck_frames)
+        self._set_segment(current, new_target, duration)
+        self._emit("retarget", target=new_target)
+
+    def _arrive(self, motion_id):
+        if motion_id != self._motion_id:
+            return
+        self._arrival_event = None
+        self.current_floor = self.target_floor
+        self._seg_p0 = self._seg_p1 = float(self.current_floor)
+        self._seg_t0 = self._seg_t1 = self.now
+        self.is_moving_flag = False
+        left_behind = self._exchange_passengers()
+        self.remove_completed_requests()
+        for button_type in left_behind:
+            # 因滿載沒搭上的乘客重新按下外部按鈕
+            self.add_request(self.current_floor, button_type)
+        self._emit("arrive", floor=self.current_floor)
+        if not self.full_load and self.pending_external_requests:
+            while self.pending_external_requests:
+                req = self.pending_external_requests.popleft()
+                self.add_request(req.floor, req.button_type)
+        self.clock.schedule(self.door_dwell + self.reprocess_delay, self.process_requests)
+
+    def _exchange_passengers(self):
+        """乘客下車、上車；回傳因滿載留在原樓層的乘客方向"""
+        floor = self.current_floor
+        now = self.now
+        alighting = self.riding.pop(floor, ())
+        for passenger in alighting:
+            passenger.alight_time = now
+            self.ride_times.append(now - passenger.board_time)
+        self.riders -= len(alighting)
+        self._update_occupancy()
+        if self.full_load:
+            return ()
+        boarding = self.waiting.pop(floor, None)
+        if not boarding:
+            return ()
+        for index, passenger in enumerate(boarding):
+            if self.penetration_threshold is not None and self.load_ratio() >= self.penetration_threshold:
+                remaining = boarding[index:]
+                self.waiting[floor] = remaining
+                self._update_occupancy()
+                return {ButtonType.UP if p.destination > floor else ButtonType.DOWN for p in remaining}
+            passenger.board_time = now
+            self.wait_times.append(now - passenger.arrival_time)
+            self.riding.setdefault(passenger.destination, []).append(passenger)
+            self.riders += 1
+            self.add_request(passenger.destination, ButtonType.INTERNAL)
+        self._update_occupancy()
+        return ()
+
+    def run(self, until=None, max_events=None):
+        return self.clock.run(until=until, max_events=max_events)
+
+    def summary(self):
+        """回傳目前的服務統計"""
+        waits = self.wait_times
+        rides = self.ride_times
+        return {
+            "served": len(rides),
+            "boarded": len(waits),
+            "waiting": sum(len(v) for v in self.waiting.values()),
+            "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+            "max_wait": max(waits) if waits else 0.0,
+            "avg_ride": sum(rides) / len(rides) if rides else 0.0,
+            "trips": self.trips,
+            "sim_time": self.now,
+        }
+
+
+def random_arrivals(num_floors, rate, duration, seed=None):
+    """簡單的均勻 Poisson 到站序列 (time, origin, destination)"""
+    rng = random.Random(seed)
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate)
+        if t > duration:
+            return
+        origin = rng.randint(1, num_floors)
+        destination = rng.randint(1, num_floors - 1)
+        if destination >= origin:
+            destination += 1
+        yield t, origin, destination
+
+
+if __name__ == "__main__":
+    day = 24 * 3600
+    engine = ElevatorEngine(num_floors=3)
+    engine.feed(random_arrivals(3, rate=1 / 60, duration=day, seed=1))
+    start = time.perf_counter()
+    engine.run(until=day)
+    elapsed = time.perf_counter() - start
+    print(f"模擬 {day / 3600:.0f} 小時完成，耗時 {elapsed:.2f} 秒")
+    for key, value in engine.summary().items():
+        print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
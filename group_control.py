@@ -0,0 +1,174 @@
+import math
+import time
+from elevator_engine import ButtonType, Direction, ElevatorEngine, SimClock, random_arrivals
+from request_index import count_between, highest, lowest
+
+
+class GroupController:
+    """K 部電梯 × F 層的群控系統：以成本函數把每個外部呼叫指派給預估最快到達的電梯
+
+    所有電梯共用同一個虛擬時鐘；每部電梯仍是一個 ElevatorEngine，
+    只接收指派給它的外部呼叫與自己車廂內的內部呼叫。
+    """
+
+    def __init__(self, num_cars, num_floors, floor_time=1.5, stop_penalty=2.0, start_floors=None,
+                 clock=None, verbose=False, **engine_kwargs):
+        self.clock = clock if clock is not None else SimClock()
+        self.num_floors = num_floors
+        self.floor_time = floor_time
+        self.stop_penalty = stop_penalty
+        self.verbose = verbose
+        if start_floors is None:
+            start_floors = [1] * num_cars
+        self.cars = []
+        for index in range(num_cars):
+            car = ElevatorEngine(num_floors=num_floors, start_floor=start_floors[index], clock=self.clock,
+                                 floor_time=floor_time, **engine_kwargs)
+            car.car_id = index
+            car.add_listener(self._on_car_event)
+            self.cars.append(car)
+
+        # (樓層, 按鈕方向) → 負責的電梯編號
+        self.assignments = {}
+        self.decisions = 0
+        self.decision_time_total = 0.0
+        self.decision_time_max = 0.0
+
+    @property
+    def now(self):
+        return self.clock.now
+
+    def _on_car_event(self, event, car, **data):
+        if event == "arrive" and not car.full_load:
+            floor = data["floor"]
+            for button_type in (ButtonType.UP, ButtonType.DOWN):
+                if self.assignments.get((floor, button_type)) == car.car_id:
+                    del self.assignments[(floor, button_type)]
+
+    def cost(self, car, floor, button_type):
+        """預估 car 抵達 floor 的時間（秒）：行駛距離 × floor_time + 途中停靠數 × stop_penalty"""
+        if car.full_load:
+            # 緊急模式下的電梯不會服務外部呼叫
+            return float("inf")
+        position = car.position()
+        mask = car.active_mask()
+        if not mask and not car.is_moving_flag:
+            return abs(floor - position) * self.floor_time
+        if car.is_moving_flag:
+            mask |= 1 << car.target_floor
+
+        direction = car.direction
+        call_dir = button_type.value
+        if direction == Direction.UP:
+            reach = max(highest(mask), position)
+            if floor >= position and call_dir != Direction.DOWN.value:
+                distance = floor - position
+                low, high = position, floor
+            else:
+                distance = (reach - position) + abs(reach - floor)
+                low, high = min(position, floor), reach
+        elif direction == Direction.DOWN:
+            reach = min(lowest(mask), position)
+            if floor <= position and call_dir != Direction.UP.value:
+                distance = position - floor
+                low, high = floor, position
+            else:
+                distance = (position - reach) + abs(floor - reach)
+                low, high = reach, max(position, floor)
+        else:
+            distance = abs(floor - position)
+            low, high = min(position, floor), max(position, floor)
+
+        stops = count_between(mask, math.floor(low), math.ceil(high))
+        return distance * self.floor_time + stops * self.stop_penalty
+
+    def hall_call(self, floor, button_type):
+        """處理外部呼叫：同一樓層同方向已指派時沿用原電梯，否則選擇成本最低的電梯"""
+        start = time.perf_counter()
+        key = (floor, button_type)
+        car_id = self.assignments.get(key)
+        if car_id is not None and self.cars[car_id].full_load:
+            # 原電梯滿載，改派前移除它登記與暫存的同一呼叫，避免解除滿載後重複前往
+            old_car = self.cars[car_id]
+            old_car.requests.clear_floor(floor, (button_type,))
+            pending = old_car.pending_external_requests
+            for req in [r for r in pending if r.floor == floor and r.button_type == button_type]:
+                pending.remove(req)
+            car_id = None
+        if car_id is None:
+            best_cost = float("inf")
+            car_id = 0
+            for car in self.cars:
+                cost = self.cost(car, floor, button_type)
+                if cost < best_cost:
+                    best_cost = cost
+                    car_id = car.car_id
+            self.assignments[key] = car_id
+            if self.verbose:
+                print(f"外部請求：樓層 {floor}，方向：{button_type.name} → 電梯 {car_id}（預估 {best_cost:.1f} 秒）")
+        elapsed = time.perf_counter() - start
+        self.decisions += 1
+        self.decision_time_total += elapsed
+        self.decision_time_max = max(self.decision_time_max, elapsed)
+        self.cars[car_id].add_request(floor, button_type)
+        return car_id
+
+    def car_call(self, car_id, floor):
+        """電梯 car_id 車廂內的樓層按鈕"""
+        return self.cars[car_id].add_request(floor, ButtonType.INTERNAL)
+
+    def add_passenger(self, origin, destination):
+        if origin == destination:
+            return None
+        button_type = ButtonType.UP if destination > origin else ButtonType.DOWN
+        car_id = self.hall_call(origin, button_type)
+        # 乘客只搭乘指派給他的電梯；外部呼叫已登記，這裡只記錄等候
+        car = self.cars[car_id]
+        return car.add_passenger(origin, destination)
+
+    def feed(self, arrivals):
+        """逐筆排程 (time, origin, destination) 到站事件"""
+        iterator = iter(arrivals)
+
+        def schedule_next():
+            for arrival_time, origin, destination in iterator:
+                self.clock.schedule_at(arrival_time, on_arrival, origin, destination)
+                return
+
+        def on_arrival(origin, destination):
+            self.add_passenger(origin, destination)
+            schedule_next()
+
+        schedule_next()
+
+    def run(self, until=None, max_events=None):
+        return self.clock.run(until=until, max_events=max_events)
+
+    def summary(self):
+        waits = [w for car in self.cars for w in car.wait_times]
+        rides = [r for car in self.cars for r in car.ride_times]
+        return {
+            "served": len(rides),
+            "boarded": len(waits),
+            "waiting": sum(len(v) for car in self.cars for v in car.waiting.values()),
+            "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+            "max_wait": max(waits) if waits else 0.0,
+            "avg_ride": sum(rides) / len(rides) if rides else 0.0,
+            "trips": sum(car.trips for car in self.cars),
+            "decisions": self.decisions,
+            "avg_decision_ms": self.decision_time_total / self.decisions * 1000 if self.decisions else 0.0,
+            "max_decision_ms": self.decision_time_max * 1000,
+            "sim_time": self.now,
+        }
+
+
+if __name__ == "__main__":
+    cars, floors, duration = 8, 60, 3600
+    group = GroupController(cars, floors)
+    group.feed(random_arrivals(floors, rate=1 / 4, duration=duration, seed=1))
+    start = time.perf_counter()
+    group.run(until=duration)
+    elapsed = time.perf_counter() - start
+    print(f"{cars} 部電梯 × {floors} 層，模擬 {duration / 3600:.0f} 小時，耗時 {elapsed:.2f} 秒")
+    for key, value in group.summary().items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
@@ -0,0 +1,244 @@
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from vision_pipeline import PenetrationDetector
+
+
+class SharedFrameRing:
+    """放在 multiprocessing.shared_memory 中的固定大小影格環形緩衝區
+
+    開頭是 (slots + 1) 個 int64：[最新序號, 各 slot 的序號...]，後面是 slots 張影格。
+    寫入端先把 slot 序號設為 -1、複製影格、再寫入序號；讀取端複製後再檢查一次序號，
+    若 slot 在複製期間被覆寫就重讀，因此不需要鎖，也不需要 pickle 任何影格。
+    """
+
+    def __init__(self, shape, slots=4, name=None, create=True):
+        self.shape = tuple(shape)
+        self.slots = slots
+        header_bytes = 8 * (slots + 1)
+        frame_bytes = int(np.prod(self.shape))
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=header_bytes + frame_bytes * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._owner = create
+        self._header = np.ndarray((slots + 1,), np.int64, buffer=self.shm.buf)
+        self._frames = np.ndarray((slots,) + self.shape, np.uint8, buffer=self.shm.buf, offset=header_bytes)
+        if create:
+            self._header[:] = -1
+            self._header[0] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def attach(cls, name, shape, slots):
+        return cls(shape, slots, name=name, create=False)
+
+    def latest_seq(self):
+        return int(self._header[0])
+
+    def write(self, frame):
+        """寫入一張影格，回傳其序號（從 1 開始）"""
+        seq = int(self._header[0]) + 1
+        slot = 1 + seq % self.slots
+        self._header[slot] = -1
+        np.copyto(self._frames[slot - 1], frame)
+        self._header[slot] = seq
+        self._header[0] = seq
+        return seq
+
+    def read_latest(self, out=None, retries=3):
+        """把最新影格複製到 out，回傳 (序號, 影格)；尚無影格時回傳 (0, None)"""
+        for _ in range(retries):
+            seq = int(self._header[0])
+            if seq == 0:
+                return 0, None
+            slot = 1 + seq % self.slots
+            if self._header[slot] != seq:
+                continue
+            if out is None:
+                out = np.empty(self.shape, np.uint8)
+            np.copyto(out, self._frames[slot - 1])
+            if self._header[slot] == seq:
+                return seq, out
+        return 0, None
+
+    def close(self):
+        self._header = None
+        self._frames = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _detector_worker(index, ring_name, shape, slots, ratios, frame_ids, processed, latencies, stop_event,
+                     detector_kwargs):
+    """每部攝影機一個行程：讀取環形緩衝區的最新影格並把突破量（0–1）寫回共享陣列"""
+    ring = SharedFrameRing.attach(ring_name, shape, slots)
+    detector = PenetrationDetector(**detector_kwargs)
+    frame = np.empty(shape, np.uint8)
+    last_seq = 0
+    try:
+        while not stop_event.is_set():
+            seq = ring.latest_seq()
+            if seq == last_seq:
+                time.sleep(0.002)
+                continue
+            seq, _ = ring.read_latest(frame)
+            if not seq:
+                continue
+            last_seq = seq
+            start = time.perf_counter()
+            result = detector.process(frame)
+            processed[index] += 1
+            if result.ready:
+                ratios[index] = result.ratio / 100
+                frame_ids[index] = seq
+                latencies[index] = time.perf_counter() - start
+    finally:
+        ring.close()
+
+
+class OccupancyService:
+    """多部電梯的車廂佔用偵測服務
+
+    每部攝影機一個擷取執行緒（cv2.VideoCapture.read 會釋放 GIL）與一個偵測行程；
+    影格經由 SharedFrameRing 傳遞，偵測結果放在 mp.Array 中，主程式（群控或 GUI）
+    以 load_ratios() 讀取或以 update_controller() 直接套用到各部電梯的滿載模式。
+    sources 的元素可為攝影機編號、影片路徑，或會產生 BGR 影格的可疊代物件。
+    """
+
+    def __init__(self, sources, frame_shape=(480, 640, 3), slots=4, detector_kwargs=None, fps_limit=None):
+        self.sources = list(sources)
+        self.frame_shape = tuple(frame_shape)
+        self.slots = slots
+        self.detector_kwargs = detector_kwargs or {}
+        self.fps_limit = fps_limit
+        count = len(self.sources)
+        self.ratios = mp.Array("d", count, lock=False)
+        self.frame_ids = mp.Array("q", count, lock=False)
+        self.processed = mp.Array("q", count, lock=False)
+        self.latencies = mp.Array("d", count, lock=False)
+        self.captured = [0] * count
+        self.rings = []
+        self.processes = []
+        self.threads = []
+        self._stop_event = mp.Event()
+
+    def start(self):
+        for index, source in enumerate(self.sources):
+            ring = SharedFrameRing(self.frame_shape, self.slots)
+            self.rings.append(ring)
+            process = mp.Process(target=_detector_worker, daemon=True,
+                                 args=(index, ring.name, self.frame_shape, self.slots, self.ratios,
+                                       self.frame_ids, self.processed, self.latencies, self._stop_event,
+                                       self.detector_kwargs))
+            process.start()
+            self.processes.append(process)
+            thread = threading.Thread(target=self._capture_loop, args=(index, source, ring), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def _frames(self, source):
+        if isinstance(source, (int, str)):
+            capture = cv2.VideoCapture(source)
+            try:
+                while not self._stop_event.is_set():
+                    ret, frame = capture.read()
+                    if not ret:
+                        return
+                    yield frame
+            finally:
+                capture.release()
+        else:
+            yield from source
+
+    def _capture_loop(self, index, source, ring):
+        height, width = self.frame_shape[:2]
+        interval = 1.0 / self.fps_limit if self.fps_limit else 0.0
+        for frame in self._frames(source):
+            if self._stop_event.is_set():
+                break
+            started = time.perf_counter()
+            if frame.shape != self.frame_shape:
+                frame = cv2.resize(frame, (width, height))
+            ring.write(frame)
+            self.captured[index] += 1
+            if interval:
+                time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+    def load_ratios(self):
+        """各部電梯目前的突破量（0–1）"""
+        return list(self.ratios)
+
+    def latest_frame(self, index, out=None):
+        """取得某部攝影機最新的影格（供預覽），沒有影格時回傳 None"""
+        return self.rings[index].read_latest(out)[1]
+
+    def update_controller(self, controller, threshold=0.15):
+        """依各部電梯的突破量切換滿載模式；controller 可為 GroupController 或電梯串列
+
+        設有 penetration_threshold 的 ElevatorEngine 交給引擎自己的閾值判斷
+        （observe_load_ratio），避免到站時的人數估計把攝影機的結果蓋掉；
+        其餘電梯以 threshold 判斷。
+        """
+        cars = getattr(controller, "cars", controller)
+        for car, ratio in zip(cars, self.ratios):
+            if getattr(car, "penetration_threshold", None) is not None:
+                car.observe_load_ratio(ratio)
+                continue
+            full = ratio >= threshold
+            if car.full_load != full:
+                car.set_full_load(full)
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for ring in self.rings:
+            ring.close()
+        self.rings = []
+
+
+if __name__ == "__main__":
+    from vision_benchmark import synthetic_frames
+
+    # 模擬 4 部 30 fps 的攝影機
+    cameras, frames = 4, 150
+    detector_kwargs = dict(warmup_frames=10, process_size=(320, 240))
+
+    start = time.perf_counter()
+    for camera in range(cameras):
+        detector = PenetrationDetector(**detector_kwargs)
+        for frame in synthetic_frames(frames, seed=camera):
+            detector.process(frame)
+    serial_fps = cameras * frames / (time.perf_counter() - start)
+
+    service = OccupancyService([synthetic_frames(frames, seed=camera) for camera in range(cameras)],
+                               detector_kwargs=detector_kwargs, fps_limit=30)
+    start = time.perf_counter()
+    service.start()
+    for thread in service.threads:
+        thread.join()
+    # 等待每個偵測行程處理完最後一張影格
+    while any(service.frame_ids[i] < service.captured[i] for i in range(cameras)):
+        if time.perf_counter() - start > 30:
+            break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    processed = sum(service.processed)
+    print(f"單一行程依序處理：{serial_fps:.0f} fps")
+    print(f"{cameras} 個偵測行程（CPU 核心 {mp.cpu_count()} 個）：擷取 {sum(service.captured)} 幀，"
+          f"偵測 {processed} 幀，{processed / elapsed:.0f} fps（其餘因只取最新影格而略過）")
+    print(f"各車突破量：{[round(r, 3) for r in service.load_ratios()]}")
+    service.stop()
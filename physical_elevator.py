@@ -1,53 +1,67 @@
 import tkinter as tk
-from tkinter import ttk
 import time
 import cv2
-import numpy as np
 from PIL import Image, ImageTk
-import serial
-import serial.tools.list_ports
 import threading
-import glob
+import asyncio
+import concurrent.futures
+from arduino_protocol import ArduinoLink, CommandQueue
+from port_discovery import discover
+from stop_sequence import StopSequence
+from vision_pipeline import AdaptiveFrameScheduler, CaptureWorker, OccupancyStateMachine, PenetrationDetector
 
 class ArduinoController:
-    def __init__(self, baud_rate=9600):
+    def __init__(self, baud_rate=9600, binary=False, ports=None):
         self.baud_rate = baud_rate
-        self.serial = None
+        self.binary = binary  # True：連線後切換為二進位訊框（COBS + CRC-8），False：文字模式方便除錯
+        self.ports = ports  # 指定候選串口（例如 virtual_arduino 的 pty），None 表示自動偵測
+        self.link = None
+        self.commands = None  # 命令確認佇列，每次連線重新建立
         self.connected = False
-        self.receive_thread = None
         self.running = False
         self.position_callback = None
         self.connection_callback = None
         self.status_callback = None
-        self.last_ping_time = 0
         self.ping_interval = 5  # 5秒ping一次
+        self.ready_timeout = 5  # 等待Arduino重置完成回應PONG的上限
+        self._tasks = []
+        # 串口收發在背景執行緒的 asyncio 事件迴圈中進行，資料一到就處理，不再輪詢
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.loop_thread.start()
+        self._handlers = {
+            "PONG": lambda event: None,  # ping回應，連接正常
+            "ACK": lambda event: None,  # 二進位模式的命令確認
+            "BINARY": lambda event: None,  # 切換模式的回覆，由ArduinoLink處理
+            "POS": self.on_position,
+            "MOVE_START": self.on_move_start,
+            "MOVE_COMPLETE": self.on_move_complete,
+            "PROGRESS": self.on_progress,
+            "STATUS": self.on_status,
+            "LIMIT": self.on_limit,
+            "ERROR": self.on_error,
+            "TEXT": self.on_text,
+        }
         self.connect()
         
+    def find_ports(self):
+        """平行探測候選串口，回傳回應PONG:ELEVATOR的串口（優先探測上次成功的串口）"""
+        found = discover("ELEVATOR", self.baud_rate, timeout=self.ready_timeout, ports=self.ports,
+                         use_cache=self.ports is None)
+        if found is None:
+            return []
+        source = "快取" if found.cached else "平行探測"
+        print(f"🔍 找到Arduino串口: {found.port}（{source}，{found.elapsed * 1000:.0f} ms）")
+        return [found.port]
+        
     def connect(self):
-        """連接Arduino"""
+        """連接Arduino（在背景事件迴圈中執行，此處等待結果）"""
+        return asyncio.run_coroutine_threadsafe(self._connect(), self.loop).result()
+        
+    async def _connect(self):
         try:
-            # 尋找所有可能的串口
-            import serial.tools.list_ports
-            ports = list(serial.tools.list_ports.comports())
-            arduino_ports = []
-            
-            for port in ports:
-                # 檢查是否為Arduino相關的串口
-                if ('Arduino' in port.description or 
-                    'CH340' in port.description or 
-                    'USB' in port.description or
-                    port.device.startswith('/dev/cu.usbmodem') or
-                    port.device.startswith('/dev/cu.usbserial')):
-                    arduino_ports.append(port.device)
-                    
-            print(f"找到的串口: {[port.device for port in ports]}")
-            print(f"Arduino候選串口: {arduino_ports}")
-            
-            if not arduino_ports:
-                # 如果沒找到，使用舊的方法
-                import glob
-                arduino_ports = glob.glob('/dev/cu.usbmodem*') + glob.glob('/dev/cu.usbserial*')
-                
+            # 探測會阻塞數秒（等待Arduino重置），放到執行緒中避免卡住事件迴圈
+            arduino_ports = await asyncio.get_running_loop().run_in_executor(None, self.find_ports)
             if not arduino_ports:
                 print("❌ 找不到 Arduino 串口，請確認 Arduino 已連接並安裝驅動")
                 self.connected = False
@@ -57,30 +71,31 @@ class ArduinoController:
                 
             # 嘗試連接每個候選串口
             for port in arduino_ports:
+                link = None
                 try:
                     print(f"🔄 嘗試連接串口: {port}")
-                    self.serial = serial.Serial(port, self.baud_rate, timeout=1)
-                    time.sleep(2)  # 等待Arduino重置
-                    
-                    # 測試連接
-                    self.serial.write(b"PING\n")
-                    time.sleep(0.5)
+                    link = await ArduinoLink(port, self.baud_rate).open()
+                    # 開啟串口會使Arduino重置：一收到PONG就繼續，不再固定等待
+                    if not await link.wait_ready(timeout=self.ready_timeout):
+                        raise TimeoutError(f"{self.ready_timeout}秒內沒有回應PING")
+                    if self.binary:
+                        await link.enable_binary()
+                        print("🔢 已切換為二進位訊框模式")
                     
+                    self.link = link
+                    self.commands = CommandQueue(link)
                     self.connected = True
                     self.running = True
                     print(f"✅ Arduino 控制器連接成功: {port}")
                     
-                    # 啟動接收執行緒
-                    if self.receive_thread and self.receive_thread.is_alive():
-                        self.running = False
-                        self.receive_thread.join(timeout=1)
-                        
-                    self.receive_thread = threading.Thread(target=self.receive_data, daemon=True)
-                    self.receive_thread.start()
+                    # 啟動接收、ping與命令佇列任務
+                    self._cancel_tasks()
+                    self._tasks = [asyncio.ensure_future(self.receive_events(link)),
+                                   asyncio.ensure_future(self.keepalive(link, self.commands)),
+                                   asyncio.ensure_future(self.commands.run())]
                     
                     # 連接成功後立即初始化電梯在1樓
-                    time.sleep(0.5)  # 等待Arduino完全準備好
-                    self.send_command("INIT")
+                    self._submit(self.commands, "INIT")
                     
                     if self.connection_callback:
                         self.connection_callback(True, f"已連接到 {port}")
@@ -88,12 +103,8 @@ class ArduinoController:
                     
                 except Exception as e:
                     print(f"❌ 串口 {port} 連接失敗: {e}")
-                    if self.serial:
-                        try:
-                            self.serial.close()
-                        except:
-                            pass
-                        self.serial = None
+                    if link is not None:
+                        link.close()
                     continue
                     
             print("❌ 所有串口連接嘗試都失敗")
@@ -116,135 +127,130 @@ class ArduinoController:
         time.sleep(1)
         return self.connect()
         
-    def receive_data(self):
-        """接收來自Arduino的數據"""
-        buffer = ""
-        while self.running and self.connected:
+    async def receive_events(self, link):
+        """接收來自Arduino的事件（資料到達時由事件迴圈立即喚醒）"""
+        async for event in link.events():
+            if event.kind == "DISCONNECTED":
+                break
+            self.process_arduino_event(event)
+        if not self.running or link is not self.link:
+            return
+        # 非主動關閉：串口連接丟失，嘗試自動重連
+        error = event.data["error"] or "串口已關閉"
+        print(f"❌ 串口連接丟失: {error}")
+        self.connected = False
+        if self.connection_callback:
+            self.connection_callback(False, f"連接丟失: {error}")
+        # 板子可能還在重新列舉或重置：持續重試（間隔逐次加倍，最多10秒），直到連上或被關閉
+        delay = 1
+        while True:
+            await asyncio.sleep(delay)
+            if not self.running or self.connected or await self._connect():
+                return
+            delay = min(delay * 2, 10)
+        
+    async def keepalive(self, link, commands):
+        """定期發送ping檢查連接
+        
+        經由命令佇列送出，序號與其他命令一起遞增；直接寫入串口的PING會插在命令與其重送之間，
+        Arduino會把重送誤認為新命令而再執行一次
+        """
+        while link.connected:
+            await asyncio.sleep(self.ping_interval)
             try:
-                if self.serial and self.serial.in_waiting > 0:
-                    data = self.serial.read(self.serial.in_waiting).decode('utf-8', errors='ignore')
-                    buffer += data
-                    
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        line = line.strip()
-                        if line:
-                            self.process_arduino_message(line)
-                            
-                # 定期發送ping檢查連接
-                current_time = time.time()
-                if current_time - self.last_ping_time > self.ping_interval:
-                    self.send_ping()
-                    self.last_ping_time = current_time
-                    
-                time.sleep(0.01)
-                
-            except serial.SerialException as e:
-                print(f"❌ 串口連接丟失: {e}")
-                self.connected = False
-                if self.connection_callback:
-                    self.connection_callback(False, f"連接丟失: {e}")
-                # 嘗試自動重連
-                if self.reconnect():
-                    continue
-                else:
-                    break
-                    
-            except Exception as e:
-                print(f"❌ 接收數據錯誤: {e}")
-                time.sleep(0.1)  # 避免快速循環
-                
-    def send_ping(self):
-        """發送ping檢查連接"""
-        try:
-            if self.connected and self.serial:
-                self.serial.write(b"PING\n")
-        except:
-            pass  # ping失敗不報錯，由receive_data處理
+                await commands.submit("PING")
+            except (ConnectionError, TimeoutError):
+                continue  # ping未獲確認不報錯，由receive_events處理斷線
             
-    def process_arduino_message(self, message):
-        """處理來自Arduino的訊息"""
+    def process_arduino_event(self, event):
+        """依訊息種類分派來自Arduino的事件"""
         try:
-            if message == "PONG":
-                # ping回應，連接正常
-                return
-                
-            if message.startswith("POS:"):
-                # 位置回報: POS:floor
-                floor = int(message.split(":")[1])
-                print(f"📍 位置更新: {floor}樓")
-                if self.position_callback:
-                    self.position_callback(floor)
-                    
-            elif message.startswith("MOVE_START:"):
-                # 移動開始: MOVE_START:floor
-                floor = int(message.split(":")[1])
-                print(f"🚀 Arduino開始移動到 {floor} 樓")
-                
-            elif message.startswith("MOVE_COMPLETE:"):
-                # 移動完成: MOVE_COMPLETE:floor
-                floor = int(message.split(":")[1])
-                print(f"✅ Arduino移動完成，到達 {floor} 樓")
-                if self.position_callback:
-                    self.position_callback(floor)
-                    
-            elif message.startswith("PROGRESS:"):
-                # 移動進度: PROGRESS:percentage%
-                progress = message.split(":")[1]
-                print(f"📊 移動進度: {progress}")
-                
-            elif message.startswith("STATUS:"):
-                # 狀態回報: STATUS:current:target:moving:emergency
-                parts = message.split(":")
-                if len(parts) >= 5:
-                    current_floor = int(parts[1])
-                    target_floor = int(parts[2])
-                    moving = parts[3] == "MOVING"
-                    emergency = parts[4] == "EMERGENCY"
-                    if self.status_callback:
-                        self.status_callback(current_floor, target_floor, moving, emergency)
-                        
-            elif message.startswith("LIMIT:"):
-                # 微動開關觸發: LIMIT:top/bottom
-                limit_type = message.split(":")[1]
-                print(f"⚡ 微動開關觸發: {limit_type}")
-                
-            elif message.startswith("ERROR:"):
-                # 錯誤訊息
-                error = message.split(":", 1)[1]
-                print(f"❌ Arduino錯誤: {error}")
-                
-            elif "校準" in message or "calibrat" in message.lower():
-                # 校準相關訊息
-                print(f"🔧 校準: {message}")
-                
-            elif "初始化" in message or "init" in message.lower():
-                # 初始化相關訊息
-                print(f"🏠 初始化: {message}")
-                
-            else:
-                # 其他訊息
-                print(f"📨 Arduino: {message}")
-                
+            self._handlers[event.kind](event)
         except Exception as e:
-            print(f"❌ 處理Arduino訊息錯誤: {e}, 原始訊息: {message}")
+            print(f"❌ 處理Arduino訊息錯誤: {e}, 原始訊息: {event.raw}")
+            
+    def on_position(self, event):
+        # 位置回報: POS:floor
+        floor = event.data["floor"]
+        print(f"📍 位置更新: {floor}樓")
+        if self.position_callback:
+            self.position_callback(floor)
+            
+    def on_move_start(self, event):
+        # 移動開始: MOVE_START:floor
+        print(f"🚀 Arduino開始移動到 {event.data['floor']} 樓")
+        
+    def on_move_complete(self, event):
+        # 移動完成: MOVE_COMPLETE:floor
+        floor = event.data["floor"]
+        print(f"✅ Arduino移動完成，到達 {floor} 樓")
+        if self.position_callback:
+            self.position_callback(floor)
+            
+    def on_progress(self, event):
+        # 移動進度: PROGRESS:percentage%
+        print(f"📊 移動進度: {event.data['percent']}%")
+        
+    def on_status(self, event):
+        # 狀態回報: STATUS:current:target:moving:emergency
+        if self.status_callback:
+            data = event.data
+            self.status_callback(data["current"], data["target"], data["moving"], data["emergency"])
+            
+    def on_limit(self, event):
+        # 微動開關觸發: LIMIT:top/bottom
+        print(f"⚡ 微動開關觸發: {event.data['switch']}")
+        
+    def on_error(self, event):
+        # 錯誤訊息
+        print(f"❌ Arduino錯誤: {event.data['message']}")
+        
+    def on_text(self, event):
+        message = event.raw
+        if "校準" in message or "calibrat" in message.lower():
+            # 校準相關訊息
+            print(f"🔧 校準: {message}")
+        elif "初始化" in message or "init" in message.lower():
+            # 初始化相關訊息
+            print(f"🏠 初始化: {message}")
+        else:
+            # 其他訊息
+            print(f"📨 Arduino: {message}")
             
     def send_command(self, command):
-        """發送命令到Arduino"""
-        if not self.connected or not self.serial:
+        """發送命令到Arduino（排入確認佇列，不阻塞呼叫端）
+        
+        尚未送出的同種命令（MOVE、EMERGENCY）會被新命令取代；Arduino 逾時未確認時自動重送。
+        """
+        if not self.connected or not self.commands:
             print(f"⚠️  Arduino未連接，無法發送命令: {command}")
             return False
             
-        try:
-            self.serial.write(f"{command}\n".encode())
-            print(f"📤 發送命令: {command}")
-            return True
-        except Exception as e:
-            print(f"❌ 發送命令失敗: {e}")
-            self.connected = False
-            if self.connection_callback:
-                self.connection_callback(False, f"發送失敗: {e}")
-            return False
+        self.loop.call_soon_threadsafe(self._submit, self.commands, command)
+        print(f"📤 發送命令: {command}")
+        return True
+        
+    def _submit(self, commands, command):
+        future = commands.submit(command)
+        future.add_done_callback(lambda f: self._on_command_done(command, f))
+        
+    def _on_command_done(self, command, future):
+        if future.cancelled():
+            return
+        e = future.exception()
+        if e is None:
+            ack = future.result()
+            if ack is None:
+                print(f"♻️  命令已被新命令取代: {command}")
+            elif ack.attempts > 1:
+                print(f"🔁 命令重送 {ack.attempts - 1} 次後確認: {command}")
+            return
+        # 串口中斷時由 receive_events 負責更新連線狀態與自動重連，這裡只記錄
+        print(f"❌ 命令未獲確認: {command}: {e}")
+                
+    def command_stats(self):
+        """命令佇列的送出、確認、重送、合併次數與各命令 RTT（毫秒）"""
+        return self.commands.stats() if self.commands else None
             
     def move_to_floor(self, target_floor):
         """移動到指定樓層"""
@@ -279,44 +285,71 @@ class ArduinoController:
         if self.send_command("INIT"):
             print("🏠 初始化電梯到1樓位置")
         
+    def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        
     def close(self):
         """關閉連接"""
         self.running = False
-        if self.receive_thread and self.receive_thread.is_alive():
-            try:
-                self.receive_thread.join(timeout=1)
-            except:
-                pass
-                
-        if self.serial and self.connected:
-            try:
-                self.serial.close()
-            except:
-                pass
+        link, self.link = self.link, None
+        stats = self.command_stats()
+        if stats and stats["sent"]:
+            rtt = ", ".join(f"{kind} {value['mean_ms']:.1f} ms" for kind, value in stats["rtt"].items())
+            print(f"📊 命令統計: 送出 {stats['sent']}、確認 {stats['acked']}、重送 {stats['retransmits']}、"
+                  f"合併 {stats['coalesced']}、失敗 {stats['failed']}；平均 RTT: {rtt}")
+        
+        async def shutdown():
+            tasks = self._tasks
+            self._cancel_tasks()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if link is None:
+                return
+            if link.connected and link.binary:
+                # 關閉串口不會讓Arduino重置，先切回文字模式，下次連線的文字握手才有回應
+                try:
+                    await link.disable_binary(timeout=0.5)
+                except (ConnectionError, asyncio.TimeoutError):
+                    pass
+            link.close()
+            
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=1.0)
+        except (concurrent.futures.TimeoutError, RuntimeError):
+            pass
+        if link is not None and self.connected:
             self.connected = False
             print("🔌 Arduino 連接已關閉")
 
 class SimpleElevatorGUI:
-    def __init__(self, master):
+    def __init__(self, master, num_floors=3, detection_size=(320, 240), detection_roi=None, arduino_binary=False,
+                 arduino_ports=None):
         self.master = master
+        self.num_floors = num_floors
         master.title("智能電梯控制系統 - 含MOG2監控")
         master.geometry("800x700")
         
         # 初始化 Arduino 控制器
-        self.arduino = ArduinoController()
+        self.arduino = ArduinoController(binary=arduino_binary, ports=arduino_ports)
         self.arduino.position_callback = self.on_position_update
         self.arduino.connection_callback = self.on_arduino_connection_change
         self.arduino.status_callback = self.on_status_update
         
-        # 攝影機和MOG2初始化
-        self.cap = cv2.VideoCapture(0)
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
-            history=500, varThreshold=16, detectShadows=True
-        )
+        # MOG2偵測器（攝影機讀取與影像處理在背景執行緒執行）
+        # detection_size：MOG2處理解析度；detection_roi：以 0–1 座標表示的偵測多邊形（None 為整個畫面）
+        self.detector = PenetrationDetector(warmup_frames=30, overlay_alpha=0.4,
+                                            process_size=detection_size, roi=detection_roi,
+                                            change_threshold=8)
         self.penetration_area = 0
         self.total_area = 0
         self.penetration_ratio = 0
         self.penetration_threshold = 0.15  # 15%閾值
+        # 突破量去抖動：5幀中位數、3%遲滯、切換後至少維持1秒
+        self.occupancy = OccupancyStateMachine(self.penetration_threshold, hysteresis=0.03,
+                                               min_dwell=1.0, window=5)
+        # 偵測頻率依電梯狀態調整：開門時每幀偵測，關門行駛中每秒一次
+        self.vision_scheduler = AdaptiveFrameScheduler()
         self.baseline_established = False
         self.stabilization_frames = 0
         self.display_width = 320
@@ -331,15 +364,23 @@ class SimpleElevatorGUI:
         self.manual_emergency = False  # 手動緊急模式
         
         # 電梯請求隊列系統
-        self.floor_requests = set()  # 請求的樓層集合
         self.current_direction = 0  # 當前方向：1=上行, -1=下行, 0=停止
-        self.pending_floors = []  # 待停靠樓層列表（按順序）
+        # 請求的樓層與停靠順序（增量維護，變更時只送出一筆差異事件）
+        self.floor_requests = StopSequence(self.current_floor, self.current_direction,
+                                           on_change=self.on_stop_sequence_change)
+        self._requests_label_scheduled = False
         
         self.setup_gui()
         
+        self.vision = CaptureWorker(self.detector, source=0,
+                                    preview_size=(self.display_width, self.display_height),
+                                    annotate=self.create_mog2_visualization,
+                                    scheduler=self.vision_scheduler)
+        self.vision.start()
+        
         # 啟動主循環
         self.master.after(1000, self.update_status)
-        self.master.after(100, self.update_mog2_detection)  # MOG2檢測循環
+        self.master.after(100, self.update_mog2_detection)  # MOG2結果輪詢
         
     def setup_gui(self):
         """設置GUI界面"""
@@ -474,7 +515,7 @@ class SimpleElevatorGUI:
         button_frame.pack(pady=5)
         
         self.floor_buttons = {}
-        for floor in [1, 2, 3]:
+        for floor in range(1, self.num_floors + 1):
             btn = tk.Button(button_frame, text=f"{floor}樓", 
                            command=lambda f=floor: self.add_floor_request(f),
                            width=7, height=2, font=("Arial", 12, "bold"),
@@ -553,9 +594,7 @@ class SimpleElevatorGUI:
         
     def reset_mog2_background(self):
         """重置MOG2背景"""
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
-            history=500, varThreshold=16, detectShadows=True
-        )
+        self.detector.request_reset()
         self.baseline_established = False
         self.stabilization_frames = 0
         self.log_message("🔄 MOG2背景已重置，重新建立基準中...")
@@ -563,88 +602,65 @@ class SimpleElevatorGUI:
     def update_emergency_threshold(self, val):
         """更新緊急模式閾值"""
         self.penetration_threshold = float(val) / 100.0
+        self.occupancy.threshold = self.penetration_threshold
         self.log_message(f"🎯 緊急閾值已設為: {float(val):.1f}%")
         
     def update_mog2_detection(self):
-        """更新MOG2突破量檢測"""
-        ret, frame = self.cap.read()
-        if ret:
-            if not self.baseline_established:
+        """取用背景執行緒完成的MOG2突破量結果"""
+        result = self.vision.latest()
+        if result is not None:
+            if not result.ready:
                 # 建立背景基準階段
-                self.stabilization_frames += 1
-                if self.stabilization_frames > 30:  # 增加穩定幀數
+                self.baseline_established = False
+                self.stabilization_frames = result.warmup
+            else:
+                if not self.baseline_established:
                     self.baseline_established = True
                     self.log_message("✅ MOG2背景基準建立完成")
                     
-                self.background_subtractor.apply(frame)
+                # MOG2突破量檢測
+                self.total_area = result.total_area
+                self.penetration_area = result.area
+                self.penetration_ratio = result.ratio
                 
-                # 顯示初始化進度
-                display_frame = frame.copy()
-                progress_text = f"建立MOG2背景基準中 ({self.stabilization_frames}/30)..."
-                cv2.putText(display_frame, progress_text, (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+                # 更新顯示
+                self.penetration_info_label.config(
+                    text=f"突破量: {self.penetration_ratio:.2f}% | 閾值: {self.penetration_threshold*100:.1f}%"
+                )
                 
-                self.display_camera_frame(display_frame)
-                self.master.after(100, self.update_mog2_detection)
-                return
-                
-            # MOG2突破量檢測
-            self.total_area = frame.shape[0] * frame.shape[1]
-            fg_mask = self.background_subtractor.apply(frame)
-            
-            # 形態學處理減少雜訊
-            fg_mask = cv2.GaussianBlur(fg_mask, (5, 5), 0)
-            _, fg_mask = cv2.threshold(fg_mask, 128, 255, cv2.THRESH_BINARY)
-            
-            kernel = np.ones((5, 5), np.uint8)
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
-            
-            # 計算突破量
-            self.penetration_area = cv2.countNonZero(fg_mask)
-            self.penetration_ratio = (self.penetration_area / self.total_area) * 100
-            
-            # 更新顯示
-            self.penetration_info_label.config(
-                text=f"突破量: {self.penetration_ratio:.2f}% | 閾值: {self.penetration_threshold*100:.1f}%"
-            )
-            
-            # 檢查是否觸發自動緊急模式
-            prev_auto_emergency = self.auto_emergency
-            if self.penetration_ratio / 100 >= self.penetration_threshold:
-                if not self.auto_emergency:
-                    self.auto_emergency = True
-                    self.log_message(f"🚨 MOG2檢測觸發自動緊急模式！突破量: {self.penetration_ratio:.2f}%")
-            else:
-                if self.auto_emergency:
-                    self.auto_emergency = False
-                    self.log_message(f"✅ 突破量降低，自動解除緊急模式。當前: {self.penetration_ratio:.2f}%")
-            
-            # 更新緊急狀態
-            if prev_auto_emergency != self.auto_emergency:
-                self.update_emergency_mode()
+                # 檢查是否觸發自動緊急模式（只在狀態真正改變時才更新）
+                transition = self.occupancy.update(self.penetration_ratio / 100)
+                if transition is not None:
+                    self.auto_emergency = transition
+                    if transition:
+                        self.log_message(f"🚨 MOG2檢測觸發自動緊急模式！突破量: {self.penetration_ratio:.2f}%")
+                    else:
+                        self.log_message(f"✅ 突破量降低，自動解除緊急模式。當前: {self.penetration_ratio:.2f}%")
+                    self.update_emergency_mode()
+                    
+            self.display_camera_frame(result.preview)
             
-            # 視覺化顯示
-            self.create_mog2_visualization(frame, fg_mask)
+        self.master.after(30, self.update_mog2_detection)
+        
+    def create_mog2_visualization(self, frame, result):
+        """創建MOG2視覺化顯示（在背景執行緒中執行）"""
+        if not result.ready:
+            # 顯示初始化進度
+            display_frame = frame.copy()
+            progress_text = f"建立MOG2背景基準中 ({result.warmup}/{self.detector.warmup_frames})..."
+            cv2.putText(display_frame, progress_text, (10, 30), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+            return display_frame
             
-        self.master.after(100, self.update_mog2_detection)
-        
-    def create_mog2_visualization(self, frame, fg_mask):
-        """創建MOG2視覺化顯示"""
-        # 將前景遮罩轉為彩色
-        fg_mask_colored = cv2.cvtColor(fg_mask, cv2.COLOR_GRAY2BGR)
-        fg_mask_colored[np.where((fg_mask_colored == [255, 255, 255]).all(axis=2))] = [0, 0, 255]
-        
         # 混合原圖和前景遮罩
-        alpha = 0.4
-        visualization = cv2.addWeighted(frame, 1, fg_mask_colored, alpha, 0)
+        visualization = self.detector.overlay(frame, result.mask)
         
         # 添加資訊文字
         info_color = (0, 255, 0)  # 綠色
-        if self.penetration_ratio / 100 >= self.penetration_threshold:
+        if result.ratio / 100 >= self.penetration_threshold:
             info_color = (0, 0, 255)  # 紅色
             
-        cv2.putText(visualization, f"突破量: {self.penetration_ratio:.2f}%", 
+        cv2.putText(visualization, f"突破量: {result.ratio:.2f}%", 
                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, info_color, 2)
         cv2.putText(visualization, f"閾值: {self.penetration_threshold*100:.1f}%", 
                    (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
@@ -653,15 +669,10 @@ class SimpleElevatorGUI:
             cv2.putText(visualization, "⚠️ 自動緊急模式", 
                        (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
                        
-        self.display_camera_frame(visualization)
-        
-    def display_camera_frame(self, frame):
-        """顯示攝影機畫面"""
-        # 調整大小
-        frame_resized = cv2.resize(frame, (self.display_width, self.display_height))
+        return visualization
         
-        # 轉換為Tkinter可顯示的格式
-        rgb_frame = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
+    def display_camera_frame(self, rgb_frame):
+        """顯示攝影機畫面（已由背景執行緒縮放並轉為 RGB）"""
         image = Image.fromarray(rgb_frame)
         photo = ImageTk.PhotoImage(image)
         
@@ -700,7 +711,6 @@ class SimpleElevatorGUI:
                     self.current_direction = 0
                     self.move_status_label.config(text="緊急停止", fg="red")
                     self.floor_requests.clear()
-                    self.pending_floors.clear()
                     self.requests_label.config(text="無")
                     self.update_direction_display()
             else:
@@ -731,9 +741,8 @@ class SimpleElevatorGUI:
         if self.is_moving and not self.can_stop_at_floor(floor):
             self.log_message(f"⚠️ 電梯正在反方向移動，{floor}樓請求將稍後處理")
             
-        # 添加到請求集合
+        # 添加到請求集合（日誌由 on_stop_sequence_change 的「📋 停靠順序 +N 樓」記錄）
         self.floor_requests.add(floor)
-        self.log_message(f"🎯 添加樓層請求: {floor} 樓")
         
         # 如果電梯沒有在移動，立即開始處理請求
         if not self.is_moving:
@@ -747,8 +756,8 @@ class SimpleElevatorGUI:
                 self.update_pending_floors()
                 
                 # 如果目標樓層改變了，說明需要中途停靠
-                if self.pending_floors and self.pending_floors[0] != old_target:
-                    new_target = self.pending_floors[0]
+                new_target = self.floor_requests.next_stop()
+                if new_target is not None and new_target != old_target:
                     self.target_floor = new_target
                     self.target_floor_label.config(text=str(new_target))
                     self.log_message(f"🔄 更新目標樓層：{old_target}樓 → {new_target}樓（中途停靠）")
@@ -770,8 +779,8 @@ class SimpleElevatorGUI:
         # 計算停靠順序
         self.update_pending_floors()
         
-        if self.pending_floors:
-            next_floor = self.pending_floors[0]
+        next_floor = self.floor_requests.next_stop()
+        if next_floor is not None:
             self.target_floor = next_floor
             self.target_floor_label.config(text=str(next_floor))
             
@@ -786,6 +795,7 @@ class SimpleElevatorGUI:
                 return  # 已經在目標樓層
                 
             self.is_moving = True
+            self.vision_scheduler.set_state("moving")
             self.move_status_label.config(text="移動中", fg="orange")
             self.arduino.move_to_floor(next_floor)
             
@@ -793,48 +803,30 @@ class SimpleElevatorGUI:
             self.update_direction_display()
             
     def update_pending_floors(self):
-        """更新待停靠樓層順序"""
-        if not self.floor_requests:
-            self.pending_floors = []
-            return
-            
-        requests = list(self.floor_requests)
-        
-        if self.current_direction == 1:  # 上行
-            # 先處理上方的樓層（由近到遠）
-            upper_floors = [f for f in requests if f > self.current_floor]
-            upper_floors.sort()
-            
-            # 再處理下方的樓層（由遠到近）
-            lower_floors = [f for f in requests if f < self.current_floor]
-            lower_floors.sort(reverse=True)
-            
-            self.pending_floors = upper_floors + lower_floors
-            
-        elif self.current_direction == -1:  # 下行
-            # 先處理下方的樓層（由近到遠）
-            lower_floors = [f for f in requests if f < self.current_floor]
-            lower_floors.sort(reverse=True)
-            
-            # 再處理上方的樓層（由近到遠）
-            upper_floors = [f for f in requests if f > self.current_floor]
-            upper_floors.sort()
-            
-            self.pending_floors = lower_floors + upper_floors
-            
-        else:  # 停止狀態，選擇最近的樓層
-            requests.sort(key=lambda x: abs(x - self.current_floor))
-            self.pending_floors = requests
-            
-        self.log_message(f"📋 更新停靠順序: {self.pending_floors}")
-        
-        # 更新GUI顯示
-        if self.pending_floors:
-            requests_text = " → ".join(map(str, self.pending_floors))
-            self.requests_label.config(text=requests_text)
+        """以目前樓層與方向更新停靠順序的分界（順序本身由 StopSequence 增量維護）"""
+        self.floor_requests.set_position(self.current_floor, self.current_direction)
+
+    def on_stop_sequence_change(self, diff):
+        """停靠順序變更事件：記錄精簡差異，標籤則合併到閒置時更新一次"""
+        op = diff["op"]
+        if op == "add":
+            self.log_message(f"📋 停靠順序 +{diff['floor']} 樓（第 {diff['index'] + 1} 站）"
+                             if diff["index"] is not None else f"📋 停靠順序 +{diff['floor']} 樓")
+        elif op == "remove":
+            self.log_message(f"📋 停靠順序 -{diff['floor']} 樓")
+        elif op == "clear":
+            self.log_message("📋 停靠順序已清空")
+        if not self._requests_label_scheduled:
+            self._requests_label_scheduled = True
+            self.master.after_idle(self.refresh_requests_label)
+
+    def refresh_requests_label(self):
+        self._requests_label_scheduled = False
+        if len(self.floor_requests):
+            self.requests_label.config(text=" → ".join(map(str, self.floor_requests)))
         else:
             self.requests_label.config(text="無")
-        
+
     def can_stop_at_floor(self, floor):
         """檢查電梯是否可以在指定樓層停靠（中途停靠邏輯）"""
         if not self.is_moving:
@@ -861,18 +853,15 @@ class SimpleElevatorGUI:
         
     def arrive_at_floor(self, floor):
         """到達樓層處理"""
+        # 開門期間乘客進出，偵測恢復全速
+        self.vision_scheduler.set_state("loading")
         # 從請求中移除當前樓層
-        if floor in self.floor_requests:
-            self.floor_requests.remove(floor)
+        if self.floor_requests.remove(floor):
             self.log_message(f"✅ 到達 {floor} 樓，請求完成")
             
-        # 從待停靠列表中移除
-        if floor in self.pending_floors:
-            self.pending_floors.remove(floor)
-            
         # 檢查是否還有其他請求
         if self.floor_requests:
-            self.log_message(f"🔄 剩餘請求: {sorted(list(self.floor_requests))}")
+            self.log_message(f"🔄 剩餘請求: {list(self.floor_requests)}")
             # 延遲1秒後繼續下一個請求（模擬開門時間）
             self.master.after(1000, self.process_next_request)
         else:
@@ -903,9 +892,9 @@ class SimpleElevatorGUI:
             self.manual_emergency = True
             # 清空所有請求
             self.floor_requests.clear()
-            self.pending_floors.clear()
             self.is_moving = False
             self.current_direction = 0
+            self.vision_scheduler.set_state("idle")
             self.move_status_label.config(text="緊急停止", fg="red")
             self.requests_label.config(text="無")
             # 更新運行方向顯示
@@ -947,7 +936,6 @@ class SimpleElevatorGUI:
         self.emergency_mode = False
         self.current_direction = 0
         self.floor_requests.clear()
-        self.pending_floors.clear()
         
         # 更新GUI顯示
         self.current_floor_label.config(text="1")
@@ -976,6 +964,7 @@ class SimpleElevatorGUI:
         
         if old_floor != floor:
             self.log_message(f"📍 電梯位置更新：{old_floor}樓 → {floor}樓")
+            self.update_pending_floors()
             
             # 如果是電梯到達目標樓層或請求樓層，觸發到達邏輯
             if floor in self.floor_requests or floor == self.target_floor:
@@ -995,6 +984,7 @@ class SimpleElevatorGUI:
         self.target_floor_label.config(text=str(target_floor))
         
         if moving:
+            self.vision_scheduler.set_state("moving")
             self.move_status_label.config(text="移動中", fg="orange")
         else:
             self.move_status_label.config(text="待命", fg="black")
@@ -1014,10 +1004,11 @@ class SimpleElevatorGUI:
             self.is_moving = False
             self.emergency_mode = False
             self.auto_emergency = False
+            self.occupancy.reset()
+            self.vision_scheduler.set_state("idle")
             self.manual_emergency = False
             self.current_direction = 0
             self.floor_requests.clear()
-            self.pending_floors.clear()
             
             # 更新GUI顯示
             self.current_floor_label.config(text="1")
@@ -1059,12 +1050,17 @@ class SimpleElevatorGUI:
         self.log_message("🔌 關閉系統...")
         if hasattr(self, 'arduino'):
             self.arduino.close()
-        if hasattr(self, 'cap'):
-            self.cap.release()
+        if hasattr(self, 'vision'):
+            self.vision.stop()
         self.master.destroy()
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="智能電梯控制系統（實體電梯）")
+    parser.add_argument("--port", action="append", help="指定Arduino串口，可重複（例如 virtual_arduino.py 的 pty）")
+    parser.add_argument("--binary", action="store_true", help="使用二進位訊框與Arduino通訊")
+    args = parser.parse_args()
     root = tk.Tk()
-    sim = SimpleElevatorGUI(root)
+    sim = SimpleElevatorGUI(root, arduino_binary=args.binary, arduino_ports=args.port)
     root.protocol("WM_DELETE_WINDOW", sim.on_closing)
     root.mainloop() 
\ No newline at end of file
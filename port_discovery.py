@@ -0,0 +1,218 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import serial
+import serial.tools.list_ports
+from arduino_protocol import open_port, parse_message
+
+# 上次成功連線的串口：{裝置識別: {"port", "serial_number", "device", "time"}}
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "smart_elevator", "last_port.json")
+
+# 串口描述中出現這些字樣、或路徑符合這些前綴，就視為可能是 Arduino
+PORT_KEYWORDS = ("Arduino", "CH340", "USB")
+PORT_PREFIXES = ("/dev/cu.usbmodem", "/dev/cu.usbserial", "/dev/ttyACM", "/dev/ttyUSB")
+
+# 探測結果：device 為 PONG 附帶的裝置識別（舊韌體為空字串），cached 表示直接命中快取
+DiscoveredPort = namedtuple("DiscoveredPort", "port device serial_number elapsed cached")
+
+
+def candidate_ports():
+    """列出可能是 Arduino 的串口：[(路徑, USB 序號), ...]"""
+    ports = []
+    for info in serial.tools.list_ports.comports():
+        if any(keyword in (info.description or "") for keyword in PORT_KEYWORDS) \
+                or info.device.startswith(PORT_PREFIXES):
+            ports.append((info.device, info.serial_number or ""))
+    if not ports:
+        # list_ports 找不到時沿用舊的 macOS 路徑比對
+        ports = [(path, "") for path in glob.glob("/dev/cu.usbmodem*") + glob.glob("/dev/cu.usbserial*")]
+    return ports
+
+
+def probe(port, baud_rate=9600, timeout=3.0, interval=0.25, stop_event=None):
+    """開啟串口並每 interval 秒送一次 PING，回傳 PONG 附帶的裝置識別；逾時或無法開啟時回傳 None
+
+    若 Arduino 因開啟串口而重置，會一直 PING 到開機完成；沒有重置時通常幾毫秒內就有回應。
+    stop_event 被設定時提早放棄（其他串口已找到目標）。
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        serial_port = open_port(port, baud_rate, timeout=0.05)
+    except (OSError, serial.SerialException):
+        return None
+    try:
+        # 開頭的換行用來沖掉殘留的半行
+        serial_port.write(b"\n")
+        buffer = b""
+        next_ping = 0.0
+        while time.monotonic() < deadline and not (stop_event and stop_event.is_set()):
+            if time.monotonic() >= next_ping:
+                serial_port.write(b"PING\n")
+                next_ping = time.monotonic() + interval
+            buffer += serial_port.read(max(1, serial_port.in_waiting))
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                event = parse_message(line.decode("utf-8", errors="ignore").strip())
+                if event.kind == "PONG":
+                    return event.data["device"]
+        return None
+    except (OSError, serial.SerialException):
+        return None
+    finally:
+        serial_port.close()
+
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(key, found, path=CACHE_PATH):
+    cache = load_cache(path)
+    cache[key] = {"port": found.port, "serial_number": found.serial_number, "device": found.device,
+                  "time": time.time()}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"⚠️  無法寫入串口快取 {path}: {e}")
+
+
+def _cached_port(entry, candidates):
+    """快取中的串口；USB 序號相同但路徑改變（重新插拔）時改用新路徑"""
+    if not entry:
+        return None
+    for port, serial_number in candidates:
+        if entry.get("serial_number") and serial_number == entry["serial_number"]:
+            return port, serial_number
+    for port, serial_number in candidates:
+        if port == entry.get("port"):
+            return port, serial_number
+    return None
+
+
+def discover(device=None, baud_rate=9600, timeout=3.0, ports=None, cache_path=CACHE_PATH, use_cache=True,
+             accept_legacy=True):
+    """找出回覆 PONG 的 Arduino，回傳 DiscoveredPort；找不到回傳 None
+
+    device 為要找的裝置識別（"ELEVATOR"、"LCD"），None 表示任何回覆 PONG 的裝置皆可；
+    只回 PONG 的舊韌體在 accept_legacy 且沒有任何串口符合識別時才採用。以執行緒平行探測所有候選串口，
+    第一個符合的回應到達就回傳，不等其他串口逾時。快取中上次成功的串口排在最前面一起探測：
+    板子已開機時它幾毫秒內就會回應，快取失效（串口還在但不回應）也不會拖慢其他串口的探測。
+    ports 可指定候選串口路徑（例如測試用的 pty），預設為 candidate_ports()。
+    """
+    start = time.perf_counter()
+    candidates = [(port, "") for port in ports] if ports is not None else candidate_ports()
+    if not candidates:
+        return None
+    key = device or ""
+    accepted = (device, "") if accept_legacy else (device,)
+    cache = load_cache(cache_path) if use_cache else {}
+    cached = _cached_port(cache.get(key), candidates)
+    if cached is not None:
+        candidates = [cached] + [candidate for candidate in candidates if candidate != cached]
+
+    def finish(port, serial_number, identity):
+        found = DiscoveredPort(port, identity, serial_number, time.perf_counter() - start,
+                               (port, serial_number) == cached)
+        if use_cache:
+            save_cache(key, found, cache_path)
+        return found
+
+    stop_event = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(candidates))
+    fallback = None
+    try:
+        futures = {pool.submit(probe, port, baud_rate, timeout, stop_event=stop_event): (port, serial_number)
+                   for port, serial_number in candidates}
+        for future in as_completed(futures):
+            identity = future.result()
+            if identity is None:
+                continue
+            port, serial_number = futures[future]
+            if device is None or identity == device:
+                return finish(port, serial_number, identity)
+            # 只回 PONG 的舊韌體：快取中的串口優先
+            if identity in accepted and (fallback is None or (port, serial_number) == cached):
+                fallback = (port, serial_number, identity)
+    finally:
+        # 找到後不等其他探測結束：它們會在下一次 PING 前看到 stop_event 並關閉串口
+        stop_event.set()
+        pool.shutdown(wait=False)
+    if fallback is not None:
+        return finish(*fallback)
+    return None
+
+
+def simulate(count, reset_delay=1.5, timeout=3.0):
+    """以 pty 模擬 count 個串口（只有一個是電梯板，開啟後 reset_delay 秒才開機完成），比較冷、熱啟動"""
+    import tempfile
+
+    def fake_board(master, boot_at, identity):
+        buffer = b""
+        while True:
+            try:
+                data = os.read(master, 1024)
+            except OSError:
+                return
+            if identity is None:
+                continue  # 不是 Arduino 的裝置：不回應
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip() == b"PING" and time.monotonic() >= boot_at[0]:
+                    os.write(master, f"PONG:{identity}\n".encode())
+
+    ports = []
+    boot_at = [time.monotonic() + reset_delay]
+    for index in range(count):
+        master, slave = os.openpty()
+        identity = "ELEVATOR" if index == count - 1 else ("LCD" if index == 0 else None)
+        threading.Thread(target=fake_board, args=(master, boot_at, identity), daemon=True).start()
+        ports.append(os.ttyname(slave))
+
+    cache_path = os.path.join(tempfile.mkdtemp(), "last_port.json")
+    print(f"模擬 {count} 個串口（1 個電梯板、1 個 LCD 板，其餘不回應），電梯板開機需 {reset_delay} 秒")
+    print(f"  逐一探測（舊作法）最壞約需 {(count - 1) * timeout + reset_delay:.1f} 秒")
+    found = discover("ELEVATOR", timeout=timeout, ports=ports, cache_path=cache_path)
+    print(f"  冷啟動平行探測：{found.port}，{found.elapsed * 1000:.0f} ms")
+    # 熱啟動：板子已開機，且清除 HUPCL 後重新開啟串口不會再重置
+    found = discover("ELEVATOR", timeout=timeout, ports=ports, cache_path=cache_path)
+    print(f"  熱啟動（快取命中={found.cached}）：{found.port}，{found.elapsed * 1000:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="平行探測 Arduino 串口並記住上次成功的串口")
+    parser.add_argument("--device", default="ELEVATOR", help="要找的裝置識別（ELEVATOR、LCD），ANY 表示不限")
+    parser.add_argument("--timeout", type=float, default=3.0, help="每個串口的探測上限秒數")
+    parser.add_argument("--no-cache", action="store_true", help="不讀寫串口快取")
+    parser.add_argument("--simulate", type=int, metavar="N", help="以 N 個 pty 模擬串口，不需要硬體")
+    args = parser.parse_args(argv)
+
+    if args.simulate:
+        simulate(args.simulate, timeout=args.timeout)
+        return 0
+    device = None if args.device.upper() == "ANY" else args.device.upper()
+    found = discover(device, timeout=args.timeout, use_cache=not args.no_cache)
+    if found is None:
+        print("❌ 找不到回應 PING 的 Arduino")
+        return 1
+    print(f"✅ {found.device or '（舊韌體）'}：{found.port}，{found.elapsed * 1000:.0f} ms"
+          f"{'（快取）' if found.cached else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import argparse
+import gzip
+import json
+import time
+from collections import namedtuple
+from elevator_engine import ButtonType, ElevatorEngine
+
+# 呼叫紀錄格式（JSON Lines，每行一筆，依時間排序）：
+#   {"t": 12.5, "floor": 3, "type": "UP"}                       外部呼叫
+#   {"t": 12.5, "floor": 3, "type": "UP", "destination": 7}     外部呼叫並記錄乘客目的地（可計算等候/乘坐時間）
+#   {"t": 20.0, "floor": 7, "type": "INTERNAL", "car": 0}       車廂內按鈕（car 僅群控時使用，預設 0）
+# t 為自紀錄開始起算的秒數。
+
+
+class CallRecord(namedtuple("CallRecord", ["time", "floor", "button_type", "destination", "car"])):
+    __slots__ = ()
+
+    def to_json(self):
+        data = {"t": self.time, "floor": self.floor, "type": self.button_type.name}
+        if self.destination is not None:
+            data["destination"] = self.destination
+        if self.car is not None:
+            data["car"] = self.car
+        return json.dumps(data)
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def parse_record(line, line_no=None):
+    try:
+        data = json.loads(line)
+        return CallRecord(float(data["t"]), int(data["floor"]), ButtonType[data["type"].upper()],
+                          data.get("destination"), data.get("car"))
+    except (ValueError, KeyError, TypeError, AttributeError) as exc:
+        where = f"第 {line_no} 行" if line_no is not None else "紀錄"
+        raise ValueError(f"{where}格式錯誤：{line.strip()[:80]}（{exc}）") from None
+
+
+def read_call_log(path):
+    """逐行讀取呼叫紀錄（支援 .gz），不會把整個檔案載入記憶體"""
+    with _open(path, "r") as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield parse_record(line, line_no)
+
+
+def write_call_log(path, arrivals):
+    """把 (time, origin, destination) 到站序列寫成呼叫紀錄，回傳筆數"""
+    count = 0
+    with _open(path, "w") as f:
+        for arrival_time, origin, destination in arrivals:
+            button_type = ButtonType.UP if destination > origin else ButtonType.DOWN
+            f.write(CallRecord(round(arrival_time, 3), origin, button_type, destination, None).to_json() + "\n")
+            count += 1
+    return count
+
+
+class Replayer:
+    """把呼叫紀錄依虛擬時鐘送進控制器
+
+    target 可以是 ElevatorEngine 或 GroupController。speed 為 None（或 0）時以最快速度重播，
+    1 為實際時間，N 為 N 倍速；紀錄一次只預排一筆，因此可重播任意大小的檔案。
+    """
+
+    def __init__(self, target, records, speed=None, start=0.0):
+        self.target = target
+        self.clock = target.clock
+        self.speed = speed or None
+        self.offset = self.clock.now - start
+        self.replayed = 0
+        self.late = 0
+        self._records = iter(records)
+        self._schedule_next()
+
+    def _schedule_next(self):
+        for record in self._records:
+            when = record.time + self.offset
+            if when < self.clock.now:
+                # 紀錄未依時間排序時，延後到目前時間處理
+                self.late += 1
+                when = self.clock.now
+            self.clock.schedule_at(when, self._on_record, record)
+            return
+
+    def _on_record(self, record):
+        self.dispatch(record)
+        self.replayed += 1
+        self._schedule_next()
+
+    def dispatch(self, record):
+        target = self.target
+        if record.button_type == ButtonType.INTERNAL:
+            if hasattr(target, "car_call"):
+                target.car_call(record.car or 0, record.floor)
+            else:
+                target.add_request(record.floor, record.button_type)
+        elif record.destination is not None:
+            target.add_passenger(record.floor, record.destination)
+        elif hasattr(target, "hall_call"):
+            target.hall_call(record.floor, record.button_type)
+        else:
+            target.add_request(record.floor, record.button_type)
+
+    def run(self, until=None):
+        """執行重播；有設定 speed 時依牆鐘時間節流"""
+        if self.speed is None:
+            return self.clock.run(until=until)
+        wall_start = time.perf_counter()
+        sim_start = self.clock.now
+        count = 0
+        while True:
+            next_time = self.clock.peek_time()
+            if next_time is None or (until is not None and next_time > until):
+                break
+            delay = (next_time - sim_start) / self.speed - (time.perf_counter() - wall_start)
+            if delay > 0:
+                time.sleep(delay)
+            self.clock.step()
+            count += 1
+        if until is not None and until > self.clock.now:
+            self.clock.now = until
+        return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以虛擬時鐘重播 JSONL 呼叫紀錄")
+    parser.add_argument("log", help="呼叫紀錄（.jsonl 或 .jsonl.gz）")
+    parser.add_argument("--speed", type=float, default=0, help="重播倍速，0 為最快速度（預設）")
+    parser.add_argument("--floors", type=int, default=10)
+    parser.add_argument("--floor-time", type=float, default=1.5)
+    parser.add_argument("--cars", type=int, default=1, help="大於 1 時使用群控")
+    parser.add_argument("--policy", help="派車策略名稱（見 dispatch_policies.py）")
+    parser.add_argument("--until", type=float, help="重播到此虛擬時間（秒）為止")
+    parser.add_argument("--generate", type=float, metavar="SECONDS",
+                        help="先以 traffic.passenger_stream 產生指定長度的紀錄再重播")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        from traffic import passenger_stream
+        count = write_call_log(args.log, passenger_stream(args.floors, 0.1, profile="day",
+                                                          duration=args.generate, seed=args.seed))
+        print(f"📝 已產生 {count} 筆呼叫紀錄：{args.log}")
+
+    if args.cars > 1:
+        from group_control import GroupController
+        target = GroupController(args.cars, args.floors, floor_time=args.floor_time)
+    else:
+        policy = None
+        if args.policy:
+            from dispatch_policies import get_policy
+            policy = get_policy(args.policy)
+        target = ElevatorEngine(num_floors=args.floors, floor_time=args.floor_time, policy=policy)
+
+    replayer = Replayer(target, read_call_log(args.log), speed=args.speed)
+    start = time.perf_counter()
+    replayer.run(until=args.until)
+    elapsed = time.perf_counter() - start
+    print(f"▶️ 重播 {replayer.replayed} 筆（{replayer.late} 筆時間倒序），"
+          f"虛擬時間 {target.clock.now:.0f} 秒，耗時 {elapsed:.2f} 秒")
+    for key, value in target.summary().items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import itertools
+
+
+def next_above(mask, floor):
+    """mask 中大於 floor 的最低樓層，沒有時回傳 None"""
+    upper = mask >> (floor + 1)
+    if not upper:
+        return None
+    return (upper & -upper).bit_length() + floor
+
+
+def next_below(mask, floor):
+    """mask 中小於 floor 的最高樓層，沒有時回傳 None"""
+    if floor <= 0:
+        return None
+    lower = mask & ((1 << floor) - 1)
+    if not lower:
+        return None
+    return lower.bit_length() - 1
+
+
+def lowest(mask):
+    return (mask & -mask).bit_length() - 1 if mask else None
+
+
+def highest(mask):
+    return mask.bit_length() - 1 if mask else None
+
+
+def count_between(mask, low, high):
+    """mask 中 low < 樓層 < high 的數量"""
+    if high - low <= 1:
+        return 0
+    return ((mask >> (low + 1)) & ((1 << (high - low - 1)) - 1)).bit_count()
+
+
+class RequestIndex:
+    """依樓層與按鈕類型索引的請求集合
+
+    每種按鈕類型一個整數位元集合（第 n 位代表 n 樓），加入、去重與清除某樓層都是 O(1)，
+    「上方/下方最近一站」以位元運算求得。另以字典保存 Request 物件與插入順序，
+    讓狀態顯示與同距離時的先後判斷和原本的串列版本一致。
+    """
+
+    def __init__(self, button_types):
+        self.button_types = tuple(button_types)
+        self._bits = {button_type: 0 for button_type in self.button_types}
+        self._requests = {button_type: {} for button_type in self.button_types}
+        self._seq = {}
+        self._counter = itertools.count()
+
+    def add(self, request):
+        """加入請求；同樓層同類型已存在時回傳 False"""
+        bit = 1 << request.floor
+        button_type = request.button_type
+        if self._bits[button_type] & bit:
+            return False
+        self._bits[button_type] |= bit
+        self._requests[button_type][request.floor] = request
+        self._seq[(button_type, request.floor)] = next(self._counter)
+        return True
+
+    def contains(self, floor, button_type):
+        return bool(self._bits[button_type] >> floor & 1)
+
+    def clear_floor(self, floor, button_types=None):
+        """清除指定樓層的請求，回傳被移除的 Request 串列"""
+        removed = []
+        bit = 1 << floor
+        for button_type in button_types or self.button_types:
+            if self._bits[button_type] & bit:
+                self._bits[button_type] &= ~bit
+                removed.append(self._requests[button_type].pop(floor))
+                del self._seq[(button_type, floor)]
+        return removed
+
+    def clear(self, button_types=None):
+        for button_type in button_types or self.button_types:
+            for floor in self._requests[button_type]:
+                del self._seq[(button_type, floor)]
+            self._bits[button_type] = 0
+            self._requests[button_type].clear()
+
+    def mask(self, button_types=None):
+        result = 0
+        for button_type in button_types or self.button_types:
+            result |= self._bits[button_type]
+        return result
+
+    def count(self, button_types=None):
+        return sum(len(self._requests[button_type]) for button_type in button_types or self.button_types)
+
+    def requests(self, button_types=None):
+        """依插入順序列出請求（與原本的串列順序相同）"""
+        types = button_types or self.button_types
+        if len(types) == 1:
+            return list(self._requests[types[0]].values())
+        merged = [req for button_type in types for req in self._requests[button_type].values()]
+        merged.sort(key=lambda req: self._seq[(req.button_type, req.floor)])
+        return merged
+
+    def first(self, button_type):
+        """最早加入的請求"""
+        for request in self._requests[button_type].values():
+            return request
+        return None
+
+    def oldest(self, button_types=None):
+        """button_types 中最早加入的請求"""
+        best = None
+        best_seq = None
+        for button_type in button_types or self.button_types:
+            request = self.first(button_type)
+            if request is None:
+                continue
+            seq = self._seq[(button_type, request.floor)]
+            if best_seq is None or seq < best_seq:
+                best, best_seq = request, seq
+        return best
+
+    def first_seq(self, floor, button_types):
+        """floor 在 button_types 中最早的插入序號，沒有時回傳 None"""
+        seqs = [self._seq[(button_type, floor)] for button_type in button_types
+                if (button_type, floor) in self._seq]
+        return min(seqs) if seqs else None
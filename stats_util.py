@@ -0,0 +1,11 @@
+import math
+
+
+def percentile(values, q):
+    """最近序位法的百分位數（q 為 0–100）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # 第 ceil(q/100 × n) 個值；先乘再除，避免 0.95 × 20 之類的浮點誤差
+    index = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered) / 100) - 1))
+    return ordered[index]
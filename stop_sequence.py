@@ -0,0 +1,161 @@
+import bisect
+
+
+class StopSequence:
+    """待停靠樓層的停靠順序，以增量方式維護
+
+    樓層以 bisect 保存在一個遞增串列中，再以目前樓層為分界拆成兩段：
+    ahead（行進方向上由近到遠）與 behind（回頭後由近到遠）。
+    新增或到站時只更新變動的部分，並以 on_change(diff) 送出一筆精簡的變更事件：
+        {"op": "add", "floor": 5, "index": 1}
+        {"op": "remove", "floor": 5}
+        {"op": "clear"}
+        {"op": "position", "floor": 2, "direction": 1}
+    與 SimpleElevatorGUI 原本的 update_pending_floors 相同，行進中與目前樓層相同的請求不列入順序；
+    停止時依距離排序（同距離時較低樓層優先）。len() 為請求的樓層數。
+    """
+
+    def __init__(self, current_floor=1, direction=0, on_change=None):
+        self._floors = []
+        self.current_floor = current_floor
+        self.direction = direction
+        self.on_change = on_change
+
+    def _emit(self, **diff):
+        if self.on_change is not None:
+            self.on_change(diff)
+
+    def _split(self):
+        """(低於目前樓層的數量, 低於或等於目前樓層的數量)"""
+        floors = self._floors
+        return (bisect.bisect_left(floors, self.current_floor),
+                bisect.bisect_right(floors, self.current_floor))
+
+    def add(self, floor):
+        """加入樓層；已存在時回傳 False"""
+        index = bisect.bisect_left(self._floors, floor)
+        if index < len(self._floors) and self._floors[index] == floor:
+            return False
+        self._floors.insert(index, floor)
+        self._emit(op="add", floor=floor, index=self.index(floor))
+        return True
+
+    def remove(self, floor):
+        """移除樓層；不存在時回傳 False"""
+        index = bisect.bisect_left(self._floors, floor)
+        if index == len(self._floors) or self._floors[index] != floor:
+            return False
+        del self._floors[index]
+        self._emit(op="remove", floor=floor)
+        return True
+
+    discard = remove
+
+    def clear(self):
+        if self._floors:
+            self._floors.clear()
+            self._emit(op="clear")
+
+    def set_position(self, current_floor, direction):
+        """更新分界樓層與方向；兩者都沒變時不送出事件"""
+        if current_floor == self.current_floor and direction == self.direction:
+            return
+        self.current_floor = current_floor
+        self.direction = direction
+        self._emit(op="position", floor=current_floor, direction=direction)
+
+    @property
+    def ahead(self):
+        low, high = self._split()
+        if self.direction == 1:
+            return self._floors[high:]
+        if self.direction == -1:
+            return self._floors[:low][::-1]
+        return list(self)
+
+    @property
+    def behind(self):
+        low, high = self._split()
+        if self.direction == 1:
+            return self._floors[:low][::-1]
+        if self.direction == -1:
+            return self._floors[high:]
+        return []
+
+    def next_stop(self):
+        """下一個停靠樓層，沒有時回傳 None"""
+        try:
+            return self[0]
+        except IndexError:
+            return None
+
+    def index(self, floor):
+        """floor 在停靠順序中的位置；不在順序中時回傳 None"""
+        if floor not in self:
+            return None
+        if self.direction == 0:
+            for index, stop in enumerate(self):
+                if stop == floor:
+                    return index
+        low, high = self._split()
+        position = bisect.bisect_left(self._floors, floor)
+        if low <= position < high:
+            return None
+        above = len(self._floors) - high
+        if self.direction == 1:
+            return position - high if position >= high else above + (low - 1 - position)
+        return low - 1 - position if position < low else low + (position - high)
+
+    def __iter__(self):
+        low, high = self._split()
+        floors = self._floors
+        if self.direction == 1:
+            yield from floors[high:]
+            yield from reversed(floors[:low])
+        elif self.direction == -1:
+            yield from reversed(floors[:low])
+            yield from floors[high:]
+        else:
+            # 停止時由近到遠交錯合併上下兩側，同距離時較低樓層優先
+            yield from floors[low:high]
+            below, above = low - 1, high
+            while below >= 0 or above < len(floors):
+                if above >= len(floors) or (below >= 0 and
+                                            self.current_floor - floors[below] <= floors[above] - self.current_floor):
+                    yield floors[below]
+                    below -= 1
+                else:
+                    yield floors[above]
+                    above += 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            return list(self)[index]
+        low, high = self._split()
+        floors = self._floors
+        above = len(floors) - high
+        if self.direction == 1:
+            if index < above:
+                return floors[high + index]
+            if index - above < low:
+                return floors[low - 1 - (index - above)]
+        elif self.direction == -1:
+            if index < low:
+                return floors[low - 1 - index]
+            if index - low < above:
+                return floors[high + index - low]
+        else:
+            for position, floor in enumerate(self):
+                if position == index:
+                    return floor
+        raise IndexError("停靠順序索引超出範圍")
+
+    def __len__(self):
+        return len(self._floors)
+
+    def __contains__(self, floor):
+        index = bisect.bisect_left(self._floors, floor)
+        return index < len(self._floors) and self._floors[index] == floor
+
+    def __repr__(self):
+        return f"StopSequence({list(self)})"
@@ -0,0 +1,140 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from benchmark import SCENARIOS, run_policy
+
+# 預設搜尋空間：GUI 中分散各處的調校參數
+#   penetration_threshold  自動緊急模式的突破量閾值（GUI 預設 0.15）
+#   recheck_frames         animate_movement 中途檢查請求的間隔幀數（預設 20）
+#   reprocess_delay        到站後處理下一站的延遲秒數（預設 0.5）
+#   door_dwell             arrive_at_floor 的開門停留秒數（physical_elevator 為 1.0）
+DEFAULT_SPACE = {
+    "penetration_threshold": [0.10, 0.15, 0.20, 0.30],
+    "recheck_frames": [5, 10, 20, 40],
+    "reprocess_delay": [0.25, 0.5, 1.0],
+    "door_dwell": [0.0, 1.0, 2.0],
+}
+
+KPI_COLUMNS = ("served", "waiting", "avg_wait", "p95_wait", "max_wait", "avg_ride", "p95_ride",
+               "handling_capacity", "trips", "avg_decision_us")
+
+INT_PARAMETERS = ("recheck_frames", "trip_frames")
+
+
+def grid(space):
+    """格狀搜尋：惰性列出所有參數組合"""
+    names = list(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_search(space, samples, seed=None):
+    """隨機搜尋：串列值隨機挑選，(最小, 最大) 區間均勻取樣"""
+    rng = random.Random(seed)
+    for _ in range(samples):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                params[name] = rng.randint(low, high) if name in INT_PARAMETERS else rng.uniform(low, high)
+            else:
+                params[name] = rng.choice(values)
+        yield params
+
+
+def evaluate(params, scenario="up_peak", policy="nearest_directional", num_floors=10, duration=3600,
+             seeds=(1,), floor_time=1.5):
+    """在 worker 行程中執行一組參數；多個種子時回傳各 KPI 的平均值"""
+    profile, rate = SCENARIOS[scenario]
+    engine_kwargs = dict(params)
+    if "recheck_frames" in engine_kwargs:
+        # recheck_frames 只在輪詢式中途停靠下有作用
+        engine_kwargs.setdefault("intercept", "poll")
+    totals = dict.fromkeys(KPI_COLUMNS, 0.0)
+    for seed in seeds:
+        result = run_policy(policy, num_floors, profile, rate, duration, seed, floor_time, **engine_kwargs)
+        for key in KPI_COLUMNS:
+            totals[key] += result[key]
+    row = dict(params)
+    row.update({key: value / len(seeds) for key, value in totals.items()})
+    return row
+
+
+def run_sweep(configs, output, workers=None, max_pending=None, **evaluate_kwargs):
+    """把參數組合分散到 ProcessPoolExecutor，完成一筆就寫入 CSV 一列
+
+    同時只保留 max_pending 個未完成的工作，因此組合數量再大也不會一次全部送出。
+    回傳完成的組合數。
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    configs = iter(configs)
+    writer = None
+    done_count = 0
+    start = time.perf_counter()
+    with open(output, "w", newline="", encoding="utf-8") as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        while True:
+            for params in itertools.islice(configs, max_pending - len(pending)):
+                pending.add(pool.submit(evaluate, params, **evaluate_kwargs))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                row = future.result()
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+                done_count += 1
+            f.flush()
+            elapsed = time.perf_counter() - start
+            print(f"\r⏳ 已完成 {done_count} 組（{done_count / elapsed:.1f} 組/秒）", end="", flush=True)
+    print()
+    return done_count
+
+
+def parse_space(items, use_ranges=False):
+    """解析 name=a,b,c（格狀值）或 name=lo:hi（隨機搜尋區間）"""
+    space = {}
+    for item in items:
+        name, _, spec = item.partition("=")
+        cast = int if name in INT_PARAMETERS else float
+        if ":" in spec:
+            if not use_ranges:
+                raise ValueError(f"{name}：格狀搜尋需要列出數值，不能使用區間")
+            low, high = spec.split(":")
+            space[name] = (cast(low), cast(high))
+        else:
+            space[name] = [cast(value) for value in spec.split(",")]
+    return space
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以多行程掃描派車與緊急模式參數")
+    parser.add_argument("params", nargs="*", help="搜尋空間，例如 recheck_frames=10,20 door_dwell=0:2")
+    parser.add_argument("--random", type=int, metavar="N", help="隨機搜尋 N 組（預設為格狀搜尋）")
+    parser.add_argument("--scenario", default="up_peak", choices=list(SCENARIOS))
+    parser.add_argument("--policy", default="nearest_directional")
+    parser.add_argument("--floors", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=3600)
+    parser.add_argument("--seeds", type=int, default=1, help="每組參數重複的種子數")
+    parser.add_argument("--workers", type=int, help="行程數（預設為 CPU 核心數）")
+    parser.add_argument("--output", required=True, help="結果 CSV 檔，例如 sweep_results.csv")
+    args = parser.parse_args(argv)
+
+    space = parse_space(args.params, use_ranges=args.random is not None) if args.params else DEFAULT_SPACE
+    configs = random_search(space, args.random, seed=0) if args.random else grid(space)
+    count = run_sweep(configs, args.output, workers=args.workers, scenario=args.scenario, policy=args.policy,
+                      num_floors=args.floors, duration=args.duration, seeds=tuple(range(1, args.seeds + 1)))
+    print(f"💾 {count} 組結果已寫入 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
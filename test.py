@@ -3,8 +3,8 @@ from enum import Enum
 from collections import deque
 import time
 import cv2
-import numpy as np
 from PIL import Image, ImageTk
+from vision_pipeline import RedDetector
 
 # 定義按鈕類型和運行方向
 class ButtonType(Enum):
@@ -32,6 +32,8 @@ class ElevatorControlSim:
 
         # 建立攝影機物件（預設使用設備 0）
         self.cap = cv2.VideoCapture(0)
+        # 紅色比例只需要面積比例，先縮小到 160x120 再分類
+        self.red_detector = RedDetector(process_size=(160, 120))
 
         # 建立左側畫布，用以顯示電梯井
         self.canvas = tk.Canvas(master, width=300, height=600, bg="white")
@@ -304,18 +306,7 @@ class ElevatorControlSim:
     def update_red_detection(self):
         ret, frame = self.cap.read()
         if ret:
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            lower_red1 = np.array([0, 50, 50])
-            upper_red1 = np.array([10, 255, 255])
-            lower_red2 = np.array([170, 50, 50])
-            upper_red2 = np.array([180, 255, 255])
-            mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-            mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-            red_mask = cv2.bitwise_or(mask1, mask2)
-            red_pixels = cv2.countNonZero(red_mask)
-            total_pixels = frame.shape[0] * frame.shape[1]
-            red_ratio = red_pixels / total_pixels if total_pixels else 0
-            red_percent = red_ratio * 100
+            red_percent, red_mask = self.red_detector.process(frame)
             non_red_percent = 100 - red_percent
             self.red_info_label.config(text=f"紅色: {red_percent:.1f}%  非紅色: {non_red_percent:.1f}%")
             # 自動觸發：若紅色比例低於5%，則自動啟動；否則解除
@@ -329,14 +320,13 @@ class ElevatorControlSim:
                 self.auto_emergency = False
             self.update_emergency_mode()
 
-            # 將紅色區域影像顯示於 GUI
-            red_area = cv2.bitwise_and(frame, frame, mask=red_mask)
-            red_area = cv2.cvtColor(red_area, cv2.COLOR_BGR2RGB)
-            image = Image.fromarray(red_area)
-            image = image.resize((300, 225))
-            photo = ImageTk.PhotoImage(image)
-            self.camera_label.config(image=photo)
-            self.camera_label.image = photo
+            # 將紅色區域影像顯示於 GUI；視窗最小化或被隱藏時不產生預覽
+            if self.camera_label.winfo_viewable():
+                red_area = self.red_detector.render(frame, red_mask, size=(300, 225))
+                red_area = cv2.cvtColor(red_area, cv2.COLOR_BGR2RGB)
+                photo = ImageTk.PhotoImage(Image.fromarray(red_area))
+                self.camera_label.config(image=photo)
+                self.camera_label.image = photo
         self.master.after(100, self.update_red_detection)
 
     # 主迴圈更新狀態顯示
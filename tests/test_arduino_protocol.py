@@ -0,0 +1,146 @@
+import asyncio
+import pytest
+from arduino_protocol import ArduinoLink, CommandQueue, SerialTransport, ThreadedSerialTransport
+from virtual_arduino import VirtualArduino
+
+
+@pytest.fixture
+def arduino():
+    board = VirtualArduino(time_scale=0.01, boot_delay=0.0).start()
+    yield board
+    board.stop()
+
+
+@pytest.fixture(params=["add_reader", "thread"])
+def transport(request, monkeypatch):
+    """thread：模擬沒有 add_reader 的事件迴圈（Windows），改走背景讀取執行緒"""
+    if request.param == "thread":
+        def unsupported(self, *args):
+            raise NotImplementedError
+        monkeypatch.setattr(asyncio.SelectorEventLoop, "add_reader", unsupported)
+        return ThreadedSerialTransport
+    return SerialTransport
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_command_round_trip(arduino, transport, binary):
+    async def session():
+        link = await ArduinoLink(arduino.port).open()
+        assert type(link.transport) is transport
+        try:
+            assert await link.wait_ready()
+            if binary:
+                await link.enable_binary()
+            commands = CommandQueue(link)
+            worker = asyncio.ensure_future(commands.run())
+            complete = asyncio.ensure_future(link.wait_for("MOVE_COMPLETE", 5))
+            ack = await commands.submit("MOVE:2")
+            assert ack.command == "MOVE:2"
+            assert (await complete).data["floor"] == 2
+            status = asyncio.ensure_future(link.wait_for("STATUS", 1))
+            await commands.submit("STATUS")
+            assert (await status).data["current"] == 2
+            worker.cancel()
+        finally:
+            link.transport.close()
+
+    run(session())
+
+
+def test_disconnect_is_reported(arduino, transport):
+    async def session():
+        link = await ArduinoLink(arduino.port).open()
+        assert await link.wait_ready()
+        lost = asyncio.ensure_future(link.wait_for("DISCONNECTED", 5))
+        arduino.disconnect()
+        await lost
+        assert not link.connected
+        with pytest.raises(ConnectionError):
+            await link.send_command("PING")
+
+    run(session())
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_sequenced_ping_keeps_duplicate_suppression(arduino, binary):
+    async def session():
+        link = await ArduinoLink(arduino.port).open()
+        try:
+            assert await link.wait_ready()
+            if binary:
+                await link.enable_binary()
+            complete = asyncio.ensure_future(link.wait_for("MOVE_COMPLETE", 5))
+            await link.send_command("MOVE:2", 5)
+            await complete
+            await link.send_command("PING", 6)
+            await link.wait_for("PONG", 1)
+            # 與 PING 同序號的重送只確認、不執行
+            ack = link.expect_ack(6)
+            await link.send_command("MOVE:3", 6)
+            await asyncio.wait_for(ack, 1)
+            with pytest.raises(asyncio.TimeoutError):
+                await link.wait_for("MOVE_START", 0.3)
+        finally:
+            link.transport.close()
+
+    run(session())
+
+
+def test_handshake_ping_resets_sequence(arduino):
+    async def session():
+        link = await ArduinoLink(arduino.port).open()
+        try:
+            assert await link.wait_ready()
+            await link.send_command("STATUS", 0)
+            await link.wait_for("STATUS", 1)
+            # 新的連線：不帶序號的 PING 握手後，序號從 0 重新開始也會被執行
+            assert await link.wait_ready()
+            status = asyncio.ensure_future(link.wait_for("STATUS", 1))
+            await link.send_command("STATUS", 0)
+            await status
+        finally:
+            link.transport.close()
+
+    run(session())
+
+
+class StubLink:
+    """只記錄 ACK 等待者的假連線，由測試決定 ACK 何時到達"""
+
+    def __init__(self):
+        self.acks = {}
+        self.seq = 0
+
+    def next_seq(self):
+        self.seq += 1
+        return self.seq
+
+    def expect_ack(self, seq):
+        self.acks[seq] = asyncio.get_running_loop().create_future()
+        return self.acks[seq]
+
+    async def send_command(self, command, seq=None):
+        pass
+
+
+def test_queue_cancel_while_ack_arrives():
+    async def session():
+        link = StubLink()
+        commands = CommandQueue(link)
+        worker = asyncio.ensure_future(commands.run())
+        future = commands.submit("INIT")
+        while not link.acks:
+            await asyncio.sleep(0)
+        # ACK 與取消在同一輪事件迴圈發生：取消不能被吞掉
+        link.acks[1].set_result(None)
+        worker.cancel()
+        done, _ = await asyncio.wait({worker}, timeout=1.0)
+        assert worker in done and worker.cancelled()
+        assert future.done()
+        future.exception()
+
+    run(session())
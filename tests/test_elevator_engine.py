@@ -0,0 +1,37 @@
+import pytest
+from elevator_engine import ButtonType, ElevatorEngine, random_arrivals
+
+
+def arrival_order(engine):
+    arrivals = []
+    engine.add_listener(lambda event, _, **data: arrivals.append(data["floor"]) if event == "arrive" else None)
+    return arrivals
+
+
+@pytest.mark.parametrize("intercept", ["poll", "event"])
+def test_baseline_dispatch_order(intercept):
+    # 與 GUI 的 get_next_stop 相同：閒置時先去最近的請求，之後順向停靠，最後才折返
+    engine = ElevatorEngine(num_floors=6, intercept=intercept)
+    arrivals = arrival_order(engine)
+    engine.add_request(4, ButtonType.INTERNAL)
+    engine.add_request(2, ButtonType.DOWN)
+    engine.clock.schedule(1.0, engine.add_request, 3, ButtonType.UP)
+    engine.clock.schedule(1.0, engine.add_request, 6, ButtonType.DOWN)
+    engine.clock.schedule(4.0, engine.add_request, 1, ButtonType.UP)
+    engine.clock.schedule(4.0, engine.add_request, 5, ButtonType.INTERNAL)
+    engine.run(until=60)
+    assert arrivals == [2, 3, 4, 5, 6, 1]
+    assert engine.trips == 6
+    assert engine.requests.count() == 0
+
+
+def test_seeded_run_is_reproducible():
+    # 數值取自改用 RequestIndex 之前的串列版本（intercept="poll" 為原本的動畫輪詢行為）
+    engine = ElevatorEngine(num_floors=5, intercept="poll")
+    arrivals = arrival_order(engine)
+    engine.feed(random_arrivals(5, 1 / 20, 3600, seed=1))
+    engine.run(until=3600)
+    assert arrivals[:15] == [1, 4, 5, 2, 1, 4, 5, 1, 5, 2, 1, 1, 2, 5, 1]
+    summary = engine.summary()
+    assert (summary["served"], summary["trips"]) == (183, 337)
+    assert summary["avg_wait"] == pytest.approx(3.586009934973401)
@@ -0,0 +1,17 @@
+from elevator_engine import ButtonType
+from group_control import GroupController
+
+
+def test_reassigned_hall_call_leaves_no_stale_pending_request():
+    group = GroupController(num_cars=2, num_floors=6)
+    assert group.hall_call(3, ButtonType.UP) == 0
+    full_car = group.cars[0]
+    full_car.set_full_load(True)
+    # 滿載期間同一呼叫再按一次：會暫存在原電梯，接著改派給另一部
+    full_car.add_request(3, ButtonType.UP)
+    assert group.hall_call(3, ButtonType.UP) == 1
+    assert not full_car.pending_external_requests
+
+    full_car.set_full_load(False)
+    assert not full_car.requests.contains(3, ButtonType.UP)
+    assert group.cars[1].requests.contains(3, ButtonType.UP)
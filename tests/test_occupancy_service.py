@@ -0,0 +1,110 @@
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+from elevator_engine import ButtonType, ElevatorEngine
+from occupancy_service import OccupancyService, SharedFrameRing
+
+SHAPE = (4, 6, 3)
+
+
+def frame(value):
+    return np.full(SHAPE, value, np.uint8)
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(SHAPE, slots=3)
+    yield ring
+    if ring._header is not None:
+        ring.close()
+
+
+def test_write_read_round_trip(ring):
+    assert ring.read_latest() == (0, None)
+    assert ring.write(frame(7)) == 1
+    seq, out = ring.read_latest()
+    assert seq == 1
+    assert np.array_equal(out, frame(7))
+
+    buffer = np.empty(SHAPE, np.uint8)
+    ring.write(frame(9))
+    seq, out = ring.read_latest(buffer)
+    assert seq == 2 and out is buffer
+    assert np.array_equal(buffer, frame(9))
+
+
+def test_wraparound_past_slots(ring):
+    for value in range(1, 3 * ring.slots + 2):
+        seq = ring.write(frame(value))
+        assert seq == value
+        latest_seq, out = ring.read_latest()
+        assert latest_seq == value
+        assert np.array_equal(out, frame(value))
+    # 每個 slot 都只保留最近 slots 張影格的序號
+    assert sorted(int(s) for s in ring._header[1:]) == list(range(seq - ring.slots + 1, seq + 1))
+
+
+def test_attach_sees_owner_writes_and_only_owner_unlinks(ring):
+    reader = SharedFrameRing.attach(ring.name, SHAPE, ring.slots)
+    ring.write(frame(3))
+    assert reader.latest_seq() == 1
+    assert np.array_equal(reader.read_latest()[1], frame(3))
+
+    # 非擁有者關閉後，共享記憶體仍存在
+    reader.close()
+    shared_memory.SharedMemory(name=ring.name).close()
+
+    name = ring.name
+    ring.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_torn_read_retries(monkeypatch):
+    ring = SharedFrameRing(SHAPE, slots=1)
+    ring.write(frame(1))
+    original = np.copyto
+    state = {"torn": False}
+
+    def copy_then_overwrite(dst, src, **kwargs):
+        original(dst, src, **kwargs)
+        if not state["torn"]:
+            # 模擬讀取端複製期間，寫入端覆寫了同一個 slot
+            state["torn"] = True
+            ring.write(frame(2))
+
+    monkeypatch.setattr(np, "copyto", copy_then_overwrite)
+    seq, out = ring.read_latest()
+    monkeypatch.setattr(np, "copyto", original)
+    assert state["torn"]
+    assert seq == 2
+    assert np.array_equal(out, frame(2))
+
+    # slot 一直處於寫入中（序號 -1）時，重試用完就放棄
+    ring._header[1] = -1
+    assert ring.read_latest(retries=2) == (0, None)
+    ring.close()
+
+
+def test_update_controller_uses_engine_threshold():
+    service = OccupancyService([], frame_shape=SHAPE)
+    car = ElevatorEngine(num_floors=5, penetration_threshold=0.3)
+    service.ratios = [0.2]
+    service.update_controller([car], threshold=0.15)
+    assert not car.full_load
+
+    service.ratios = [0.4]
+    service.update_controller([car], threshold=0.15)
+    assert car.full_load
+    car.add_request(3, ButtonType.UP)
+    assert list(car.pending_external_requests)
+
+    # 到站時的人數估計不會蓋掉攝影機的量測
+    car._update_occupancy()
+    assert car.full_load
+
+    service.ratios = [0.1]
+    service.update_controller([car], threshold=0.15)
+    assert not car.full_load
+    assert not car.pending_external_requests
+    assert car.requests.contains(3, ButtonType.UP)
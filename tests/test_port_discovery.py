@@ -0,0 +1,83 @@
+import asyncio
+import os
+import tty
+import pytest
+from arduino_protocol import ArduinoLink
+from port_discovery import DiscoveredPort, discover, save_cache
+from virtual_arduino import VirtualArduino
+
+
+@pytest.fixture
+def arduino():
+    board = VirtualArduino(time_scale=0.01, boot_delay=0.0).start()
+    yield board
+    board.stop()
+
+
+def open_binary_and_abandon(port):
+    """切到二進位模式後直接關閉串口（程式當掉或 USB 中斷，沒有送 TEXT 切回）"""
+    async def session():
+        link = await ArduinoLink(port).open()
+        assert await link.wait_ready()
+        await link.enable_binary()
+        link.close()
+
+    asyncio.run(asyncio.wait_for(session(), 10))
+
+
+def test_reopen_without_reboot_after_binary_session(arduino):
+    open_binary_and_abandon(arduino.port)
+    assert arduino.binary_mode
+
+    async def reopen():
+        link = await ArduinoLink(arduino.port).open()
+        try:
+            assert await link.wait_ready(timeout=1.0)
+            assert not link.binary
+            status = asyncio.ensure_future(link.wait_for("STATUS", 1))
+            await link.send_command("STATUS")
+            await status
+        finally:
+            link.close()
+
+    asyncio.run(asyncio.wait_for(reopen(), 10))
+    assert arduino.boots == 1
+
+
+def test_discover_after_binary_session(arduino):
+    open_binary_and_abandon(arduino.port)
+    found = discover("ELEVATOR", timeout=1.0, ports=[arduino.port], use_cache=False)
+    assert found is not None and found.port == arduino.port
+    assert arduino.boots == 1
+
+
+def test_controller_close_returns_to_text_mode(arduino):
+    from physical_elevator import ArduinoController
+
+    controller = ArduinoController(binary=True, ports=[arduino.port])
+    try:
+        assert controller.connected and arduino.binary_mode
+    finally:
+        controller.close()
+    assert not arduino.binary_mode
+    assert controller.connect()
+    controller.close()
+    assert arduino.boots == 1
+
+
+def test_stale_cache_does_not_delay_discovery(arduino, tmp_path):
+    # 快取指向一個存在但不回應的串口
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    silent = os.ttyname(slave)
+    cache_path = str(tmp_path / "last_port.json")
+    save_cache("ELEVATOR", DiscoveredPort(silent, "ELEVATOR", "", 0.0, False), cache_path)
+    try:
+        found = discover("ELEVATOR", timeout=3.0, ports=[silent, arduino.port], cache_path=cache_path)
+        assert found.port == arduino.port and not found.cached
+        assert found.elapsed < 1.0
+        found = discover("ELEVATOR", timeout=3.0, ports=[silent, arduino.port], cache_path=cache_path)
+        assert found.port == arduino.port and found.cached
+    finally:
+        os.close(master)
+        os.close(slave)
@@ -0,0 +1,88 @@
+import random
+import pytest
+from elevator_engine import ALL_TYPES, ButtonType, Direction, ElevatorEngine, Request
+from request_index import RequestIndex, count_between, highest, lowest, next_above, next_below
+
+
+def floors_of(mask):
+    return [floor for floor in range(mask.bit_length()) if mask >> floor & 1]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_bit_helpers_match_brute_force(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        floors = floors_of(rng.getrandbits(rng.randint(1, 40)))
+        mask = sum(1 << floor for floor in floors)
+        floor = rng.randint(0, 42)
+        above = [f for f in floors if f > floor]
+        below = [f for f in floors if f < floor]
+        assert next_above(mask, floor) == (min(above) if above else None)
+        assert next_below(mask, floor) == (max(below) if below else None)
+        assert lowest(mask) == (min(floors) if floors else None)
+        assert highest(mask) == (max(floors) if floors else None)
+        low, high = sorted((rng.randint(0, 42), rng.randint(0, 42)))
+        assert count_between(mask, low, high) == sum(low < f < high for f in floors)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_index_matches_list(seed):
+    """隨機操作下，RequestIndex 與原本以串列保存請求（依序加入、同樓層同類型去重）的結果相同"""
+    rng = random.Random(seed)
+    index = RequestIndex(ALL_TYPES)
+    reference = []
+    for _ in range(2000):
+        op = rng.random()
+        floor = rng.randint(1, 20)
+        if op < 0.6:
+            request = Request(floor, rng.choice(ALL_TYPES))
+            duplicate = any(r.floor == floor and r.button_type == request.button_type for r in reference)
+            assert index.add(request) is not duplicate
+            if not duplicate:
+                reference.append(request)
+        elif op < 0.95:
+            types = rng.choice([None, (ButtonType.INTERNAL,), (ButtonType.UP, ButtonType.DOWN)])
+            removed = index.clear_floor(floor, types)
+            expected = [r for r in reference if r.floor == floor and r.button_type in (types or ALL_TYPES)]
+            assert sorted(map(id, removed)) == sorted(map(id, expected))
+            reference = [r for r in reference if r not in expected]
+        else:
+            index.clear()
+            reference = []
+
+        for types in (None, (ButtonType.INTERNAL,), (ButtonType.UP, ButtonType.DOWN)):
+            selected = [r for r in reference if r.button_type in (types or ALL_TYPES)]
+            assert index.requests(types) == selected
+            assert index.count(types) == len(selected)
+            assert floors_of(index.mask(types)) == sorted({r.floor for r in selected})
+            assert index.oldest(types) is (selected[0] if selected else None)
+
+
+def list_next_stop(requests, current, direction):
+    """原本 ElevatorControlSim.get_next_stop 的串列版本"""
+    if not requests:
+        return None
+    if direction == Direction.UP:
+        upper = [req.floor for req in requests if req.floor > current]
+        if upper:
+            return min(upper)
+    elif direction == Direction.DOWN:
+        lower = [req.floor for req in requests if req.floor < current]
+        if lower:
+            return max(lower)
+    return min(requests, key=lambda req: abs(req.floor - current)).floor
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_next_stop_matches_list_version(seed):
+    rng = random.Random(seed)
+    for _ in range(300):
+        num_floors = rng.randint(2, 12)
+        engine = ElevatorEngine(num_floors=num_floors, start_floor=rng.randint(1, num_floors))
+        engine.direction = rng.choice(list(Direction))
+        for _ in range(rng.randint(0, 8)):
+            engine.add_request(rng.randint(1, num_floors), rng.choice(ALL_TYPES))
+        # 內部請求排在外部請求之前，與原本 get_active_requests() 的串列順序相同
+        requests = engine.internal_requests + engine.external_requests
+        assert engine.nearest_directional_stop() == list_next_stop(requests, engine.current_floor,
+                                                                   engine.direction)
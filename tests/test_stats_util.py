@@ -0,0 +1,24 @@
+import pytest
+from stats_util import percentile
+
+
+@pytest.mark.parametrize("values, q, expected", [
+    (range(1, 21), 95, 19),
+    (range(1, 21), 50, 10),
+    (range(1, 21), 100, 20),
+    (range(1, 21), 0, 1),
+    (range(1, 101), 99, 99),
+    (range(1, 11), 90, 9),
+    (range(1, 11), 91, 10),
+    ([15, 20, 35, 40, 50], 30, 20),
+    ([15, 20, 35, 40, 50], 40, 20),
+    ([15, 20, 35, 40, 50], 50, 35),
+    ([7], 95, 7),
+])
+def test_percentile_nearest_rank(values, q, expected):
+    assert percentile(list(values), q) == expected
+
+
+def test_percentile_unsorted_and_empty():
+    assert percentile([5, 1, 4, 2, 3], 60) == 3
+    assert percentile([], 95) == 0.0
@@ -0,0 +1,33 @@
+import asyncio
+import os
+import tempfile
+import time
+import pytest
+from arduino_protocol import ArduinoLink
+from virtual_arduino import VirtualArduino
+
+
+@pytest.mark.parametrize("reset", [True, False])
+def test_reconnect_keeps_firmware_state_without_reset(reset):
+    link_path = os.path.join(tempfile.mkdtemp(), "ttyELEVATOR")
+    arduino = VirtualArduino(time_scale=0.01, boot_delay=0.0, downtime=0.05, reset_on_reconnect=reset,
+                             link_path=link_path).start()
+    try:
+        async def session():
+            link = await ArduinoLink(arduino.port).open()
+            assert await link.wait_ready()
+            await link.enable_binary()
+            lost = asyncio.ensure_future(link.wait_for("DISCONNECTED", 5))
+            arduino.disconnect()
+            await lost
+
+        asyncio.run(asyncio.wait_for(session(), 10))
+        deadline = time.monotonic() + 5
+        while arduino.disconnects < 1 or not os.path.exists(link_path):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        time.sleep(0.1)
+        assert arduino.boots == (2 if reset else 1)
+        assert arduino.binary_mode is not reset
+    finally:
+        arduino.stop()
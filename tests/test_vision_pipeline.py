@@ -0,0 +1,64 @@
+import threading
+import time
+from vision_pipeline import AdaptiveFrameScheduler, CaptureWorker
+
+
+class UnpluggedCapture:
+    """grab()/read() 一律立即失敗，模擬攝影機被拔除"""
+
+    def __init__(self, block=None):
+        self.calls = 0
+        self.released = 0
+        self.block = block
+
+    def grab(self):
+        self.calls += 1
+        return False
+
+    def read(self):
+        self.calls += 1
+        if self.block is not None:
+            self.block.wait()
+        assert not self.released, "read() 進行中攝影機已被釋放"
+        return False, None
+
+    def release(self):
+        self.released += 1
+
+
+class NullDetector:
+    baseline_established = True
+
+
+def test_failed_grab_backs_off():
+    # moving 狀態下大多數幀走 grab() 略過路徑
+    scheduler = AdaptiveFrameScheduler()
+    scheduler.set_state("moving")
+    capture = UnpluggedCapture()
+    worker = CaptureWorker(NullDetector(), capture=capture, scheduler=scheduler)
+    worker.start()
+    time.sleep(0.3)
+    worker.stop()
+    assert not worker.is_alive()
+    assert capture.calls < 20
+    assert capture.released == 1
+
+
+def test_release_waits_for_worker_to_exit():
+    block = threading.Event()
+    capture = UnpluggedCapture(block=block)
+    worker = CaptureWorker(NullDetector(), capture=capture)
+    worker.start()
+    time.sleep(0.05)
+    worker.stop(timeout=0.05)  # 背景執行緒仍卡在 read()
+    assert worker.is_alive()
+    assert capture.released == 0
+    block.set()
+    worker.join(1.0)
+    assert capture.released == 1
+
+
+def test_stop_without_start_releases():
+    capture = UnpluggedCapture()
+    CaptureWorker(NullDetector(), capture=capture).stop()
+    assert capture.released == 1
@@ -0,0 +1,106 @@
+import random
+from collections import namedtuple
+from elevator_engine import ButtonType
+
+
+class Arrival(namedtuple("Arrival", ["time", "origin", "destination"])):
+    """一位乘客的到站：time 秒時在 origin 按外部按鈕，上車後按 destination"""
+    __slots__ = ()
+
+    @property
+    def button_type(self):
+        return ButtonType.UP if self.destination > self.origin else ButtonType.DOWN
+
+    @property
+    def hall_call(self):
+        return self.origin, self.button_type
+
+    @property
+    def car_call(self):
+        return self.destination, ButtonType.INTERNAL
+
+
+# 各客流型態：(從大廳出發的比例, 前往大廳的比例)，其餘為樓層間均勻移動
+PROFILES = {
+    "interfloor": (0.0, 0.0),
+    "up_peak": (0.85, 0.05),
+    "down_peak": (0.05, 0.85),
+    "lunch": (0.45, 0.45),
+}
+
+# 一天的客流時段：(開始小時, 結束小時, 型態, 相對流量)
+DAY_SCHEDULE = (
+    (0.0, 7.0, "interfloor", 0.05),
+    (7.0, 8.0, "up_peak", 0.5),
+    (8.0, 9.5, "up_peak", 1.0),
+    (9.5, 12.0, "interfloor", 0.3),
+    (12.0, 13.5, "lunch", 0.7),
+    (13.5, 17.0, "interfloor", 0.3),
+    (17.0, 18.5, "down_peak", 1.0),
+    (18.5, 20.0, "down_peak", 0.4),
+    (20.0, 24.0, "interfloor", 0.05),
+)
+
+
+def day_period(t):
+    """回傳 t 秒（可跨日）所在時段的 (型態, 相對流量)"""
+    hour = (t / 3600.0) % 24
+    for start, end, profile, weight in DAY_SCHEDULE:
+        if start <= hour < end:
+            return profile, weight
+    return "interfloor", 0.0
+
+
+def passenger_stream(num_floors, rate, profile="interfloor", duration=None, seed=None, lobby=1, start=0.0):
+    """惰性產生乘客到站（Poisson 過程），不在記憶體中保留任何已產生的乘客
+
+    rate 為每秒平均到站人數；profile 可為 PROFILES 的名稱，或 "day" 代表依 DAY_SCHEDULE
+    隨時段改變型態與流量（以 rate 為尖峰流量做 thinning）。duration 為 None 時無限產生。
+    """
+    if num_floors < 2:
+        raise ValueError("至少需要兩個樓層")
+    rng = random.Random(seed)
+    upper_floors = [floor for floor in range(1, num_floors + 1) if floor != lobby]
+    t = start
+    end = None if duration is None else start + duration
+    while True:
+        t += rng.expovariate(rate)
+        if end is not None and t > end:
+            return
+        if profile == "day":
+            name, weight = day_period(t)
+            if rng.random() >= weight:
+                continue
+        else:
+            name = profile
+        from_lobby, to_lobby = PROFILES[name]
+        u = rng.random()
+        if u < from_lobby:
+            origin, destination = lobby, rng.choice(upper_floors)
+        elif u < from_lobby + to_lobby:
+            origin, destination = rng.choice(upper_floors), lobby
+        else:
+            origin = rng.randint(1, num_floors)
+            destination = rng.randint(1, num_floors - 1)
+            if destination >= origin:
+                destination += 1
+        yield Arrival(t, origin, destination)
+
+
+if __name__ == "__main__":
+    import itertools
+    import time
+    from elevator_engine import ElevatorEngine
+
+    floors, days = 10, 7
+    engine = ElevatorEngine(num_floors=floors, floor_time=1.5)
+    engine.feed(passenger_stream(floors, rate=0.2, profile="day", duration=days * 86400, seed=42))
+    start = time.perf_counter()
+    engine.run(until=days * 86400)
+    elapsed = time.perf_counter() - start
+    summary = engine.summary()
+    print(f"{days} 天客流共 {summary['served']} 人，耗時 {elapsed:.2f} 秒，平均等候 {summary['avg_wait']:.1f} 秒")
+
+    start = time.perf_counter()
+    count = sum(1 for _ in itertools.islice(passenger_stream(floors, rate=1.0, profile="up_peak", seed=1), 1_000_000))
+    print(f"產生 {count} 位乘客耗時 {time.perf_counter() - start:.2f} 秒")
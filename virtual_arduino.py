@@ -0,0 +1,756 @@
+import argparse
+import os
+import queue
+import random
+import select
+import sys
+import threading
+import time
+import tty
+from arduino_protocol import COMMAND_OPCODES, EVENT_OPCODES, cobs_decode, crc8, encode_frame
+from stats_util import percentile
+
+# 與 arduino_elevator.ino 相同的 opcode（由 arduino_protocol 的對照表反查）
+COMMAND_NAMES = {opcode: name for name, (opcode, _) in COMMAND_OPCODES.items()}
+EVENT_CODES = {kind: opcode for opcode, (kind, _, _) in EVENT_OPCODES.items()}
+
+RX_BUFFER = 64        # Arduino HardwareSerial 的接收緩衝區；loop() 阻塞期間超出的位元組會遺失
+MAX_FRAME = 32        # rxFrame 的大小
+LOOP_DELAY = 0.001    # loop() 結尾的 delay(1)：每輪最多處理一筆命令、馬達最多走一步
+
+
+class VirtualStepper:
+    """Unistep2 的時間模型：只有在 loop() 呼叫 run() 時才前進，每 period 秒最多一步
+
+    position 為馬達步數，與 arduino_elevator.ino 的 move() 方向相同（正值往下）。
+    """
+
+    def __init__(self, period, clock=time.monotonic):
+        self.period = period
+        self.clock = clock
+        self.position = 0
+        self._target = 0
+        self._last = clock()
+
+    def move(self, steps):
+        self.run()
+        self._target = self.position + steps
+        self._last = self.clock()
+
+    def run(self):
+        now = self.clock()
+        togo = self._target - self.position
+        if togo == 0:
+            self._last = now
+            return
+        steps = min(abs(togo), int((now - self._last) / self.period))
+        if steps:
+            self.position += steps if togo > 0 else -steps
+            self._last += steps * self.period
+
+    def steps_to_go(self):
+        return self._target - self.position
+
+    def time_to(self, position):
+        """走到 position 的時刻；不在目前的行程上時回傳 None"""
+        togo = self._target - self.position
+        delta = position - self.position
+        if togo == 0 or delta == 0 or (delta > 0) != (togo > 0) or abs(delta) > abs(togo):
+            return None
+        return self._last + abs(delta) * self.period
+
+    def finish_time(self):
+        togo = self.steps_to_go()
+        return self._last + abs(togo) * self.period if togo else None
+
+    def jump(self, steps):
+        """阻塞式移動（校準、測試）：呼叫端已經等待過對應的時間，直接走完"""
+        self.position += steps
+        self._target = self.position
+        self._last = self.clock()
+
+    def hold(self):
+        """loop() 阻塞期間沒有呼叫 run()，馬達不前進"""
+        self._last = self.clock()
+
+
+class VirtualArduino:
+    """以 pty 模擬燒錄 arduino_elevator.ino 的電梯板，不需要步進馬達與微動開關
+
+    逐一移植韌體的 loop()、processCommand()、processFrame()、checkLimitSwitches() 等邏輯：
+    文字與二進位訊框、@序號 / ACK、PING/MOVE/STOP/STATUS/EMERGENCY/CALIBRATE/INIT/TEST 都與韌體相同，
+    連韌體的行為細節也照搬（例如 moveToFloor() 一開始就把 currentPosition 設為目標，
+    因此不會送出 PROGRESS；重置後一律假設在 1 樓，與車廂實際位置無關）。
+
+    時間模型：馬達每 step_delay_us 微秒一步（每層 steps_per_floor 步），loop() 每輪 delay(1)，
+    串口依鮑率逐位元組送出；校準、測試與開機時的 setup() 會阻塞，期間收到的命令只保留 64 位元組。
+    所有韌體時間都乘上 time_scale（例如 0.01 為 100 倍速）。
+
+    微動開關是車廂的實體位置：底部在 1 樓下方 limit_margin 步、頂部在頂樓上方 limit_margin 步。
+    故障注入：jitter 為每次輸出前的隨機延遲上限（秒），drop_rate 為每個位元組（雙向）遺失的機率，
+    disconnect_interval 為平均幾秒（實際時間）斷線一次，斷線 downtime 秒後以新的 pty 重新連線；
+    reset_on_reconnect 為 False 時重新連線不重新開機、保留韌體狀態（二進位模式、序號記錄、位置），
+    模擬 USB 短暫中斷但板子沒有斷電，或清除 HUPCL 後 PC 關閉再開啟串口不會觸發重置的情況。
+    link_path 會建立指向目前 pty 的符號連結，重新連線時路徑不變。
+    """
+
+    def __init__(self, num_floors=3, steps_per_floor=1000, step_delay_us=1000, baud_rate=9600,
+                 time_scale=1.0, boot_delay=0.5, limit_margin=20, jitter=0.0, drop_rate=0.0,
+                 disconnect_interval=None, downtime=0.5, reset_on_reconnect=True, link_path=None, seed=None):
+        self.num_floors = num_floors
+        self.default_steps_per_floor = steps_per_floor
+        self.time_scale = time_scale
+        self.step_period = max(step_delay_us * 1e-6, LOOP_DELAY) * time_scale
+        self.byte_time = 10.0 / baud_rate * time_scale  # 8N1：每位元組 10 個位元
+        self.boot_delay = boot_delay
+        self.bottom_switch = -limit_margin
+        self.top_switch = (num_floors - 1) * steps_per_floor + limit_margin
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.disconnect_interval = disconnect_interval
+        self.downtime = downtime
+        self.reset_on_reconnect = reset_on_reconnect
+        self.link_path = link_path
+        self.rng = random.Random(seed)
+        self.stepper = VirtualStepper(self.step_period)
+        # 統計
+        self.commands = 0
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self.dropped_bytes = 0
+        self.overflow_bytes = 0
+        self.boots = 0
+        self.disconnects = 0
+        self.slave_name = None
+        self._master = None
+        self._slave = None
+        self._tx_queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._disconnect_event = threading.Event()
+        self._ready_event = threading.Event()
+        self._threads = []
+
+    @property
+    def port(self):
+        return self.link_path or self.slave_name
+
+    def height(self):
+        """車廂實際高度（步，1 樓為 0，往上為正）"""
+        return -self.stepper.position
+
+    # === 執行緒與 pty ===
+    def start(self, timeout=5.0):
+        """啟動模擬器，等到第一個 pty 建立（開機仍在背景進行，連線端應以 PING 等待就緒）"""
+        for target in (self._run, self._tx_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._ready_event.wait(timeout)
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._tx_queue.put(None)
+        for thread in self._threads:
+            thread.join(2.0)
+        self._close_pty()
+        if self.link_path and os.path.islink(self.link_path):
+            os.unlink(self.link_path)
+
+    def disconnect(self):
+        """模擬 USB 斷線（由模擬器執行緒處理）"""
+        self._disconnect_event.set()
+
+    def _open_pty(self):
+        master, slave = os.openpty()
+        tty.setraw(slave)  # 不回顯、不轉換換行，與真正的串口相同
+        os.set_blocking(master, False)
+        self._master, self._slave = master, slave
+        self.slave_name = os.ttyname(slave)
+        if self.link_path:
+            temp_path = f"{self.link_path}.tmp"
+            if os.path.lexists(temp_path):
+                os.unlink(temp_path)
+            os.symlink(self.slave_name, temp_path)
+            os.replace(temp_path, self.link_path)
+        self._ready_event.set()
+
+    def _close_pty(self):
+        master, slave, self._master, self._slave = self._master, self._slave, None, None
+        for fd in (master, slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._open_pty()
+            if self.reset_on_reconnect or not self.boots:
+                self._boot()
+            reason = self._serve()
+            self._clear_tx()
+            self._close_pty()
+            if reason == "stop":
+                return
+            self.disconnects += 1
+            print(f"🔌 虛擬 Arduino 斷線 {self.downtime} 秒"
+                  f"{'' if self.reset_on_reconnect else '（不重新開機）'}")
+            if self._stop_event.wait(self.downtime):
+                return
+
+    def _next_disconnect(self):
+        if not self.disconnect_interval:
+            return float("inf")
+        return time.monotonic() + self.rng.expovariate(1.0 / self.disconnect_interval)
+
+    def _serve(self):
+        """韌體的 loop()：串口有資料或有定時事件（到站、碰到微動開關、下一筆命令）時執行一輪"""
+        disconnect_at = self._next_disconnect()
+        while True:
+            if self._stop_event.is_set():
+                return "stop"
+            if self._disconnect_event.is_set() or time.monotonic() >= disconnect_at:
+                self._disconnect_event.clear()
+                return "disconnect"
+            wakeup = min(self._next_wakeup(), disconnect_at, time.monotonic() + 0.2)
+            ready, _, _ = select.select([self._master], [], [], max(0.0, wakeup - time.monotonic()))
+            if ready:
+                self._receive()
+            self._loop()
+
+    def _next_wakeup(self):
+        times = [float("inf")]
+        if self._has_command():
+            times.append(self._next_command_at)
+        if self.stepper.steps_to_go():
+            times.append(self.stepper.finish_time())
+            for switch in (self.bottom_switch, self.top_switch):
+                crossing = self.stepper.time_to(-switch)
+                if crossing is not None:
+                    times.append(crossing)
+        return min(times)
+
+    def _receive(self, limit=None):
+        """從 pty 讀取 PC 送來的位元組；limit 為緩衝區剩餘空間（阻塞後才需要）"""
+        try:
+            data = os.read(self._master, 4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            return
+        self.rx_bytes += len(data)
+        if self.drop_rate:
+            kept = bytes(byte for byte in data if self.rng.random() >= self.drop_rate)
+            self.dropped_bytes += len(data) - len(kept)
+            data = kept
+        if limit is not None and len(data) > limit:
+            self.overflow_bytes += len(data) - limit
+            data = data[:limit]
+        self._rx += data
+
+    def _clear_tx(self):
+        try:
+            while True:
+                self._tx_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _tx_loop(self):
+        """依鮑率逐批送出，並注入延遲抖動與位元組遺失"""
+        while True:
+            data = self._tx_queue.get()
+            if data is None:
+                return
+            if self.jitter:
+                time.sleep(self.rng.uniform(0, self.jitter))
+            if self.drop_rate:
+                kept = bytes(byte for byte in data if self.rng.random() >= self.drop_rate)
+                self.dropped_bytes += len(data) - len(kept)
+                data = kept
+            master = self._master
+            if master is None or not data:
+                continue
+            try:
+                os.write(master, data)
+                self.tx_bytes += len(data)
+            except OSError:
+                pass  # 沒有人讀取或已斷線：資料遺失
+            time.sleep(len(data) * self.byte_time)
+
+    # === 韌體：輸出 ===
+    def _println(self, text=""):
+        self._tx_queue.put(f"{text}\n".encode())
+
+    def _send_frame(self, kind, args=b""):
+        self._tx_queue.put(encode_frame(EVENT_CODES[kind], self.tx_seq, bytes(args)))
+        self.tx_seq = (self.tx_seq + 1) & 0xFF
+
+    def _debug_line(self, message):
+        if not self.binary_mode:
+            self._println(message)
+
+    def _report_floor(self, kind, floor):
+        if self.binary_mode:
+            self._send_frame(kind, [floor])
+        else:
+            self._println(f"{kind}:{floor}")
+
+    def _report_progress(self):
+        if self.binary_mode:
+            self._send_frame("PROGRESS", [self.move_progress])
+        else:
+            self._println(f"PROGRESS:{self.move_progress}%")
+
+    def _report_limit(self, top):
+        if self.binary_mode:
+            self._send_frame("LIMIT", [1 if top else 0])
+        else:
+            self._println("LIMIT:top" if top else "LIMIT:bottom")
+
+    def _report_status(self):
+        if self.binary_mode:
+            flags = (1 if self.is_moving else 0) | (2 if self.emergency_mode else 0)
+            self._send_frame("STATUS", [self.current_floor, self.target_floor, flags])
+        else:
+            self._println(f"STATUS:{self.current_floor}:{self.target_floor}:"
+                          f"{'MOVING' if self.is_moving else 'IDLE'}:"
+                          f"{'EMERGENCY' if self.emergency_mode else 'NORMAL'}")
+
+    # === 韌體：開機與 setup() ===
+    def _delay(self, seconds):
+        """阻塞的 delay()：期間不呼叫 run()，也不讀串口"""
+        time.sleep(seconds * self.time_scale)
+
+    def _end_block(self):
+        """阻塞結束：馬達從現在起才繼續走，阻塞期間收到的位元組只保留緩衝區放得下的部分"""
+        self.stepper.hold()
+        self._receive(limit=max(0, RX_BUFFER - len(self._rx)))
+
+    def _boot(self):
+        self.boots += 1
+        # 全域變數初始值
+        self.current_floor = 1
+        self.target_floor = 1
+        self.is_moving = False
+        self.emergency_mode = False
+        self.is_calibrating = False
+        self.current_position = 0
+        self.steps_per_floor = self.default_steps_per_floor
+        self.floor_positions = [0] * (self.num_floors + 1)
+        self.target_position = 0
+        self.move_progress = 0
+        self.binary_mode = False
+        self.tx_seq = 0
+        self.last_rx_seq = -1
+        self.input_string = ""
+        self.rx_frame = bytearray()
+        self.last_top_state = True  # HIGH：未觸發
+        self.last_bottom_state = True
+        self._rx = bytearray()
+        self._next_command_at = 0.0
+        self.stepper.move(0)
+
+        # bootloader：這段時間收到的位元組都被丟棄
+        self._delay(self.boot_delay)
+        try:
+            while os.read(self._master, 4096):
+                pass
+        except OSError:
+            pass
+
+        # setup()
+        self._println("馬達測試中...")
+        self._blocking_move(-100)
+        self._delay(0.5)
+        self._blocking_move(100)
+        self._println("馬達測試完成")
+        self._initialize_floor_positions()
+        self._println("Arduino Elevator Ready")
+        self._end_block()
+
+    def _blocking_move(self, steps):
+        time.sleep(abs(steps) * self.step_period)
+        self.stepper.jump(steps)
+
+    # === 韌體：loop() ===
+    def _loop(self):
+        self.stepper.run()
+        now = time.monotonic()
+        if now >= self._next_command_at:
+            command = self._read_command()
+            if command is not None:
+                self._next_command_at = now + LOOP_DELAY * self.time_scale
+                self.commands += 1
+                if isinstance(command, str):
+                    if command.strip() == "PING":
+                        self.last_rx_seq = -1  # 只有不帶序號的握手 PING 清除序號記錄
+                    self._process_command(command)
+                else:
+                    self._process_frame(command)
+        self._check_limit_switches()
+        self._update_movement_status()
+        self._update_position()
+
+    def _has_command(self):
+        return (0 if self.binary_mode else 0x0A) in self._rx
+
+    def _read_command(self):
+        """serialEvent()：一次只收一筆命令，回傳文字命令（str）或訊框（bytes）"""
+        while self._rx:
+            byte = self._rx.pop(0)
+            if self.binary_mode:
+                if byte == 0:
+                    if self.rx_frame:
+                        frame, self.rx_frame = bytes(self.rx_frame), bytearray()
+                        return frame
+                elif byte == 0x0A and self.rx_frame.endswith(b"PING"):
+                    # 文字模式的握手 PING：切回文字模式
+                    self.binary_mode = False
+                    self.rx_frame = bytearray()
+                    return "PING"
+                else:
+                    if len(self.rx_frame) == MAX_FRAME:
+                        self.rx_frame = bytearray()
+                    self.rx_frame.append(byte)
+            elif byte == 0x0A:
+                line, self.input_string = self.input_string, ""
+                return line
+            else:
+                self.input_string += chr(byte)
+        return None
+
+    def _update_movement_status(self):
+        if self.is_moving and self.stepper.steps_to_go() == 0:
+            self.is_moving = False
+            self.current_floor = self._calculate_current_floor()
+            self._report_floor("MOVE_COMPLETE", self.current_floor)
+        if self.is_moving:
+            # 與韌體相同：currentPosition 在 moveToFloor() 時已設為目標，totalSteps 為 0，不會回報進度
+            total_steps = abs(self.target_position - self.current_position)
+            if total_steps > 0:
+                remaining = abs(self.stepper.steps_to_go())
+                progress = (total_steps - remaining) * 100 // total_steps
+                if progress != self.move_progress and progress % 10 == 0:
+                    self.move_progress = progress
+                    self._report_progress()
+
+    def _check_limit_switches(self):
+        # 微動開關按下時讀到 LOW（False）
+        top_state = not self.height() >= self.top_switch
+        bottom_state = not self.height() <= self.bottom_switch
+        if not top_state and self.last_top_state:
+            self._report_limit(True)
+            if self.is_calibrating:
+                self.floor_positions[self.num_floors] = self.current_position
+            if self.is_moving:
+                self.stepper.move(0)
+                self.is_moving = False
+                self._debug_line("到達頂部限位，強制停止")
+        if not bottom_state and self.last_bottom_state:
+            self._report_limit(False)
+            if self.is_calibrating:
+                self.floor_positions[1] = self.current_position
+                self.current_position = 0
+                self.current_floor = 1
+            if self.is_moving:
+                self.stepper.move(0)
+                self.is_moving = False
+                self._debug_line("到達底部限位，強制停止")
+        self.last_top_state = top_state
+        self.last_bottom_state = bottom_state
+
+    def _update_position(self):
+        if not self.is_calibrating and not self.is_moving:
+            floor = self._calculate_current_floor()
+            if floor != self.current_floor:
+                self.current_floor = floor
+                self._report_floor("POS", floor)
+
+    def _calculate_current_floor(self):
+        distances = [abs(self.current_position - self.floor_positions[floor])
+                     for floor in range(1, self.num_floors + 1)]
+        return distances.index(min(distances)) + 1
+
+    def _initialize_floor_positions(self):
+        self.steps_per_floor = self.default_steps_per_floor
+        for floor in range(1, self.num_floors + 1):
+            self.floor_positions[floor] = (floor - 1) * self.steps_per_floor
+        self.current_position = 0
+        self.current_floor = 1
+        self.target_floor = 1
+        self.is_moving = False
+        self.emergency_mode = False
+        self._debug_line("樓層位置初始化完成（預設值）")
+        self._print_floor_positions()
+        self._debug_line("電梯初始化在1樓")
+        self._report_status()
+
+    def _print_floor_positions(self):
+        if self.binary_mode:
+            return
+        for floor in range(1, self.num_floors + 1):
+            self._println(f"{floor}樓位置: {self.floor_positions[floor]}")
+        self._println(f"每層步數: {self.steps_per_floor}")
+
+    def _calibrate_floor_positions(self):
+        self.is_calibrating = True
+        self._debug_line("開始校準：移動到底部")
+        self.current_position = 0
+        # 往下走到底部微動開關（最多 10000 步），每 100 步回報一次
+        steps = min(10000, max(0, self.height() - self.bottom_switch))
+        for count in range(100, steps + 1, 100):
+            self._blocking_move(100)
+            if not self.binary_mode:
+                self._println(f"步數: {count}")
+        self._blocking_move(steps % 100)
+        self.current_position = 0
+        self.floor_positions[1] = 0
+        self._debug_line("1樓位置校準完成")
+        self._delay(1.0)
+
+        # 往上走到頂部微動開關，計算總行程
+        self._debug_line("移動到頂部")
+        steps = min(10000, max(0, self.top_switch - self.height()))
+        for count in range(200, steps + 1, 200):
+            self._blocking_move(-200)
+            self.current_position += 200
+            if not self.binary_mode:
+                self._println(f"總步數: {self.current_position}")
+        self._blocking_move(-(steps % 200))
+        self.current_position += steps % 200
+
+        self.floor_positions[self.num_floors] = self.current_position
+        self.steps_per_floor = (self.floor_positions[self.num_floors] - self.floor_positions[1]) // (self.num_floors - 1)
+        for floor in range(2, self.num_floors):
+            self.floor_positions[floor] = self.floor_positions[1] + (floor - 1) * self.steps_per_floor
+        self._debug_line("校準完成")
+        self._print_floor_positions()
+        self._delay(2.0)
+        self._move_to_floor(1)
+        self.is_calibrating = False
+        self._debug_line("校準完成")
+        self._delay(2.0)
+        self._end_block()
+
+    def _move_to_floor(self, floor):
+        if floor < 1 or floor > self.num_floors or self.emergency_mode:
+            return
+        self.target_floor = floor
+        self.target_position = self.floor_positions[floor]
+        steps_to_move = self.target_position - self.current_position
+        if abs(steps_to_move) < 10:
+            self._report_floor("MOVE_COMPLETE", floor)
+            return
+        self.is_moving = True
+        self.move_progress = 0
+        self._report_floor("MOVE_START", floor)
+        if not self.binary_mode:
+            self._println(f"{'向上移動' if steps_to_move > 0 else '向下移動'} {abs(steps_to_move)} 步")
+        self.stepper.move(-steps_to_move)
+        self.current_position = self.target_position
+
+    def _acknowledge(self, seq):
+        if self.binary_mode:
+            self._send_frame("ACK", [seq])
+        else:
+            self._println(f"ACK:{seq}")
+        if seq == self.last_rx_seq:
+            return False
+        self.last_rx_seq = seq
+        return True
+
+    def _process_command(self, command):
+        command = command.strip()
+        if command.startswith("@"):
+            seq, space, rest = command[1:].partition(" ")
+            if not space or not self._acknowledge(int(seq) if seq.isdigit() else 0):
+                return
+            command = rest
+        if command == "PING":
+            if self.binary_mode:
+                self._send_frame("PONG")
+            else:
+                self._println("PONG:ELEVATOR")
+        elif command == "BINARY":
+            self._println("BINARY:OK")
+            self.binary_mode = True
+            self.tx_seq = 0
+        elif command.startswith("MOVE:"):
+            floor = int(command[5:]) if command[5:].isdigit() else 0
+            if 1 <= floor <= self.num_floors:
+                self._move_to_floor(floor)
+        elif command == "STOP":
+            self.stepper.move(0)
+            self.is_moving = False
+            self.emergency_mode = False
+            self._debug_line("馬達停止")
+        elif command == "CALIBRATE":
+            self._calibrate_floor_positions()
+        elif command == "INIT":
+            self._initialize_floor_positions()
+        elif command == "TEST":
+            self._debug_line("開始馬達測試")
+            self._blocking_move(-200)
+            self._delay(0.5)
+            self._blocking_move(200)
+            self._debug_line("馬達測試完成")
+            self._end_block()
+        elif command.startswith("EMERGENCY:"):
+            if command[10:] == "ON":
+                self.emergency_mode = True
+                self.stepper.move(0)
+                self.is_moving = False
+                self._debug_line("緊急模式啟動")
+            else:
+                self.emergency_mode = False
+                self._debug_line("緊急模式解除")
+        elif command == "STATUS":
+            self._report_status()
+
+    def _process_frame(self, frame):
+        try:
+            payload = cobs_decode(frame)
+        except ValueError:
+            return
+        if len(payload) < 3 or crc8(payload[:-1]) != payload[-1]:
+            return  # 損毀的訊框直接丟棄，由 PC 端逾時重送
+        opcode, seq = payload[0], payload[1]
+        arg = payload[2] if len(payload) > 3 else 0
+        if not self._acknowledge(seq):
+            return
+        name = COMMAND_NAMES.get(opcode)
+        if name == "TEXT":
+            self.binary_mode = False
+            return
+        if name is None:
+            return
+        if name == "MOVE":
+            name = f"MOVE:{arg}"
+        elif name == "EMERGENCY":
+            name = f"EMERGENCY:{'ON' if arg else 'OFF'}"
+        self._process_command(name)
+
+
+def load_test(arduino, moves=50, binary=False, seed=0, verbose=False):
+    """以 ArduinoController 對模擬器連續下達 MOVE，量測命令 RTT、到站延遲與斷線重連"""
+    import contextlib
+    import io
+    from physical_elevator import ArduinoController
+
+    rng = random.Random(seed)
+    arrived = threading.Event()
+    state = {"target": None, "floor": 1, "lost_at": None}
+    reconnect_times = []
+    connected = threading.Event()
+
+    def on_position(floor):
+        state["floor"] = floor
+        if floor == state["target"]:
+            arrived.set()
+
+    def on_connection(ok, message):
+        if ok:
+            if state["lost_at"] is not None:
+                reconnect_times.append(time.perf_counter() - state["lost_at"])
+                state["lost_at"] = None
+            state["floor"] = 1  # 連線後控制器送出 INIT（重新開機時亦同），韌體一律假設在 1 樓
+            connected.set()
+        else:
+            state["lost_at"] = state["lost_at"] or time.perf_counter()
+            connected.clear()
+
+    output = sys.stdout if verbose else io.StringIO()
+    latencies = []
+    overheads = []
+    timeouts = 0
+    with contextlib.redirect_stdout(output):
+        controller = ArduinoController(binary=binary, ports=[arduino.port])
+        controller.position_callback = on_position
+        controller.connection_callback = on_connection
+        if controller.connected:
+            connected.set()
+        for _ in range(moves):
+            if not connected.wait(30):
+                break
+            target = rng.choice([floor for floor in range(1, arduino.num_floors + 1) if floor != state["floor"]])
+            travel = abs(target - state["floor"]) * arduino.default_steps_per_floor * arduino.step_period
+            state["target"] = target
+            arrived.clear()
+            start = time.perf_counter()
+            controller.move_to_floor(target)
+            if arrived.wait(travel * 2 + 5.0):
+                latency = time.perf_counter() - start
+                latencies.append(latency)
+                overheads.append(latency - travel)
+            else:
+                timeouts += 1
+        stats = controller.command_stats()
+        controller.close()
+
+    def describe(values):
+        if not values:
+            return "—"
+        return (f"平均 {sum(values) / len(values) * 1000:.1f} ms，p95 "
+                f"{percentile(values, 95) * 1000:.1f} ms，最大 {max(values) * 1000:.1f} ms")
+
+    print(f"🏁 {moves} 趟移動：完成 {len(latencies)}、逾時 {timeouts}")
+    print(f"  到站延遲：{describe(latencies)}")
+    print(f"  扣除行程時間的額外延遲：{describe(overheads)}")
+    if stats:
+        # 命令佇列每次連線重新建立，以下只統計最後一次連線
+        for kind, value in stats["rtt"].items():
+            print(f"  {kind} RTT：平均 {value['mean_ms']:.2f} ms，p95 {value['p95_ms']:.2f} ms（{value['count']} 筆）")
+        print(f"  命令（最後一次連線）：送出 {stats['sent']}、確認 {stats['acked']}、重送 {stats['retransmits']}、"
+              f"合併 {stats['coalesced']}、失敗 {stats['failed']}")
+    print(f"  模擬器：開機 {arduino.boots} 次、斷線 {arduino.disconnects} 次、遺失 {arduino.dropped_bytes} 位元組、"
+          f"緩衝區溢位 {arduino.overflow_bytes} 位元組；重連 {describe(reconnect_times)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以 pty 模擬執行 arduino_elevator.ino 的 Arduino")
+    parser.add_argument("--link", help="建立指向 pty 的符號連結（重新連線時路徑不變），例如 /tmp/ttyELEVATOR")
+    parser.add_argument("--floors", type=int, default=3)
+    parser.add_argument("--steps-per-floor", type=int, default=1000)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="韌體時間倍率，0.01 為 100 倍速")
+    parser.add_argument("--boot-delay", type=float, default=0.5, help="bootloader 等待秒數")
+    parser.add_argument("--jitter", type=float, default=0.0, help="每次輸出前的隨機延遲上限（秒）")
+    parser.add_argument("--drop", type=float, default=0.0, help="每個位元組遺失的機率")
+    parser.add_argument("--disconnect-interval", type=float, help="平均幾秒斷線一次")
+    parser.add_argument("--downtime", type=float, default=0.5, help="斷線持續秒數")
+    parser.add_argument("--no-reset", action="store_true",
+                        help="斷線後重新連線時不重新開機，保留二進位模式等韌體狀態")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--load-test", type=int, metavar="N", help="以 ArduinoController 連續下達 N 趟移動")
+    parser.add_argument("--binary", action="store_true", help="壓力測試使用二進位訊框")
+    parser.add_argument("--verbose", action="store_true", help="壓力測試時顯示控制器輸出")
+    args = parser.parse_args(argv)
+
+    link_path = args.link
+    if link_path is None and args.load_test:
+        # 斷線後 pty 名稱會改變，壓力測試一律透過固定的符號連結重連
+        import tempfile
+        link_path = os.path.join(tempfile.mkdtemp(), "ttyELEVATOR")
+    arduino = VirtualArduino(num_floors=args.floors, steps_per_floor=args.steps_per_floor,
+                             time_scale=args.time_scale, boot_delay=args.boot_delay, jitter=args.jitter,
+                             drop_rate=args.drop, disconnect_interval=args.disconnect_interval,
+                             downtime=args.downtime, reset_on_reconnect=not args.no_reset, link_path=link_path,
+                             seed=args.seed).start()
+    try:
+        if args.load_test:
+            load_test(arduino, args.load_test, binary=args.binary, seed=args.seed or 0, verbose=args.verbose)
+            return 0
+        print(f"🤖 虛擬 Arduino 已啟動: {arduino.port}")
+        print(f"   另開終端機執行: python physical_elevator.py --port {arduino.port}")
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        arduino.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
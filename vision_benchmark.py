@@ -0,0 +1,211 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from array import array
+import cv2
+import numpy as np
+from stats_util import percentile
+from vision_pipeline import PenetrationDetector, RedDetector
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class StageTimer:
+    """收集各階段耗時（秒），可直接指定給偵測器的 timer"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def __call__(self, stage, seconds):
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = array("d")
+        samples.append(seconds)
+
+    def report(self):
+        """各階段的平均與 p50/p90/p99 延遲（毫秒）"""
+        stats = {}
+        for stage, samples in self.samples.items():
+            values = list(samples)
+            stats[stage] = {
+                "count": len(values),
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p90_ms": percentile(values, 90) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+        return stats
+
+
+def synthetic_frames(count, size=(640, 480), blobs=3, seed=0, red=True, still=0.0, noise=0.0):
+    """移動色塊產生器：雜訊背景上有數個移動的圓，其中一個為紅色（供紅色偵測使用）
+
+    still 為靜止畫面的比例（每 100 幀中前 still × 100 幀色塊不動）；noise 為每幀加上的感光雜訊標準差。
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = rng.integers(0, 80, (height, width, 3), dtype=np.uint8)
+    positions = rng.uniform((0, 0), (width, height), (blobs, 2))
+    velocities = rng.uniform(-8, 8, (blobs, 2))
+    radius = max(8, min(width, height) // 8)
+    # 預先產生數張雜訊輪流使用（正負分開存放，以飽和加減法套用），避免雜訊本身拖慢 capture
+    noise_fields = []
+    for _ in range(8 if noise else 0):
+        field = rng.normal(0, noise, (height, width, 3))
+        noise_fields.append((np.clip(field, 0, 255).astype(np.uint8), np.clip(-field, 0, 255).astype(np.uint8)))
+    for frame_index in range(count):
+        frame = background.copy()
+        if frame_index % 100 >= still * 100:
+            positions += velocities
+        for axis, limit in ((0, width), (1, height)):
+            bounce = (positions[:, axis] < 0) | (positions[:, axis] > limit)
+            velocities[bounce, axis] *= -1
+        for index, (x, y) in enumerate(positions.astype(int)):
+            color = (30, 30, 220) if red and index == 0 else (230, 230, 230)
+            cv2.circle(frame, (int(x), int(y)), radius, color, -1)
+        if noise_fields:
+            positive, negative = noise_fields[frame_index % len(noise_fields)]
+            cv2.add(frame, positive, dst=frame)
+            cv2.subtract(frame, negative, dst=frame)
+        yield frame
+
+
+def video_frames(path, count=None):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"無法開啟影片：{path}")
+    try:
+        produced = 0
+        while count is None or produced < count:
+            ret, frame = capture.read()
+            if not ret:
+                return
+            produced += 1
+            yield frame
+    finally:
+        capture.release()
+
+
+def image_frames(directory, count=None):
+    paths = sorted(path for path in glob.glob(os.path.join(directory, "*"))
+                   if path.lower().endswith(IMAGE_EXTENSIONS))
+    if not paths:
+        raise ValueError(f"目錄中沒有影像檔：{directory}")
+    for path in paths[:count]:
+        frame = cv2.imread(path)
+        if frame is not None:
+            yield frame
+
+
+def open_source(source, count=None, size=(640, 480), seed=0, still=0.0, noise=0.0):
+    """source 可為 "synthetic"、影片檔路徑或影像目錄"""
+    if source == "synthetic":
+        return synthetic_frames(count or 300, size=size, seed=seed, still=still, noise=noise)
+    if os.path.isdir(source):
+        return image_frames(source, count)
+    return video_frames(source, count)
+
+
+def run_pipeline(name, frames, preview_size=(320, 240), process_size=None, roi=None, warmup=30, zones=None,
+                 change_threshold=None):
+    """以逐幀方式執行 mog2 或 red 偵測，回傳 fps、各階段延遲與略過的靜止幀數"""
+    timer = StageTimer()
+    if name == "mog2":
+        detector = PenetrationDetector(warmup_frames=warmup, process_size=process_size, roi=roi, zones=zones,
+                                       change_threshold=change_threshold)
+    elif name == "red":
+        detector = RedDetector(process_size=process_size)
+    else:
+        raise ValueError(f"未知的偵測管線：{name}")
+
+    processed = 0
+    iterator = iter(frames)
+    while True:
+        t0 = time.perf_counter()
+        frame = next(iterator, None)
+        if frame is None:
+            break
+        t1 = time.perf_counter()
+        if name == "mog2":
+            # 背景基準建立期間不計入各階段延遲
+            detector.timer = timer if detector.baseline_established else None
+            result = detector.process(frame)
+            if not result.ready:
+                continue
+            t2 = time.perf_counter()
+            rendered = detector.overlay(frame, result.mask)
+        else:
+            detector.timer = timer
+            _, red_mask = detector.process(frame)
+            t2 = time.perf_counter()
+            rendered = detector.render(frame, red_mask)
+        preview = cv2.cvtColor(cv2.resize(rendered, preview_size), cv2.COLOR_BGR2RGB)
+        t3 = time.perf_counter()
+        timer("capture", t1 - t0)
+        timer("render", t3 - t2)
+        timer("total", t3 - t0)
+        processed += 1
+    # 背景基準建立期間的幀不計入 fps
+    elapsed = sum(timer.samples.get("total", ()))
+    return {
+        "pipeline": name,
+        "frames": processed,
+        "fps": processed / elapsed if elapsed else 0.0,
+        "skipped": getattr(detector, "skipped_frames", 0),
+        "stages": timer.report(),
+    }
+
+
+def parse_size(text):
+    if text is None:
+        return None
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def print_report(result):
+    print(f"\n{result['pipeline']}：{result['frames']} 幀，{result['fps']:.1f} fps")
+    if result["skipped"]:
+        print(f"  靜止畫面略過 {result['skipped']} 幀（{result['skipped'] / result['frames']:.0%}）")
+    print(f"  {'階段':<12}{'平均':>8}{'p50':>8}{'p90':>8}{'p99':>8}  (ms)")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<12}{stats['mean_ms']:>8.2f}{stats['p50_ms']:>8.2f}"
+              f"{stats['p90_ms']:>8.2f}{stats['p99_ms']:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="離線量測影像偵測管線的 fps 與各階段延遲")
+    parser.add_argument("--source", default="synthetic", help="synthetic、影片檔或影像目錄")
+    parser.add_argument("--pipeline", nargs="+", default=["mog2", "red"], choices=["mog2", "red"])
+    parser.add_argument("--frames", type=int, help="最多處理的幀數（synthetic 預設 300）")
+    parser.add_argument("--size", default="640x480", help="synthetic 畫面大小")
+    parser.add_argument("--process-size", help="偵測處理解析度，例如 320x240")
+    parser.add_argument("--roi", help="MOG2 偵測多邊形 JSON，例如 [[0.2,0.4],[0.8,0.4],[0.9,1],[0.1,1]]")
+    parser.add_argument("--zones", help="MOG2 區域格線（列x行），例如 3x3")
+    parser.add_argument("--change-threshold", type=float, help="MOG2 靜止畫面判斷閾值（灰階差），例如 8")
+    parser.add_argument("--still", type=float, default=0.0, help="synthetic 中靜止畫面的比例（0–1）")
+    parser.add_argument("--noise", type=float, default=0.0, help="synthetic 每幀的感光雜訊標準差")
+    parser.add_argument("--json", help="把結果寫入 JSON 檔")
+    args = parser.parse_args(argv)
+
+    roi = json.loads(args.roi) if args.roi else None
+    results = []
+    for name in args.pipeline:
+        frames = open_source(args.source, args.frames, size=parse_size(args.size), still=args.still,
+                             noise=args.noise)
+        result = run_pipeline(name, frames, process_size=parse_size(args.process_size), roi=roi,
+                              zones=parse_size(args.zones), change_threshold=args.change_threshold)
+        print_report(result)
+        results.append(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"source": args.source, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 結果已寫入 {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,573 @@
+import queue
+import threading
+from collections import deque
+import time
+import cv2
+import numpy as np
+
+
+class DetectionResult:
+    """一幀的偵測結果：突破量（百分比）、前景遮罩、各區域前景比例與已縮放的 RGB 預覽圖"""
+    __slots__ = ("frame_id", "timestamp", "ready", "warmup", "ratio", "area", "total_area",
+                 "mask", "zones", "reused", "preview", "latency")
+
+    def __init__(self, frame_id, timestamp, ready, warmup, ratio=0.0, area=0, total_area=0, mask=None,
+                 zones=None, reused=False):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.ready = ready
+        self.warmup = warmup
+        self.ratio = ratio
+        self.area = area
+        self.total_area = total_area
+        self.mask = mask
+        self.zones = zones
+        self.reused = reused
+        self.preview = None
+        self.latency = 0.0
+
+
+def _zone_sums(integral, ys, xs):
+    """以積分圖的四個角求出 ys × xs 格線中每個區域的總和"""
+    corners = integral[np.ix_(ys, xs)].astype(np.float64)
+    return corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+
+
+class PenetrationDetector:
+    """MOG2 前景突破量偵測，處理步驟與 GUI 原本相同
+
+    前 warmup_frames 幀只用來建立背景基準；之後每幀做背景減除、高斯模糊、二值化、
+    開運算與閉運算，再以前景像素數 / 偵測區域像素數得到突破量。
+
+    process_size=(寬, 高) 會先把畫面縮小到此解析度再處理；roi 為以 0–1 正規化座標表示的多邊形
+    （例如只框車廂地板或門口），設定後只在多邊形的外接矩形內做背景減除與形態學，
+    並只計算多邊形內的前景。
+
+    zones=(列, 行) 會把偵測區域（ROI 的外接矩形）切成格狀區域，DetectionResult.zones 為
+    (列, 行) 的 0–1 前景比例陣列（例如區分門口與車廂後方）。各區域由同一張 cv2.integral
+    積分圖以四個角相減得到，每個區域 O(1)，不必再掃描像素；設定 ROI 時分母只計多邊形內的像素。
+
+    change_threshold 設定後會先把畫面縮成 32×24 灰階，與上次完整處理的畫面做 absdiff；
+    最大差異小於此值（灰階 0–255）時視為靜止畫面，略過背景減除與形態學，直接沿用上次的突破量
+    （DetectionResult.reused 為 True）。與上次「完整處理」的畫面比較，因此緩慢變化會累積到超過閾值；
+    連續略過 max_skipped 幀後仍會強制完整處理一次，讓背景模型持續更新。
+    processed_frames / skipped_frames 累計完整處理與略過的幀數。
+
+    各處理步驟寫入預先配置的緩衝區（dst），結構元素也只建立一次，穩定運作時每幀幾乎不配置記憶體；
+    因此 DetectionResult.mask 只在下一次 process() 之前有效，需要保留時請自行 copy()。
+    timer 若設定為 timer(階段名稱, 秒數)，每幀會回報 change（有設定 change_threshold 時）、
+    apply、blur、morphology、count 各階段的耗時。
+    """
+    CHANGE_SIZE = (32, 24)
+
+    def __init__(self, warmup_frames=30, history=500, var_threshold=16, detect_shadows=True,
+                 overlay_alpha=0.4, process_size=None, roi=None, zones=None, change_threshold=None,
+                 max_skipped=30):
+        self.warmup_frames = warmup_frames
+        self.process_size = process_size
+        self.roi = roi
+        self.zones = zones
+        self.change_threshold = change_threshold
+        self.max_skipped = max_skipped
+        self.processed_frames = 0
+        self.skipped_frames = 0
+        self._change_buffers = None
+        self._pending_roi = None
+        self._geometry = None
+        self.history = history
+        self.var_threshold = var_threshold
+        self.detect_shadows = detect_shadows
+        self.overlay_alpha = overlay_alpha
+        self._reset_requested = False
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+        self._mask_buffers = None
+        self._integral = None
+        self._overlay_buffers = None
+        self.timer = None
+        self.reset()
+
+    def reset(self):
+        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
+            history=self.history, varThreshold=self.var_threshold, detectShadows=self.detect_shadows
+        )
+        self.stabilization_frames = 0
+        self.frame_id = 0
+        self._change_reference = None
+        self._last_result = None
+        self._skip_run = 0
+
+    def request_reset(self):
+        """由其他執行緒要求重置；在下一幀處理前生效"""
+        self._reset_requested = True
+
+    def set_roi(self, roi):
+        """更換偵測區域（None 為整個畫面）；在下一幀生效並重新建立背景基準"""
+        self._pending_roi = (roi,)
+
+    def _prepare(self, shape):
+        """依畫面大小計算處理解析度、ROI 遮罩、外接矩形與區域格線，只在大小、ROI 或區域改變時重算"""
+        key = (shape[:2], self.process_size, None if self.roi is None else tuple(map(tuple, self.roi)),
+               self.zones)
+        if self._geometry is not None and self._geometry[0] == key:
+            return self._geometry
+        height, width = shape[:2]
+        if self.process_size is not None:
+            width, height = self.process_size
+        if self.roi is None:
+            rect = (0, 0, width, height)
+            roi_mask = None
+            roi_area = width * height
+            polygon = None
+        else:
+            polygon = np.array([(round(x * (width - 1)), round(y * (height - 1))) for x, y in self.roi],
+                               dtype=np.int32)
+            full = np.zeros((height, width), np.uint8)
+            cv2.fillPoly(full, [polygon], 255)
+            x, y, w, h = cv2.boundingRect(polygon)
+            rect = (x, y, w, h)
+            roi_mask = full[y:y + h, x:x + w].copy()
+            roi_area = max(cv2.countNonZero(roi_mask), 1)
+        zone_grid = None
+        if self.zones is not None:
+            rows, cols = self.zones
+            _, _, w, h = rect
+            ys = np.linspace(0, h, rows + 1).astype(np.intp)
+            xs = np.linspace(0, w, cols + 1).astype(np.intp)
+            if roi_mask is None:
+                zone_areas = np.outer(np.diff(ys), np.diff(xs)).astype(np.float64)
+            else:
+                zone_areas = _zone_sums(cv2.integral(roi_mask, sdepth=cv2.CV_32S), ys, xs) / 255
+            zone_grid = (ys, xs, zone_areas)
+        self._geometry = (key, (width, height), rect, roi_mask, roi_area, polygon, zone_grid)
+        return self._geometry
+
+    def _crop(self, frame):
+        _, size, (x, y, w, h), roi_mask, roi_area, _, _ = self._prepare(frame.shape)
+        if size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return frame[y:y + h, x:x + w], roi_mask, roi_area
+
+    @property
+    def baseline_established(self):
+        return self.stabilization_frames > self.warmup_frames
+
+    def foreground_mask(self, frame, learning_rate=-1):
+        shape = frame.shape[:2]
+        if self._mask_buffers is None or self._mask_buffers[0].shape != shape:
+            self._mask_buffers = tuple(np.empty(shape, np.uint8) for _ in range(3))
+        fg_mask, blurred, opened = self._mask_buffers
+        t0 = time.perf_counter()
+        self.background_subtractor.apply(frame, fgmask=fg_mask, learningRate=learning_rate)
+        t1 = time.perf_counter()
+        cv2.GaussianBlur(fg_mask, (5, 5), 0, dst=blurred)
+        cv2.threshold(blurred, 128, 255, cv2.THRESH_BINARY, dst=fg_mask)
+        t2 = time.perf_counter()
+        cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, self._kernel, dst=opened)
+        cv2.morphologyEx(opened, cv2.MORPH_CLOSE, self._kernel, dst=fg_mask)
+        if self.timer is not None:
+            t3 = time.perf_counter()
+            self.timer("apply", t1 - t0)
+            self.timer("blur", t2 - t1)
+            self.timer("morphology", t3 - t2)
+        return fg_mask
+
+    def _unchanged(self, region):
+        """縮小後的灰階畫面與上次完整處理時相比，最大差異是否小於 change_threshold"""
+        shape = (self.CHANGE_SIZE[1], self.CHANGE_SIZE[0])
+        if self._change_buffers is None:
+            self._change_buffers = (np.empty(shape + (3,), np.uint8), np.empty(shape, np.uint8),
+                                    np.empty(shape, np.uint8))
+        small, gray, diff = self._change_buffers
+        cv2.resize(region, self.CHANGE_SIZE, dst=small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=gray)
+        reference = self._change_reference
+        if reference is None or self._last_result is None or self._skip_run >= self.max_skipped:
+            return False
+        cv2.absdiff(gray, reference, dst=diff)
+        return cv2.minMaxLoc(diff)[1] < self.change_threshold
+
+    def process(self, frame, learning_rate=-1):
+        """learning_rate 直接傳給 MOG2 的 apply（-1 為依 history 自動決定）"""
+        if self._pending_roi is not None:
+            (self.roi,), self._pending_roi = self._pending_roi, None
+            self._reset_requested = True
+        if self._reset_requested:
+            self._reset_requested = False
+            self.reset()
+        self.frame_id += 1
+        now = time.time()
+        region, roi_mask, roi_area = self._crop(frame)
+        if not self.baseline_established:
+            self.stabilization_frames += 1
+            self.background_subtractor.apply(region, learningRate=learning_rate)
+            return DetectionResult(self.frame_id, now, False, self.stabilization_frames)
+        if self.change_threshold is not None:
+            start = time.perf_counter()
+            unchanged = self._unchanged(region)
+            if self.timer is not None:
+                self.timer("change", time.perf_counter() - start)
+            if unchanged:
+                self._skip_run += 1
+                self.skipped_frames += 1
+                last = self._last_result
+                return DetectionResult(self.frame_id, now, True, self.stabilization_frames, last.ratio,
+                                       last.area, last.total_area, last.mask, last.zones, reused=True)
+            self._skip_run = 0
+            if self._change_reference is None:
+                self._change_reference = self._change_buffers[1].copy()
+            else:
+                np.copyto(self._change_reference, self._change_buffers[1])
+        self.processed_frames += 1
+        fg_mask = self.foreground_mask(region, learning_rate)
+        start = time.perf_counter()
+        if roi_mask is not None:
+            cv2.bitwise_and(fg_mask, roi_mask, dst=fg_mask)
+        zone_grid = self._geometry[6]
+        zones = None
+        if zone_grid is None:
+            area = cv2.countNonZero(fg_mask)
+        else:
+            # 一張積分圖同時提供總前景面積與各區域面積
+            ys, xs, zone_areas = zone_grid
+            shape = (fg_mask.shape[0] + 1, fg_mask.shape[1] + 1)
+            if self._integral is None or self._integral.shape != shape:
+                self._integral = np.empty(shape, np.int32)
+            cv2.integral(fg_mask, sum=self._integral, sdepth=cv2.CV_32S)
+            area = int(self._integral[-1, -1]) // 255
+            zones = _zone_sums(self._integral, ys, xs) / 255
+            np.divide(zones, zone_areas, out=zones, where=zone_areas > 0)
+            zones[zone_areas == 0] = 0.0
+        if self.timer is not None:
+            self.timer("count", time.perf_counter() - start)
+        result = DetectionResult(self.frame_id, now, True, self.stabilization_frames,
+                                 area / roi_area * 100, area, roi_area, fg_mask, zones)
+        self._last_result = result
+        return result
+
+    def _overlay_buffer(self, name, shape):
+        if self._overlay_buffers is None:
+            self._overlay_buffers = {}
+        buffer = self._overlay_buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._overlay_buffers[name] = np.empty(shape, np.uint8)
+        return buffer
+
+    def full_mask(self, frame, fg_mask):
+        """把處理解析度、ROI 範圍內的前景遮罩還原成與 frame 同大小"""
+        _, (width, height), (x, y, w, h), _, _, _, _ = self._prepare(frame.shape)
+        if (width, height) == (frame.shape[1], frame.shape[0]) and (w, h) == (width, height):
+            return fg_mask
+        if (w, h) == (width, height):
+            full = fg_mask
+        else:
+            full = self._overlay_buffer("process", (height, width))
+            full.fill(0)
+            full[y:y + h, x:x + w] = fg_mask
+        output = self._overlay_buffer("mask", frame.shape[:2])
+        cv2.resize(full, (frame.shape[1], frame.shape[0]), dst=output, interpolation=cv2.INTER_NEAREST)
+        return output
+
+    def overlay(self, frame, fg_mask):
+        """把前景以紅色疊加在原圖上，並標出偵測區域
+
+        等同於 addWeighted(frame, 1, 紅色遮罩, alpha, 0)：只在遮罩內的像素把紅色通道加上 alpha × 255，
+        以一次帶遮罩的 cv2.add 完成。回傳的影像緩衝區會在下一次呼叫時重用。
+        """
+        fg_mask = self.full_mask(frame, fg_mask)
+        visualization = self._overlay_buffer("overlay", frame.shape)
+        np.copyto(visualization, frame)
+        cv2.add(visualization, (0, 0, round(255 * self.overlay_alpha), 0), dst=visualization, mask=fg_mask)
+        polygon = self._prepare(frame.shape)[5]
+        if polygon is not None:
+            _, (width, height), _, _, _, _, _ = self._geometry
+            scale = np.array([frame.shape[1] / width, frame.shape[0] / height])
+            cv2.polylines(visualization, [(polygon * scale).astype(np.int32)], True, (0, 255, 255), 2)
+        return visualization
+
+
+class RedDetector:
+    """test.py 的 HSV 紅色偵測，以單次 inRange 完成
+
+    紅色的色相橫跨 0 度兩側（OpenCV 的 [0, 10] 與 [170, 180]）。先以 cv2.LUT 把 H 通道平移
+    (h + 10) % 180，兩段就合併成 [0, 20]，一次 inRange 即可得到與原本兩次 inRange 再 OR 相同的遮罩。
+    只對 H 平面查表（mixChannels 取出再放回）比對整張 HSV 做三通道查表快。
+    process_size 可先把畫面縮小再分類；HSV、H 平面與遮罩都寫入預先配置的緩衝區。
+    process() 回傳 (紅色百分比, 紅色遮罩)；遮罩只在下一次 process() 之前有效。
+    timer 的用法與 PenetrationDetector 相同，回報 hsv、in_range、count 三個階段。
+    """
+    HUE_SHIFT = 10
+    LOWER_RED = np.array([0, 50, 50])
+    UPPER_RED = np.array([20, 255, 255])
+
+    def __init__(self, process_size=None):
+        self.process_size = process_size
+        self.timer = None
+        self._lut = ((np.arange(256) + self.HUE_SHIFT) % 180).astype(np.uint8)
+        self._buffers = None
+
+    def process(self, frame):
+        t0 = time.perf_counter()
+        if self.process_size is not None and self.process_size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, self.process_size, interpolation=cv2.INTER_AREA)
+        if self._buffers is None or self._buffers[0].shape != frame.shape:
+            self._buffers = (np.empty(frame.shape, np.uint8), np.empty(frame.shape[:2], np.uint8),
+                             np.empty(frame.shape[:2], np.uint8))
+        hsv, hue, red_mask = self._buffers
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
+        t1 = time.perf_counter()
+        cv2.mixChannels([hsv], [hue], [0, 0])
+        cv2.LUT(hue, self._lut, dst=hue)
+        cv2.mixChannels([hue], [hsv], [0, 0])
+        cv2.inRange(hsv, self.LOWER_RED, self.UPPER_RED, dst=red_mask)
+        t2 = time.perf_counter()
+        red_pixels = cv2.countNonZero(red_mask)
+        total_pixels = frame.shape[0] * frame.shape[1]
+        red_percent = red_pixels / total_pixels * 100 if total_pixels else 0
+        if self.timer is not None:
+            self.timer("hsv", t1 - t0)
+            self.timer("in_range", t2 - t1)
+            self.timer("count", time.perf_counter() - t2)
+        return red_percent, red_mask
+
+    def render(self, frame, red_mask, size=None):
+        """只保留紅色區域的影像；size=(寬, 高) 時直接在顯示大小上合成，只應在實際顯示時呼叫"""
+        width, height = size if size is not None else (frame.shape[1], frame.shape[0])
+        if (frame.shape[1], frame.shape[0]) != (width, height):
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        if (red_mask.shape[1], red_mask.shape[0]) != (width, height):
+            red_mask = cv2.resize(red_mask, (width, height), interpolation=cv2.INTER_NEAREST)
+        return cv2.bitwise_and(frame, frame, mask=red_mask)
+
+
+class OccupancyStateMachine:
+    """把逐幀的突破量轉成穩定的滿載 / 未滿載狀態
+
+    先取最近 window 幀突破量的中位數，再套用遲滯區間：中位數 ≥ threshold 才進入滿載，
+    < threshold - hysteresis 才解除；且距離上次切換至少 min_dwell 秒才允許再次切換。
+    update() 只在狀態真的改變時回傳新狀態（True / False），否則回傳 None。
+    突破量與閾值皆為 0–1 的比例。
+    """
+
+    def __init__(self, threshold=0.15, hysteresis=0.03, min_dwell=1.0, window=5, clock=time.monotonic):
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.min_dwell = min_dwell
+        self.window = window
+        self.clock = clock
+        self.reset()
+
+    def reset(self, state=False):
+        self.state = state
+        self.samples = deque(maxlen=self.window)
+        self.median = 0.0
+        self.changed_at = None
+        self.transitions = 0
+
+    def update(self, ratio, now=None):
+        now = self.clock() if now is None else now
+        self.samples.append(ratio)
+        ordered = sorted(self.samples)
+        middle = len(ordered) // 2
+        self.median = ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+        if self.state:
+            wanted = self.median >= self.threshold - self.hysteresis
+        else:
+            wanted = self.median >= self.threshold
+        if wanted == self.state:
+            return None
+        if self.changed_at is not None and now - self.changed_at < self.min_dwell:
+            return None
+        self.state = wanted
+        self.changed_at = now
+        self.transitions += 1
+        return wanted
+
+
+class AdaptiveFrameScheduler:
+    """依電梯狀態決定偵測頻率與 MOG2 學習率
+
+    loading：到站開門、乘客進出，每幀都偵測；停留 loading_hold 秒後自動轉為 idle
+    idle：停在樓層待命，以中等頻率偵測
+    moving：關門行駛中，車廂內人數不會改變，只以低頻率保持背景模型與突破量更新，
+            並降低學習率，避免站著不動的乘客在行駛期間被學進背景
+    set_state() 可由 GUI 執行緒呼叫；should_process() 由擷取執行緒呼叫，並累計 processed / skipped。
+    """
+    INTERVALS = {"loading": 0.0, "idle": 0.2, "moving": 1.0}
+    LEARNING_RATES = {"loading": -1, "idle": -1, "moving": 0.0005}
+
+    def __init__(self, intervals=None, learning_rates=None, loading_hold=3.0, clock=time.monotonic):
+        self.intervals = dict(self.INTERVALS, **(intervals or {}))
+        self.learning_rates = dict(self.LEARNING_RATES, **(learning_rates or {}))
+        self.loading_hold = loading_hold
+        self.clock = clock
+        self.state = "loading"
+        self.state_since = clock()
+        self.last_processed = None
+        self.processed = 0
+        self.skipped = 0
+
+    def set_state(self, state):
+        if state not in self.intervals:
+            raise ValueError(f"未知的電梯狀態：{state}")
+        if state != self.state:
+            self.state = state
+            self.state_since = self.clock()
+            if state == "loading":
+                # 開門時立即恢復全速，不等待上一個低頻間隔結束
+                self.last_processed = None
+
+    @property
+    def learning_rate(self):
+        return self.learning_rates[self.state]
+
+    def should_process(self, now=None):
+        now = self.clock() if now is None else now
+        if self.state == "loading" and now - self.state_since >= self.loading_hold:
+            self.state = "idle"
+            self.state_since = now
+        if self.last_processed is not None and now - self.last_processed < self.intervals[self.state]:
+            self.skipped += 1
+            return False
+        self.last_processed = now
+        self.processed += 1
+        return True
+
+
+CAPTURE_RETRY_DELAY = 0.05  # 讀取失敗後重試前等待的秒數
+
+
+class CaptureWorker(threading.Thread):
+    """在背景執行緒讀取攝影機並執行偵測，只保留最新一筆結果
+
+    GUI 以 after() 呼叫 latest() 取得已完成的結果與預覽圖，主執行緒不再執行 cap.read()
+    或任何影像處理。annotate(frame, result) 在背景執行緒中繪製預覽圖並回傳 BGR 影像。
+    scheduler 為 AdaptiveFrameScheduler 時，背景基準建立後只處理排程允許的幀，
+    其餘幀只以 grab() 取出丟棄（不解碼），以維持攝影機緩衝區為最新影像。
+    """
+
+    def __init__(self, detector, source=0, preview_size=(320, 240), annotate=None, capture=None,
+                 scheduler=None):
+        super().__init__(daemon=True)
+        self.detector = detector
+        self.source = source
+        self.preview_size = preview_size
+        self.annotate = annotate
+        self.capture = capture
+        self.scheduler = scheduler
+        self.frames = 0
+        self.dropped = 0
+        self._results = queue.Queue(maxsize=1)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if self.capture is None:
+            self.capture = cv2.VideoCapture(self.source)
+        try:
+            self._loop()
+        finally:
+            # 由背景執行緒自己釋放，避免 stop() 逾時後在 grab()/read() 進行中釋放攝影機
+            self.capture.release()
+
+    def _loop(self):
+        grab = getattr(self.capture, "grab", None)
+        while not self._stop_event.is_set():
+            scheduler = self.scheduler
+            learning_rate = -1
+            if scheduler is not None and getattr(self.detector, "baseline_established", True):
+                if not scheduler.should_process():
+                    ok = grab() if grab is not None else self.capture.read()[0]
+                    if not ok:
+                        # 攝影機拔除或影片結束時 grab() 會立即失敗，稍等再試以免空轉占滿 CPU
+                        self._stop_event.wait(CAPTURE_RETRY_DELAY)
+                    continue
+                learning_rate = scheduler.learning_rate
+            ret, frame = self.capture.read()
+            if not ret:
+                self._stop_event.wait(CAPTURE_RETRY_DELAY)
+                continue
+            start = time.perf_counter()
+            result = self.detector.process(frame, learning_rate)
+            if self.preview_size is not None:
+                preview = self.annotate(frame, result) if self.annotate is not None else frame
+                preview = cv2.resize(preview, self.preview_size)
+                result.preview = cv2.cvtColor(preview, cv2.COLOR_BGR2RGB)
+            result.latency = time.perf_counter() - start
+            self.frames += 1
+            self._publish(result)
+
+    def _publish(self, result):
+        # 最新一幀優先：佇列已滿時丟棄尚未被取走的舊結果
+        try:
+            self._results.put_nowait(result)
+        except queue.Full:
+            try:
+                self._results.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            self._results.put_nowait(result)
+
+    def latest(self):
+        """取出最新結果；沒有新結果時回傳 None"""
+        try:
+            return self._results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def stop(self, timeout=1.0):
+        """通知背景執行緒停止；攝影機由執行緒結束時釋放，從未啟動時才在這裡釋放"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        elif self.ident is None and self.capture is not None:
+            self.capture.release()
+
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    def legacy_frame(subtractor, frame):
+        """原本 GUI 中每幀的處理方式，供比較用"""
+        fg_mask = subtractor.apply(frame)
+        fg_mask = cv2.GaussianBlur(fg_mask, (5, 5), 0)
+        _, fg_mask = cv2.threshold(fg_mask, 128, 255, cv2.THRESH_BINARY)
+        kernel = np.ones((5, 5), np.uint8)
+        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
+        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+        cv2.countNonZero(fg_mask)
+        fg_mask_colored = cv2.cvtColor(fg_mask, cv2.COLOR_GRAY2BGR)
+        fg_mask_colored[np.where((fg_mask_colored == [255, 255, 255]).all(axis=2))] = [0, 0, 255]
+        return cv2.addWeighted(frame, 1, fg_mask_colored, 0.4, 0)
+
+    def pipeline_frame(detector, frame):
+        result = detector.process(frame)
+        return detector.overlay(frame, result.mask)
+
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 80, (480, 640, 3), dtype=np.uint8)
+    frames = []
+    for i in range(60):
+        frame = background.copy()
+        cv2.circle(frame, (100 + i * 7, 240), 80, (255, 255, 255), -1)
+        frames.append(frame)
+
+    legacy_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=True)
+    detector = PenetrationDetector(warmup_frames=0)
+    runners = (("原本", lambda frame: legacy_frame(legacy_subtractor, frame)),
+               ("預先配置", lambda frame: pipeline_frame(detector, frame)))
+    for frame in frames[:10]:
+        for _, run in runners:
+            run(frame)
+
+    tracemalloc.start()
+    for name, run in runners:
+        peaks = []
+        start = time.perf_counter()
+        for frame in frames[10:]:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            run(frame)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        elapsed = (time.perf_counter() - start) / len(peaks) * 1000
+        print(f"{name}: 每幀暫時配置 {sum(peaks) / len(peaks) / 1024:.1f} KiB，{elapsed:.2f} ms")
+    tracemalloc.stop()